@@ -0,0 +1,97 @@
+"""
+Compares item embeddings taken from the latest name (embedding_mode="name") against running centroids of the merged
+items (embedding_mode="centroid"), on merge precision, recall and API calls.
+
+    python benchmarks/centroid_embeddings.py --items 500 --topics 25
+
+The inputs are synthetic, a modifier plus two words of a topic, and the topic is the label an input should be grouped by.
+Precision is the share of input pairs put in the same item that have the same label, recall the share of same label pairs
+that were put together. The API is replaced by the offline client in fake_client.py.
+"""
+import argparse
+import json
+
+import numpy as np
+
+from fake_client import FakeClient
+from semantic_deduplicator import SemanticDeduplicator
+
+TOPICS = [["apples", "green", "orchard"], ["bread", "loaf", "bakery"], ["cheese", "cheddar", "block"], ["coffee", "beans", "espresso"],
+          ["eggs", "dozen", "carton"], ["pasta", "spaghetti", "noodles"], ["rice", "basmati", "grain"], ["salmon", "fish", "fillet"],
+          ["spinach", "leaves", "greens"], ["tea", "bags", "herbal"], ["tomatoes", "cherry", "vine"], ["yogurt", "greek", "cup"],
+          ["butter", "salted", "stick"], ["honey", "jar", "raw"], ["milk", "dairy", "gallon"], ["oats", "rolled", "porridge"]]
+MODIFIERS = ["fresh", "organic", "cheap", "local", "large", "small", "frozen", "sliced", "whole", "dried", "breakfast", "dinner",
+             "baking", "guests", "lunch", "snacks", "weekly", "soup", "salad", "kids", "party", "spare", "budget", "premium"]
+
+
+def make_inputs(num_items, num_topics, rng):
+    # Two of the topic's three words plus a modifier shared by every topic
+    labels = rng.integers(0, num_topics, size=num_items)
+    inputs = []
+
+    for label in labels:
+        topic_words = rng.choice(TOPICS[label], size=2, replace=False)
+        inputs.append(f"{MODIFIERS[rng.integers(len(MODIFIERS))]} {topic_words[0]} {topic_words[1]}")
+
+    return inputs, labels.tolist()
+
+
+def pair_scores(items, label_of):
+    # Counts pairs of inputs, not distinct strings, so repeated inputs weigh as much as they do in the data
+    together = same_label_together = 0
+
+    for item in items:
+        labels = [label_of[original_input] for original_input in item.original_input_list]
+        together += len(labels) * (len(labels) - 1) // 2
+        same_label_together += sum(count * (count - 1) // 2 for count in np.unique(labels, return_counts=True)[1])
+
+    return together, same_label_together
+
+
+def run(embedding_mode, inputs, labels, args):
+    client = FakeClient(dimension=args.dimension)
+
+    sd = SemanticDeduplicator(background_context="Grocery list", llm_similarity_threshold=args.llm_threshold,
+                              cosine_similarity_threshold=args.cosine_threshold, embedding_mode=embedding_mode,
+                              chat_model=client, embedder=client)
+
+    for item in inputs:
+        sd.add_single_item(item)
+    sd.flush()
+
+    label_of = dict(zip(inputs, labels))
+    together, same_label_together = pair_scores(sd.deduplicated_items_list, label_of)
+    same_label = sum(count * (count - 1) // 2 for count in np.unique(labels, return_counts=True)[1])
+
+    return {
+        "items": len(sd.deduplicated_items_list),
+        "precision": round(same_label_together / together, 4) if together else 1.0,
+        "recall": round(same_label_together / same_label, 4) if same_label else 1.0,
+        "chat_calls": client.chat_calls,
+        "embedding_calls": client.embedding_calls,
+        "chat_calls_per_input": round(client.chat_calls / len(inputs), 3),
+        "embedding_calls_per_input": round(client.embedding_calls / len(inputs), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=500)
+    parser.add_argument("--topics", type=int, default=len(TOPICS))
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--cosine-threshold", type=float, default=.5)
+    parser.add_argument("--llm-threshold", type=float, default=.4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    inputs, labels = make_inputs(args.items, min(args.topics, len(TOPICS)), np.random.default_rng(args.seed))
+
+    results = {"inputs": args.items, "topics": min(args.topics, len(TOPICS))}
+    for embedding_mode in ("name", "centroid"):
+        results[embedding_mode] = run(embedding_mode, inputs, labels, args)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
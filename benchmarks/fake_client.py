@@ -0,0 +1,88 @@
+"""
+A deterministic, offline chat model and embedder in one, shared by the benchmarks. Pass it as both providers:
+
+    client = FakeClient()
+    sd = SemanticDeduplicator(background_context="...", chat_model=client, embedder=client)
+
+Answers come from a ScriptedChatModel and embeddings from a bag-of-words HashedNgramEmbedder. The only scripted change is
+that combining names keeps the words the items share, which is roughly what the real prompts ask for and lets names
+drift as merges pile up.
+
+Latency can be injected per request to stand in for the network. The sync methods sleep, which releases the GIL like
+a real HTTP call, and the async ones await asyncio.sleep.
+"""
+import asyncio
+import re
+import threading
+import time
+
+from semantic_deduplicator import ScriptedChatModel, HashedNgramEmbedder
+from semantic_deduplicator.providers import ChatModel, Embedder, _words as words
+
+
+def shared_words(texts):
+    # The words every text has, in the order of the first one, or the first text if they have none in common
+    common = set.intersection(*[set(words(text)) for text in texts])
+    shared = [word for word in words(texts[0]) if word in common]
+    return " ".join(shared) if shared else texts[0].strip()
+
+
+def combine_group(match):
+    return shared_words(re.findall(r"^\s*- (.*)$", match.string, flags=re.MULTILINE))
+
+
+def combine_pair(match):
+    return shared_words([match.group(2), match.group(1)])
+
+
+RULES = [(r"(?m)^\s*Items:", combine_group), (r"New Item: (.*)\n\s*Existing Item: (.*)", combine_pair)]
+
+
+class FakeClient(ChatModel, Embedder):
+    def __init__(self, dimension=256, chat_latency=0.0, embedding_latency=0.0):
+        self.chat_model = ScriptedChatModel(rules=RULES)
+        self.embedder = HashedNgramEmbedder(dimension=dimension, ngram_sizes=())
+        self.chat_latency = chat_latency
+        self.embedding_latency = embedding_latency
+        self.chat_calls = 0
+        self.embedding_calls = 0
+        self._lock = threading.Lock()
+
+    def vector(self, string):
+        return self.embedder.embed_one(string)
+
+    def embed(self, strings):
+        with self._lock:
+            self.embedding_calls += 1
+
+        if self.embedding_latency:
+            time.sleep(self.embedding_latency)
+
+        return self.embedder.embed(strings)
+
+    async def aembed(self, strings):
+        if self.embedding_latency:
+            await asyncio.sleep(self.embedding_latency)
+
+        with self._lock:
+            self.embedding_calls += 1
+
+        return self.embedder.embed(strings)
+
+    async def acomplete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        if self.chat_latency:
+            await asyncio.sleep(self.chat_latency)
+
+        return self._answer(system_prompt, human_prompt, function_schema, model)
+
+    def complete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        if self.chat_latency:
+            time.sleep(self.chat_latency)
+
+        return self._answer(system_prompt, human_prompt, function_schema, model)
+
+    def _answer(self, system_prompt, human_prompt, function_schema, model):
+        with self._lock:
+            self.chat_calls += 1
+
+        return self.chat_model.complete(system_prompt, human_prompt, function_schema, model)
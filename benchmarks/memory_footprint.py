@@ -0,0 +1,75 @@
+"""
+Compares the memory held by a deduplicated list before and after the move to a shared EmbeddingStore.
+
+    python benchmarks/memory_footprint.py --items 100000
+
+"before" is the old layout: an instance __dict__ per item holding the embedding as a list of Python floats, plus the
+float32 copy of every embedding the candidate index kept.
+"after" is a real SemanticDeduplicator: slotted items, the float32 (or float16) store and the index reading its rows,
+along with the id maps and exact-match keys.
+No API calls are made, the embeddings are random.
+"""
+import argparse
+import gc
+import json
+import tracemalloc
+
+import numpy as np
+
+from semantic_deduplicator import SemanticDeduplicator, DeduplicatedItem, ScriptedChatModel, HashedNgramEmbedder
+
+
+class LegacyItem:
+    def __init__(self, name, original_input, item_embedding):
+        self.original_input_list = [original_input]
+        self.name = name
+        self.item_embedding = item_embedding
+
+
+def measure(build):
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    gc.collect()
+    return current
+
+
+def build_legacy(num_items, dimension, rng):
+    items = [LegacyItem(f"Item {i}", f"Input {i}", rng.random(dimension).tolist()) for i in range(num_items)]
+    index_matrix = np.array([item.item_embedding for item in items], dtype=np.float32)
+
+    return items, index_matrix
+
+
+def build_deduplicator(num_items, dimension, rng, dtype):
+    sd = SemanticDeduplicator(background_context="Memory benchmark", embedding_dtype=dtype,
+                              chat_model=ScriptedChatModel(), embedder=HashedNgramEmbedder(dimension=dimension))
+
+    for i in range(num_items):
+        sd.add_item_to_deduplicated_list(DeduplicatedItem(f"Input {i}", original_input=f"Input {i}", formatted_name=f"Item {i}",
+                                                          item_embedding=rng.random(dimension)))
+
+    return sd
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=1536)
+    args = parser.parse_args()
+
+    results = {"items": args.items, "dimension": args.dimension}
+    results["before_bytes"] = measure(lambda: build_legacy(args.items, args.dimension, np.random.default_rng(0)))
+
+    for dtype in ("float32", "float16"):
+        results[f"after_{dtype}_bytes"] = measure(lambda: build_deduplicator(args.items, args.dimension, np.random.default_rng(0), dtype))
+        results[f"after_{dtype}_ratio"] = round(results["before_bytes"] / results[f"after_{dtype}_bytes"], 2)
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Times the main SemanticDeduplicator operations on synthetic data through the offline fake client.
+
+    python benchmarks/throughput.py --sizes 1000,10000,100000 --chat-latency 0.05 --output results.json
+
+For every size a fresh process runs, in order:
+    add_single_items          Ingests the synthetic inputs in chunks of --chunk-size, so its latency is per chunk.
+    add_item                  --operations submissions of two items each, added one call at a time, so its latency is per submission.
+    get_similar_items         --operations lookups of items that are already named and embedded, so only verification calls are made.
+    delete_item_from_string   --operations deletions of existing inputs.
+
+Each operation reports its throughput (items per second), the p50 and p99 latency of one call, what one call is
+("latency_unit": "chunk", "submission" or "item"), the chat and embedding calls per item, and the peak RSS of the process
+so far. The results are printed as JSON, or written to --output.
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from fake_client import FakeClient
+from semantic_deduplicator import SemanticDeduplicator, DeduplicatedItem, RandomProjectionIndex
+
+SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "sa", "ti", "vo", "ze", "pa", "do", "fi", "gu", "he", "jo", "bu"]
+
+
+def pseudo_word(rng):
+    return "".join(rng.choice(SYLLABLES, size=3))
+
+
+def make_inputs(num_items, rng):
+    # Topics of three made-up words, each input is a shared modifier plus two words of its topic, about 20 inputs per topic
+    topics = [[pseudo_word(rng) for _ in range(3)] for _ in range(max(num_items // 20, 1))]
+    modifiers = [pseudo_word(rng) for _ in range(50)]
+    inputs = []
+
+    for label in rng.integers(0, len(topics), size=num_items):
+        topic_words = rng.choice(topics[label], size=2, replace=False)
+        inputs.append(f"{modifiers[rng.integers(len(modifiers))]} {topic_words[0]} {topic_words[1]}")
+
+    return inputs
+
+
+def peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def summarize(latencies, latency_unit, items, elapsed, client, calls_before):
+    latencies = np.asarray(latencies)
+
+    return {
+        "items": items,
+        "seconds": round(elapsed, 4),
+        "items_per_second": round(items / elapsed, 2) if elapsed > 0 else None,
+        "p50_latency_ms": round(float(np.percentile(latencies, 50)) * 1000, 4) if len(latencies) else None,
+        "p99_latency_ms": round(float(np.percentile(latencies, 99)) * 1000, 4) if len(latencies) else None,
+        "latency_unit": latency_unit,
+        "chat_calls_per_item": round((client.chat_calls - calls_before[0]) / items, 4) if items else None,
+        "embedding_calls_per_item": round((client.embedding_calls - calls_before[1]) / items, 4) if items else None,
+        "peak_rss_bytes": peak_rss_bytes(),
+    }
+
+
+def timed(client, operations, latency_unit="item"):
+    # Runs (function, number of items) pairs one at a time. Latencies are per call, of one 'latency_unit', not averaged over its items
+    calls_before = (client.chat_calls, client.embedding_calls)
+    latencies, items = [], 0
+    start = time.perf_counter()
+
+    for function, num_items in operations:
+        operation_start = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - operation_start)
+        items += num_items
+
+    return summarize(latencies, latency_unit, items, time.perf_counter() - start, client, calls_before)
+
+
+def run_size(size, args):
+    rng = np.random.default_rng(args.seed)
+    client = FakeClient(dimension=args.dimension, chat_latency=args.chat_latency, embedding_latency=args.embedding_latency)
+
+    sd = SemanticDeduplicator(background_context="Synthetic benchmark items",
+                              llm_similarity_threshold=.5,
+                              cosine_similarity_threshold=.5,
+                              max_cosine_candidates=args.max_cosine_candidates,
+                              candidate_index=RandomProjectionIndex() if args.index == "lsh" else None,
+                              chat_model=client,
+                              embedder=client)
+
+    inputs = make_inputs(size, rng)
+    results = {"size": size}
+
+    chunks = [inputs[i:i + args.chunk_size] for i in range(0, len(inputs), args.chunk_size)]
+    results["add_single_items"] = timed(client, [(lambda chunk=chunk: sd.add_single_items(chunk, max_workers=args.max_workers), len(chunk))
+                                                 for chunk in chunks], latency_unit="chunk")
+    results["deduplicated_items"] = len(sd.deduplicated_items_list)
+
+    operations = min(args.operations, size)
+
+    submissions = [f"{a} and {b}" for a, b in zip(make_inputs(operations, rng), make_inputs(operations, rng))]
+    results["add_item"] = timed(client, [(lambda submission=submission: sd.add_item(submission), 2) for submission in submissions],
+                                latency_unit="submission")
+
+    queries = [DeduplicatedItem(item, original_input=item, formatted_name=item, item_embedding=client.vector(item))
+               for item in rng.choice(inputs, size=operations)]
+    results["get_similar_items"] = timed(client, [(lambda query=query: sd.get_similar_items(query), 1) for query in queries])
+
+    deletions = rng.choice(inputs, size=operations, replace=False)
+    results["delete_item_from_string"] = timed(client, [(lambda deletion=deletion: sd.delete_item_from_string(deletion), 1) for deletion in deletions])
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated numbers of synthetic inputs")
+    parser.add_argument("--operations", type=int, default=200, help="Calls timed for each of add_item, get_similar_items and delete_item_from_string")
+    parser.add_argument("--chunk-size", type=int, default=100)
+    parser.add_argument("--max-workers", type=int, default=8)
+    parser.add_argument("--max-cosine-candidates", type=int, default=10)
+    parser.add_argument("--index", choices=["exact", "lsh"], default="exact")
+    parser.add_argument("--chat-latency", type=float, default=0.0, help="Seconds added to every chat request")
+    parser.add_argument("--embedding-latency", type=float, default=0.0, help="Seconds added to every embedding request")
+    parser.add_argument("--dimension", type=int, default=256)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write the JSON here instead of printing it")
+    args = parser.parse_args()
+
+    report = {"settings": {key: value for key, value in vars(args).items() if key != "output"}, "results": []}
+
+    # A fresh process per size, so the peak RSS of one size doesn't carry over into the next
+    for size in [int(size) for size in args.sizes.split(",")]:
+        with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as executor:
+            report["results"].append(executor.submit(run_size, size, args).result())
+
+    if args.output:
+        with open(args.output, "w") as output_file:
+            json.dump(report, output_file, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
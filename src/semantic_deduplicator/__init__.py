@@ -1 +1,7 @@
-from .main import SemanticDeduplicator, DeduplicatedItem
\ No newline at end of file
+from .main import SemanticDeduplicator, DeduplicatedItem
+from .index import CandidateIndex, ExactIndex, RandomProjectionIndex
+from .cache import ResponseCache
+from .providers import ChatModel, Embedder, OpenAIChatModel, OpenAIEmbedder, HashedNgramEmbedder, ScriptedChatModel
+from .instrumentation import Instrumentation
+from .scheduler import RequestScheduler
+from .sharding import ShardedDeduplicator
\ No newline at end of file
@@ -0,0 +1,204 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def cache_key(kind, model, payload):
+    """
+    Returns the content address for a request: a hash of the kind of call, the model and the prompt payload.
+
+    Args:
+        kind (str): "embedding" or "completion".
+        model (str): The model the request is sent to.
+        payload: Any JSON serializable prompt, e.g. the input string or the chat messages and function schema.
+    """
+    serialized = json.dumps([kind, model, payload], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(serialized.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_memory_entries=10000, max_disk_bytes=1024 ** 3, access_flush_size=1000, access_flush_interval=5.0):
+        """
+        A two tier cache for embeddings and LLM responses, keyed by model plus a hash of the prompt.
+        Recent entries live in an in-memory LRU. If a path is given, every entry is also written to a SQLite file
+        so later runs over overlapping data don't pay for the same calls again.
+
+        Embeddings are stored as float32 blobs, completions as JSON. Disk hits don't commit one by one, their access times are
+        written in batches, so a crash can only make the eviction order slightly stale.
+
+        Args:
+            path (str): Optional, the SQLite file for the on-disk tier. Defaults to None (memory only).
+            max_memory_entries (int): The number of entries kept in memory. Defaults to 10,000.
+            max_disk_bytes (int): The size of stored values the disk tier can hold before the least recently used entries are evicted. Defaults to 1 GB.
+            access_flush_size (int): The number of disk hits whose access times are buffered before they are written. Defaults to 1,000.
+            access_flush_interval (float): The most seconds buffered access times wait before they are written. Defaults to 5.
+        """
+
+        self.path = path
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.access_flush_size = access_flush_size
+        self.access_flush_interval = access_flush_interval
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._connection = None
+        self._disk_bytes = 0
+        self._pending_access = {}
+        self._last_flush = time.monotonic()
+
+        if path is not None:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            self._connection.execute("""
+                CREATE TABLE IF NOT EXISTS entries (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            self._connection.execute("CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)")
+            self._connection.commit()
+            self._disk_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    @property
+    def hits(self):
+        return self.memory_hits + self.disk_hits
+
+    def stats(self):
+        """
+        Returns the hit and miss counters along with the current size of each tier.
+        """
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+                "disk_bytes": self._disk_bytes,
+            }
+
+    def get_embedding(self, model, string):
+        value = self._get(cache_key("embedding", model, string))
+        return None if value is None else np.frombuffer(value, dtype=np.float32).tolist()
+
+    def set_embedding(self, model, string, embedding):
+        self._set(cache_key("embedding", model, string), np.asarray(embedding, dtype=np.float32).tobytes())
+
+    def get_completion(self, model, payload):
+        value = self._get(cache_key("completion", model, payload))
+        return None if value is None else json.loads(value.decode("utf-8"))
+
+    def set_completion(self, model, payload, completion):
+        self._set(cache_key("completion", model, payload), json.dumps(completion).encode("utf-8"))
+
+    def clear(self):
+        """
+        Removes every entry from both tiers. The counters are kept.
+        """
+        with self._lock:
+            self._memory.clear()
+
+            if self._connection is not None:
+                self._pending_access.clear()
+                self._connection.execute("DELETE FROM entries")
+                self._connection.commit()
+                self._disk_bytes = 0
+
+    def flush(self):
+        """
+        Writes the buffered access times of disk hits. Called by 'close', and whenever the buffer is full or old enough.
+        """
+        with self._lock:
+            if self._connection is not None:
+                self._flush_access()
+                self._connection.commit()
+
+    def close(self):
+        if self._connection is not None:
+            self.flush()
+            self._connection.close()
+            self._connection = None
+
+    def _get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+            if self._connection is not None:
+                row = self._connection.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+
+                if row is not None:
+                    self._pending_access[key] = time.time()
+                    if len(self._pending_access) >= self.access_flush_size or time.monotonic() - self._last_flush >= self.access_flush_interval:
+                        self._flush_access()
+                        self._connection.commit()
+
+                    self._remember(key, row[0])
+                    self.disk_hits += 1
+                    return row[0]
+
+            self.misses += 1
+            return None
+
+    def _set(self, key, value):
+        with self._lock:
+            self._remember(key, value)
+
+            if self._connection is not None:
+                previous = self._connection.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+                self._connection.execute("INSERT OR REPLACE INTO entries (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                                         (key, value, len(value), time.time()))
+                self._disk_bytes += len(value) - (previous[0] if previous else 0)
+                self._pending_access.pop(key, None)
+                # Eviction goes by access time, so the buffered ones are written first, in the same commit
+                self._flush_access()
+                self._evict_disk()
+                self._connection.commit()
+
+    def _remember(self, key, value):
+        self._memory[key] = value
+        self._memory.move_to_end(key)
+
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def _flush_access(self):
+        if self._pending_access:
+            self._connection.executemany("UPDATE entries SET last_access = ? WHERE key = ?",
+                                         [(last_access, key) for key, last_access in self._pending_access.items()])
+            self._pending_access.clear()
+
+        self._last_flush = time.monotonic()
+
+    def _evict_disk(self):
+        # Drop the least recently used entries until the stored values fit in 'max_disk_bytes'
+        while self._disk_bytes > self.max_disk_bytes:
+            rows = self._connection.execute("SELECT key, size FROM entries ORDER BY last_access LIMIT 100").fetchall()
+
+            if not rows:
+                self._disk_bytes = 0
+                return
+
+            for key, size in rows:
+                if self._disk_bytes <= self.max_disk_bytes:
+                    break
+
+                self._connection.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._disk_bytes -= size
@@ -0,0 +1,121 @@
+import numpy as np
+
+from .index import normalize_embedding
+
+
+def threshold_edges(embeddings, threshold, block_size=1024):
+    """
+    Finds every pair of embeddings with a cosine similarity at or above the threshold.
+    The similarity matrix is computed a block of rows at a time so memory stays at block_size x N.
+
+    Args:
+        embeddings (list | np.array): The embeddings, one per row.
+        threshold (float): The minimum cosine similarity for a pair to be returned.
+        block_size (int): The number of rows compared per block. Defaults to 1024.
+
+    Returns:
+        edges (tuple): Arrays (i, j, cosine_similarity) with i < j, in descending order of similarity.
+    """
+
+    matrix = _unit_rows(embeddings)
+    sources, targets, scores = [], [], []
+
+    for start in range(0, len(matrix), block_size):
+        block_scores = matrix[start:start + block_size] @ matrix[start:].T
+
+        # Only keep the upper triangle so each pair is seen once
+        rows, columns = np.nonzero(block_scores >= threshold)
+        upper = columns > rows
+        rows, columns = rows[upper], columns[upper]
+
+        sources.append(rows + start)
+        targets.append(columns + start)
+        scores.append(block_scores[rows, columns])
+
+    if not sources:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+    sources, targets, scores = np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+    order = np.argsort(-scores, kind="stable")
+
+    return sources[order], targets[order], scores[order]
+
+
+def cross_threshold_edges(embeddings_1, embeddings_2, threshold, block_size=1024):
+    """
+    Finds every pair of one embedding from each list with a cosine similarity at or above the threshold.
+    Pairs within a list are not compared. The similarity matrix is computed a block of rows at a time.
+
+    Args:
+        embeddings_1 (list | np.array): The first embeddings, one per row.
+        embeddings_2 (list | np.array): The second embeddings, one per row.
+        threshold (float): The minimum cosine similarity for a pair to be returned.
+        block_size (int): The number of rows of the first list compared per block. Defaults to 1024.
+
+    Returns:
+        edges (tuple): Arrays (i, j, cosine_similarity) with i a row of the first list and j of the second, in descending order of similarity.
+    """
+
+    matrix_1, matrix_2 = _unit_rows(embeddings_1), _unit_rows(embeddings_2)
+    sources, targets, scores = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.float32)]
+
+    if len(matrix_1) > 0 and len(matrix_2) > 0:
+        for start in range(0, len(matrix_1), block_size):
+            block_scores = matrix_1[start:start + block_size] @ matrix_2.T
+            rows, columns = np.nonzero(block_scores >= threshold)
+
+            sources.append(rows + start)
+            targets.append(columns)
+            scores.append(block_scores[rows, columns])
+
+    sources, targets, scores = np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+    order = np.argsort(-scores, kind="stable")
+
+    return sources[order], targets[order], scores[order]
+
+
+def _unit_rows(embeddings):
+    return np.vstack([normalize_embedding(embedding) for embedding in embeddings]) if len(embeddings) > 0 else np.empty((0, 0), dtype=np.float32)
+
+
+class UnionFind:
+    def __init__(self, size):
+        """
+        Disjoint sets over 0..size-1 with path halving and union by size.
+        """
+        self._parent = list(range(size))
+        self._size = [1] * size
+
+    def find(self, element):
+        parent = self._parent
+
+        while parent[element] != element:
+            parent[element] = parent[parent[element]]
+            element = parent[element]
+
+        return element
+
+    def union(self, element_1, element_2):
+        root_1, root_2 = self.find(element_1), self.find(element_2)
+
+        if root_1 == root_2:
+            return False
+
+        if self._size[root_1] < self._size[root_2]:
+            root_1, root_2 = root_2, root_1
+
+        self._parent[root_2] = root_1
+        self._size[root_1] += self._size[root_2]
+
+        return True
+
+    def groups(self):
+        """
+        Returns the sets as lists of elements, ordered by their smallest element.
+        """
+        groups = {}
+
+        for element in range(len(self._parent)):
+            groups.setdefault(self.find(element), []).append(element)
+
+        return sorted(groups.values(), key=lambda group: group[0])
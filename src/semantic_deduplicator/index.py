@@ -0,0 +1,408 @@
+import numpy as np
+
+from .store import EmbeddingStore
+
+
+def normalize_embedding(embedding):
+    """
+    Returns the embedding as a unit length float32 vector. Zero vectors are returned unchanged.
+
+    Args:
+        embedding (list | np.array): The embedding to normalize.
+    """
+    vector = np.asarray(embedding, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+
+    if norm == 0:
+        return vector
+
+    return vector / norm
+
+
+class CandidateIndex:
+    """
+    The interface the SemanticDeduplicator uses to retrieve cosine similarity candidates.
+    Backends are kept in sync with the 'deduplicated_items_list' through add, update and remove.
+    """
+
+    def __len__(self):
+        raise NotImplementedError
+
+    def add(self, item):
+        raise NotImplementedError
+
+    def update(self, item):
+        raise NotImplementedError
+
+    def remove(self, item):
+        raise NotImplementedError
+
+    def rebuild(self, items):
+        raise NotImplementedError
+
+    def __iter__(self):
+        # The indexed items
+        raise NotImplementedError
+
+    def bind_store(self, store):
+        # Backends that keep their own copy of the embeddings can ignore the deduplicator's store
+        pass
+
+    def rebuild_from_matrix(self, items, matrix):
+        # Backends that can't use the matrix directly re-index the items one at a time
+        self.rebuild(items)
+
+    def search(self, embedding, threshold, max_results=None):
+        raise NotImplementedError
+
+    def search_with_rejections(self, embedding, threshold, max_results=None):
+        # Also returns how many items were scored below the threshold. Backends that can't tell return None
+        return self.search(embedding, threshold, max_results=max_results), None
+
+
+class ExactIndex(CandidateIndex):
+    def __init__(self, initial_capacity=1024):
+        """
+        Scores every indexed item against the query, a block of rows at a time. This is the default backend.
+
+        The rows are read from an EmbeddingStore rather than copied. A SemanticDeduplicator binds its own store (see
+        'bind_store'), so each embedding is held once, in the store's dtype. Items kept elsewhere are copied into a store
+        of the index's own. Only the inverse norm of each row is kept on the side, so a cosine similarity pass is one
+        matrix-vector product per block. A float16 store is converted to float32 one block at a time while searching,
+        which trades some search speed for its smaller footprint.
+
+        Args:
+            initial_capacity (int): The number of rows the index's own store allocates at a time. Defaults to 1024.
+        """
+
+        self.store = EmbeddingStore(block_size=initial_capacity)
+        self._clear()
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def __contains__(self, item):
+        return id(item) in self._slot_of
+
+    def __iter__(self):
+        return (item for item in self._item_of_slot if item is not None)
+
+    def bind_store(self, store):
+        """
+        Reads the rows of items kept in 'store' from it from now on. Empties the index.
+        The store reports every write, so an item re-embedded directly (e.g. with DeduplicatedItem.update_item_embedding)
+        is picked up without a call to 'update'.
+
+        Args:
+            store (EmbeddingStore): The store of the SemanticDeduplicator using the index.
+        """
+
+        self.rebuild([])
+        self.store.unsubscribe(self._on_store_update)
+        self.store = store
+        self.store.subscribe(self._on_store_update)
+        self._clear()
+
+    def add(self, item):
+        """
+        Indexes an item, reading its row from the store if it is kept there and copying its embedding in otherwise.
+
+        Args:
+            item (DeduplicatedItem): The item to index.
+        """
+
+        if getattr(item, "_store", None) is self.store:
+            slot = item._slot
+        else:
+            slot = self.store.allocate(np.asarray(item.item_embedding, dtype=np.float32))
+            self._owned_slots.add(slot)
+
+        self._slot_of[id(item)] = slot
+        self._reserve(slot + 1)
+        self._item_of_slot[slot] = item
+        self._refresh(slot)
+
+    def update(self, item):
+        """
+        Picks up the current embedding of an item that is already indexed, e.g. after a merge renamed it.
+
+        Args:
+            item (DeduplicatedItem): The item whose embedding changed.
+        """
+
+        slot = self._slot_of[id(item)]
+
+        if slot in self._owned_slots:
+            self.store.set(slot, np.asarray(item.item_embedding, dtype=np.float32))
+
+        self._refresh(slot)
+
+    def remove(self, item):
+        """
+        Removes an item from the index in O(1).
+
+        Args:
+            item (DeduplicatedItem): The item to remove.
+        """
+
+        slot = self._slot_of.pop(id(item))
+        self._item_of_slot[slot] = None
+        self._inverse_norms[slot] = np.nan
+
+        if slot in self._owned_slots:
+            self._owned_slots.discard(slot)
+            self.store.release(slot)
+
+    def rebuild(self, items):
+        """
+        Discards the current rows and re-indexes the given items.
+
+        Args:
+            items (list): The DeduplicatedItems to index.
+        """
+
+        for slot in self._owned_slots:
+            self.store.release(slot)
+
+        self._clear()
+
+        for item in items:
+            self.add(item)
+
+    def rebuild_from_matrix(self, items, matrix, chunk_size=4096):
+        """
+        Re-indexes the given items in bulk, e.g. after SemanticDeduplicator.load. The matrix only needs to be read,
+        so it can be the memory map the store adopted.
+
+        Args:
+            items (list): The DeduplicatedItems to index, all kept in the bound store.
+            matrix (np.array): A (len(items), dimension) array of their embeddings, one row per item in the same order.
+            chunk_size (int): The number of rows measured at a time. Defaults to 4096.
+        """
+
+        if not all(getattr(item, "_store", None) is self.store for item in items):
+            # Only rows of the bound store can be indexed in place
+            self.rebuild(items)
+            return
+
+        self.rebuild([])
+        slots = np.fromiter((item._slot for item in items), dtype=np.int64, count=len(items))
+        self._reserve(int(slots.max()) + 1 if len(slots) else 0)
+
+        for item, slot in zip(items, slots.tolist()):
+            self._slot_of[id(item)] = slot
+            self._item_of_slot[slot] = item
+
+        for start in range(0, len(items), chunk_size):
+            norms = np.linalg.norm(np.asarray(matrix[start:start + chunk_size], dtype=np.float32), axis=1)
+            self._inverse_norms[slots[start:start + chunk_size]] = 1 / np.where(norms == 0, np.inf, norms)
+
+    def search(self, embedding, threshold, max_results=None):
+        """
+        Finds the indexed items whose cosine similarity to the embedding is at or above the threshold.
+
+        Args:
+            embedding (list | np.array): The query embedding.
+            threshold (float): The minimum cosine similarity for an item to be returned.
+            max_results (int): Optional, only return the top n items by cosine similarity.
+
+        Returns:
+            results (list): (item, cosine_similarity) tuples in descending order of similarity.
+        """
+
+        return self.search_with_rejections(embedding, threshold, max_results=max_results)[0]
+
+    def search_with_rejections(self, embedding, threshold, max_results=None):
+        """
+        Same as 'search', and also counts the indexed items that were scored below the threshold.
+        Items cut by 'max_results' passed the threshold and aren't counted.
+
+        Returns:
+            results (list): (item, cosine_similarity) tuples in descending order of similarity.
+            rejected (int): The number of scored items below the threshold.
+        """
+
+        if len(self._slot_of) == 0:
+            return [], 0
+
+        query = normalize_embedding(embedding)
+        self._reserve(self.store.num_slots)
+
+        scores = [np.asarray(rows, dtype=np.float32) @ query for _, rows in self.store.chunks()]
+        scores = (np.concatenate(scores) if len(scores) > 1 else scores[0]) * self._inverse_norms[:self.store.num_slots]
+
+        return self._select(np.arange(len(scores)), scores, threshold, max_results)
+
+    def _select(self, slots, scores, threshold, max_results):
+        # Threshold the scores of the given slots, then keep the top n in descending order. Also returns the number below the threshold.
+        # Slots that aren't indexed score NaN, which neither passes the threshold nor counts as below it
+        passed = scores >= threshold
+        rejected = int(np.count_nonzero(scores < threshold))
+        candidate_slots, scores = slots[passed], scores[passed]
+
+        if max_results is not None and len(candidate_slots) > max_results:
+            top_k = np.argpartition(-scores, max_results - 1)[:max_results]
+            candidate_slots, scores = candidate_slots[top_k], scores[top_k]
+
+        order = np.argsort(-scores, kind="stable")
+
+        return [(self._item_of_slot[slot], float(score)) for slot, score in zip(candidate_slots[order].tolist(), scores[order])], rejected
+
+    def _on_store_update(self, slot):
+        # A row of an indexed item was written to in the bound store. The index writes its own slots and updates them itself
+        item = self._item_of_slot[slot] if slot < len(self._item_of_slot) else None
+
+        if item is not None and slot not in self._owned_slots:
+            self.update(item)
+
+    def _score_slots(self, slots, query):
+        # The cosine similarity of the rows in the given slots to a unit length query
+        return (self.store.get_rows(slots) @ query) * self._inverse_norms[slots]
+
+    def _get_row(self, slot):
+        return self.store.get(slot)
+
+    def _refresh(self, slot):
+        # Re-measures a row after its embedding changed
+        norm = np.linalg.norm(np.asarray(self.store.get(slot), dtype=np.float32))
+        self._inverse_norms[slot] = 0 if norm == 0 else 1 / norm
+
+    def _clear(self):
+        self._slot_of = {}
+        self._item_of_slot = []
+        self._owned_slots = set()
+        self._inverse_norms = np.empty(0, dtype=np.float32)
+
+    def _reserve(self, num_slots):
+        # Grows the per slot arrays to cover 'num_slots' slots, slots that aren't indexed are None and NaN
+        if num_slots > len(self._item_of_slot):
+            self._item_of_slot.extend([None] * (num_slots - len(self._item_of_slot)))
+
+        if num_slots > len(self._inverse_norms):
+            inverse_norms = np.full(max(num_slots, len(self._inverse_norms) * 2), np.nan, dtype=np.float32)
+            inverse_norms[:len(self._inverse_norms)] = self._inverse_norms
+            self._inverse_norms = inverse_norms
+
+
+class RandomProjectionIndex(ExactIndex):
+    def __init__(self, num_tables=8, num_bits=10, num_probes=2, seed=0, initial_capacity=1024):
+        """
+        An approximate nearest neighbour backend using random hyperplane hashing (LSH) for very large lists.
+        Each table hashes an embedding to a bucket by the sign of its projection onto 'num_bits' random hyperplanes.
+        Only the items sharing a probed bucket are scored, exactly, against the query.
+
+        Inserts, updates and deletes are incremental, so the index follows merges and removals without a rebuild.
+
+        Args:
+            num_tables (int): The number of independent hash tables. More tables raise recall and memory. Defaults to 8.
+            num_bits (int): The number of hyperplanes per table. More bits make smaller buckets and faster, less complete searches. Defaults to 10.
+            num_probes (int): The recall/latency knob. Per table, also probe the buckets reached by flipping each of the n least certain bits. Defaults to 2.
+            seed (int): The seed for the random hyperplanes. Defaults to 0.
+            initial_capacity (int): The number of rows the index's own store allocates at a time. Defaults to 1024.
+        """
+
+        super().__init__(initial_capacity=initial_capacity)
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.num_probes = min(num_probes, num_bits)
+        self.seed = seed
+
+        self._hyperplanes = None
+        self._bit_values = 1 << np.arange(num_bits, dtype=np.int64)
+        self._buckets = [{} for _ in range(num_tables)]
+        self._signatures = {}
+
+    def add(self, item):
+        super().add(item)
+        self._insert_signatures(item)
+
+    def update(self, item):
+        self._remove_signatures(item)
+        super().update(item)
+        self._insert_signatures(item)
+
+    def remove(self, item):
+        self._remove_signatures(item)
+        super().remove(item)
+
+    def rebuild(self, items):
+        self._buckets = [{} for _ in range(self.num_tables)]
+        self._signatures = {}
+        super().rebuild(items)
+
+    def rebuild_from_matrix(self, items, matrix, chunk_size=4096):
+        self._buckets = [{} for _ in range(self.num_tables)]
+        self._signatures = {}
+        super().rebuild_from_matrix(items, matrix, chunk_size=chunk_size)
+
+        if self._signatures:
+            # Items outside the bound store were re-indexed one at a time, signatures included
+            return
+
+        # Hash the adopted rows a chunk at a time rather than one vector per call
+        for start in range(0, len(items), chunk_size):
+            chunk = np.asarray(matrix[start:start + chunk_size], dtype=np.float32)
+            projections = (chunk @ self._get_hyperplanes(chunk.shape[1]).T).reshape(len(chunk), self.num_tables, self.num_bits)
+
+            for item, signatures in zip(items[start:start + chunk_size], ((projections > 0) @ self._bit_values).tolist()):
+                self._store_signatures(item, signatures)
+
+    def search_with_rejections(self, embedding, threshold, max_results=None):
+        # Only the items sharing a probed bucket are scored, so only those can be rejected
+        if len(self._slot_of) == 0:
+            return [], 0
+
+        query = normalize_embedding(embedding)
+        projections = self._project(query)
+
+        item_ids = set()
+        for table, signature in enumerate(self._probe_signatures(projections)):
+            for probe in signature:
+                item_ids.update(self._buckets[table].get(probe, ()))
+
+        if not item_ids:
+            return [], 0
+
+        slots = np.fromiter((self._slot_of[item_id] for item_id in item_ids), dtype=np.int64, count=len(item_ids))
+
+        return self._select(slots, self._score_slots(slots, query), threshold, max_results)
+
+    def _project(self, vector):
+        # Returns the projections onto every hyperplane, shaped (num_tables, num_bits)
+        return (self._get_hyperplanes(vector.shape[0]) @ vector).reshape(self.num_tables, self.num_bits)
+
+    def _get_hyperplanes(self, dimension):
+        if self._hyperplanes is None:
+            rng = np.random.default_rng(self.seed)
+            self._hyperplanes = rng.standard_normal((self.num_tables * self.num_bits, dimension)).astype(np.float32)
+
+        return self._hyperplanes
+
+    def _signatures_of(self, projections):
+        return ((projections > 0) @ self._bit_values).tolist()
+
+    def _probe_signatures(self, projections):
+        # The home bucket of every table, plus the buckets one bit flip away across the least certain hyperplanes
+        signatures = self._signatures_of(projections)
+        least_certain_bits = np.argsort(np.abs(projections), axis=1)[:, :self.num_probes]
+
+        return [[signature] + [signature ^ int(self._bit_values[bit]) for bit in bits]
+                for signature, bits in zip(signatures, least_certain_bits)]
+
+    def _insert_signatures(self, item):
+        signatures = self._signatures_of(self._project(np.asarray(self._get_row(self._slot_of[id(item)]), dtype=np.float32)))
+        self._store_signatures(item, signatures)
+
+    def _store_signatures(self, item, signatures):
+        self._signatures[id(item)] = signatures
+
+        for table, signature in enumerate(signatures):
+            self._buckets[table].setdefault(signature, set()).add(id(item))
+
+    def _remove_signatures(self, item):
+        for table, signature in enumerate(self._signatures.pop(id(item))):
+            bucket = self._buckets[table][signature]
+            bucket.discard(id(item))
+
+            if not bucket:
+                del self._buckets[table][signature]
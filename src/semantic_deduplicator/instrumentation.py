@@ -0,0 +1,121 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+# Handed out by 'stage' while disabled, so an instrumented block costs one method call
+_NO_STAGE = nullcontext()
+
+
+class Instrumentation:
+    def __init__(self, enabled=True, hooks=None):
+        """
+        Timers, counters and token usage for the hot paths of a SemanticDeduplicator.
+
+        Stages are timed with 'stage', e.g. "transform_item_name", "embedding", "cosine_search", "llm_similarity".
+        Counters include "cosine_candidates", "llm_verifications", "merges", "cache_hits" and "retries".
+        Token usage is read from the API responses by the OpenAI providers.
+
+        Every measurement is also passed to each hook as hook(kind, name, value), where kind is "timer" (value in seconds),
+        "counter" or "tokens". Hooks run on the thread that made the measurement and should return quickly.
+
+        Args:
+            enabled (bool): Whether anything is recorded. A disabled instance costs close to nothing. Defaults to True.
+            hooks (list): Optional, callables to export measurements as they happen. Defaults to None.
+        """
+
+        self.enabled = enabled
+        self.hooks = list(hooks or [])
+        self._lock = threading.Lock()
+        self.reset()
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def reset(self):
+        """
+        Clears every timer, counter and token total.
+        """
+        with self._lock:
+            self._timers = defaultdict(lambda: {"calls": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            self._counters = defaultdict(int)
+            self._tokens = defaultdict(int)
+
+    def stage(self, name):
+        """
+        A context manager that times the block it wraps under 'name'.
+        """
+        if not self.enabled:
+            return _NO_STAGE
+
+        return _Stage(self, name)
+
+    def count(self, name, amount=1):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            self._counters[name] += amount
+
+        self._emit("counter", name, amount)
+
+    def record_time(self, name, seconds):
+        if not self.enabled:
+            return
+
+        with self._lock:
+            timer = self._timers[name]
+            timer["calls"] += 1
+            timer["total_seconds"] += seconds
+            timer["max_seconds"] = max(timer["max_seconds"], seconds)
+
+        self._emit("timer", name, seconds)
+
+    def record_usage(self, usage, prefix=""):
+        """
+        Adds the token counts of an API response's 'usage' field, e.g. prompt_tokens and completion_tokens.
+
+        Args:
+            usage (dict): The usage reported by the API. Missing or None is ignored.
+            prefix (str): Prepended to every key, e.g. "embedding_" to keep embedding tokens apart. Defaults to "".
+        """
+        if not self.enabled or not usage:
+            return
+
+        for key, value in dict(usage).items():
+            if isinstance(value, int):
+                with self._lock:
+                    self._tokens[prefix + key] += value
+
+                self._emit("tokens", prefix + key, value)
+
+    def snapshot(self):
+        """
+        Returns a copy of everything recorded so far.
+        """
+        with self._lock:
+            return {
+                "timers": {name: dict(timer) for name, timer in self._timers.items()},
+                "counters": dict(self._counters),
+                "tokens": dict(self._tokens),
+            }
+
+    def _emit(self, kind, name, value):
+        for hook in self.hooks:
+            hook(kind, name, value)
+
+
+class _Stage:
+    __slots__ = ("_instrumentation", "_name", "_start")
+
+    def __init__(self, instrumentation, name):
+        self._instrumentation = instrumentation
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._instrumentation.record_time(self._name, time.perf_counter() - self._start)
+        return False
@@ -5,12 +5,82 @@ import os
 from dotenv import load_dotenv
 import warnings
 import json
-from .utils import call_llm, get_embedding
+import asyncio
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from .utils import set_cache, set_scheduler, estimate_tokens
+from .providers import OpenAIChatModel, OpenAIEmbedder
+from .instrumentation import Instrumentation
+from .index import ExactIndex, normalize_embedding
+from .store import EmbeddingStore
+from .clustering import threshold_edges, UnionFind
+from .stream import read_records
+
+METADATA_FILE = "metadata.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+
+# The number of names a group name prompt lists, larger groups are named from a sample
+GROUP_NAME_EXAMPLES = 20
+
+# The tiers of the similarity cascade and what each can decide, see SemanticDeduplicator.cascade_decisions
+CASCADE_DECISIONS = ("cosine_accept", "cosine_reject", "cross_check_accept", "cross_check_reject", "judge_accept", "judge_reject")
 
 load_dotenv()
 
+def normalize_text(text):
+    """
+    Collapses whitespace and case so trivially different repeats of an input share one exact-match key.
+    """
+    return " ".join(text.split()).casefold()
+
+# Used by DeduplicatedItem and the module functions when no provider is passed in
+DEFAULT_CHAT_MODEL = OpenAIChatModel()
+DEFAULT_EMBEDDER = OpenAIEmbedder()
+
+def transform_item_name(background_context, item_name, chat_model=None):
+    """
+    Takes a raw item and outputs a clean name given the background context.
+    This is shared by DeduplicatedItem and the bulk ingest path, which rewrites names before any item is created.
+
+    Args:
+        background_context (str): The context in which the item is being consolidated.
+        item_name (str): The string to transform.
+        chat_model (ChatModel): Optional, the chat model to use. Defaults to OpenAI.
+    """
+
+    return (chat_model or DEFAULT_CHAT_MODEL).complete(**_transform_item_name_request(background_context, item_name))
+
+async def atransform_item_name(background_context, item_name, chat_model=None):
+    return await (chat_model or DEFAULT_CHAT_MODEL).acomplete(**_transform_item_name_request(background_context, item_name))
+
+def _transform_item_name_request(background_context, item_name):
+    # We can upgrade this to function calling
+    """A string that comes in might not be in a clear format. This function helps standardize names and extract requests"""
+    system_prompt = f"""
+    Your goal is to reword a user input according to their instructions.
+    Their instructions will describe a desired goal or output and you should transform the phrase or item to the best of your ability
+
+    % Start of user's background
+    {background_context}
+    % End of user's background
+
+    Respond with nothing else besides the new item name.
+    No not include any labels, or double-quotes
+    Capitalize the first letter of your response
+    """
+
+    human_prompt = f"""
+    Here is my item: {item_name}
+    """
+
+    return {"system_prompt": system_prompt, "human_prompt": human_prompt}
+
 class DeduplicatedItem:
-    def __init__(self, item_name, original_input=None, background_context=None):
+    # Items are kept by the hundred thousand, so skip the per-instance __dict__
+    __slots__ = ("name", "original_input_list", "item_id", "_item_embedding", "_store", "_slot")
+
+    def __init__(self, item_name, original_input=None, background_context=None, formatted_name=None, item_embedding=None, chat_model=None, embedder=None):
         """
         This class represents a deduplicated item in the Semantic Deduplicator.
 
@@ -21,73 +91,139 @@ class DeduplicatedItem:
             original_input_list (list): A list of original inputs. Initialized with the original input.
             formatted_name (str): The formatted name of the item, obtained by transforming the item name.
             item_embedding (np.array): The embedding of the formatted item name.
+            item_id (int): A stable id assigned when the item is added to a SemanticDeduplicator. None until then.
+
+        If 'formatted_name' or 'item_embedding' are passed in (e.g. computed in bulk), the matching API call is skipped.
+        Otherwise they come from 'chat_model' and 'embedder', which default to OpenAI.
+
+        Once the item is added to a SemanticDeduplicator its embedding lives in the deduplicator's EmbeddingStore
+        and 'item_embedding' is a view of its row there.
         """
         
+        self.item_id = None
+        self._store = None
+        self._slot = None
         self.original_input_list = [original_input]
-        self.name = self.transform_item_name(background_context, item_name=item_name)
-        self.item_embedding = get_embedding(self.name)
+        self.name = formatted_name if formatted_name is not None else self.transform_item_name(background_context, item_name=item_name, chat_model=chat_model)
+        self.item_embedding = item_embedding if item_embedding is not None else (embedder or DEFAULT_EMBEDDER).embed_one(self.name)
 
-    def update_item_name(self, background_context, new_item_name):
+    def update_item_name(self, background_context, new_item_name, chat_model=None, embedder=None):
         """
         Updates the name of the item and its corresponding embedding.
 
         Args:
             background_context (str): The context in which the item is being consolidated.
             new_item_name (str): The new name for the item.
+            chat_model (ChatModel): Optional, the chat model to use. Defaults to OpenAI.
+            embedder (Embedder): Optional, the embedder to use. Defaults to OpenAI.
         """
         
-        self.name = self.transform_item_name(background_context, new_item_name)
-        self.update_item_embedding()
+        self.name = self.transform_item_name(background_context, new_item_name, chat_model=chat_model)
+        self.update_item_embedding(embedder=embedder)
     
-    def update_item_embedding(self):
+    def update_item_embedding(self, embedder=None):
         """
         Updates the embedding given a name string.
+        For an item in a SemanticDeduplicator the new embedding goes to its store, which passes it on to the candidate index.
 
-        Args: None
+        Args:
+            embedder (Embedder): Optional, the embedder to use. Defaults to OpenAI.
         """
-        new_item_embedding = get_embedding(self.name)
+        new_item_embedding = (embedder or DEFAULT_EMBEDDER).embed_one(self.name)
         self.item_embedding = new_item_embedding
 
-    def transform_item_name(self, background_context, item_name=None):
+    async def aupdate_item_name(self, background_context, new_item_name, chat_model=None, embedder=None):
         """
-        Takes the raw user input and outputs a clean name given the background context
+        The coroutine version of update_item_name.
+        """
+
+        self.name = await atransform_item_name(background_context, new_item_name, chat_model=chat_model)
+        self.item_embedding = await (embedder or DEFAULT_EMBEDDER).aembed_one(self.name)
+
+    @property
+    def item_embedding(self):
+        if self._store is not None:
+            return self._store.get(self._slot)
+
+        return self._item_embedding
+
+    @item_embedding.setter
+    def item_embedding(self, item_embedding):
+        if self._store is not None:
+            self._store.set(self._slot, item_embedding)
+        else:
+            # A float32 array instead of a list of boxed floats
+            self._item_embedding = np.asarray(item_embedding, dtype=np.float32)
+
+    @classmethod
+    def from_store(cls, name, original_input_list, store, slot, item_id=None):
+        """
+        Recreates an item whose embedding is already in an EmbeddingStore without any API calls, e.g. when loading a saved deduplicator.
 
         Args:
-            background_context (str): The context in which the item is being consolidated.
-            item_name (str): Optional, a string to transform. This defaults to the first item on the original_input_list
+            name (str): The formatted name of the item.
+            original_input_list (list): The original inputs merged into the item.
+            store (EmbeddingStore): The store holding the embedding.
+            slot (int): The slot of the embedding in the store.
+            item_id (int): Optional, the id the item had when it was saved.
         """
 
-        # We can upgrade this to function calling
-        """A string that comes in might not be in a clear format. This function helps standardize names and extract requests"""
-        system_prompt = f"""
-        Your goal is to reword a user input according to their instructions.
-        Their instructions will describe a desired goal or output and you should transform the phrase or item to the best of your ability
+        item = cls.__new__(cls)
+        item.name = name
+        item.original_input_list = original_input_list
+        item.item_id = item_id
+        item._item_embedding = None
+        item._store = store
+        item._slot = slot
 
-        % Start of user's background
-        {background_context}
-        % End of user's background
+        return item
 
-        Respond with nothing else besides the new item name.
-        No not include any labels, or double-quotes
-        Capitalize the first letter of your response
+    def attach_to_store(self, store):
         """
+        Moves the embedding into a shared EmbeddingStore.
 
-        # Use the provided item_name if it's not None, otherwise use the first item from original_input_list
-        item_to_transform = item_name if item_name is not None else self.original_input_list[0]
+        Args:
+            store (EmbeddingStore): The store to keep the embedding in.
+        """
 
-        human_prompt = f"""
-        Here is my item: {item_to_transform}
+        self._slot = store.allocate(self._item_embedding)
+        self._store = store
+        self._item_embedding = None
+
+    def detach_from_store(self):
+        """
+        Copies the embedding out of its EmbeddingStore and frees the slot, e.g. when the item is deleted.
         """
 
-        new_item_name = call_llm(system_prompt=system_prompt, human_prompt=human_prompt)
+        if self._store is None:
+            return
+
+        item_embedding = np.array(self._store.get(self._slot), dtype=np.float32)
+        self._store.release(self._slot)
+        self._store = None
+        self._slot = None
+        self._item_embedding = item_embedding
+
+    def transform_item_name(self, background_context, item_name=None, chat_model=None):
+        """
+        Takes the raw user input and outputs a clean name given the background context
 
-        return new_item_name
+        Args:
+            background_context (str): The context in which the item is being consolidated.
+            item_name (str): Optional, a string to transform. This defaults to the first item on the original_input_list
+            chat_model (ChatModel): Optional, the chat model to use. Defaults to OpenAI.
+        """
+
+        # Use the provided item_name if it's not None, otherwise use the first item from original_input_list
+        item_to_transform = item_name if item_name is not None else self.original_input_list[0]
+
+        return transform_item_name(background_context, item_to_transform, chat_model=chat_model)
 
     def __repr__(self):
         return f'DeduplicatedItem("{self.name}")'
 
 class SemanticDeduplicator:
-    def __init__(self, background_context="", llm_similarity_threshold=0.8, cosine_similarity_threshold=.75, openai_api_key='', similarity_model='gpt-4'):
+    def __init__(self, background_context="", llm_similarity_threshold=0.8, cosine_similarity_threshold=.75, openai_api_key='', similarity_model='gpt-4', extraction_model='gpt-4-0613', max_cosine_candidates=None, candidate_index=None, max_concurrency=8, max_verification_workers=8, early_exit=False, similarity_scoring="pairwise", scoring_batch_size=20, cache=None, embedding_dtype="float32", exact_match_fast_path=True, rename_after_merges=1, embedding_mode="name", centroid_weighting="inputs", chat_model=None, embedder=None, instrumentation=None, scheduler=None, auto_accept_threshold=None, cross_check=None, cross_check_reject_threshold=.2, cross_check_accept_threshold=.9, max_changes=100000):
         """
         Initializes the SemanticDeduplicator class.
 
@@ -97,22 +233,367 @@ class SemanticDeduplicator:
             cosine_similarity_threshold (float): The threshold for cosine similarity. Defaults to 0.75.
             openai_api_key (str): The API key for OpenAI. Defaults to an empty string.
             similarity_model (str): The name of the similarity model to be used. Defaults to 'gpt-4'.
+            extraction_model (str): The name of the model that splits submissions into items. It needs function calling. Defaults to 'gpt-4-0613'.
+            max_cosine_candidates (int): Optional, the maximum number of cosine candidates passed on to the LLM similarity check. Defaults to None (no limit).
+            candidate_index (CandidateIndex): Optional, the backend used to retrieve cosine similarity candidates. Defaults to an ExactIndex, use a RandomProjectionIndex for very large lists.
+            max_concurrency (int): The maximum number of in-flight API calls made by the async methods. Defaults to 8.
+            max_verification_workers (int): The maximum number of cosine candidates checked by the LLM at the same time. Defaults to 8.
+            early_exit (bool): Check candidates best-first in descending cosine order and stop once one clears 'llm_similarity_threshold'. Defaults to False.
+            similarity_scoring (str): How cosine candidates are scored by the LLM. Defaults to "pairwise".
+                "pairwise": One request per candidate.
+                "batched": One function calling request scores up to 'scoring_batch_size' candidates. Falls back to pairwise if the response can't be parsed.
+            scoring_batch_size (int): The maximum number of candidates per batched scoring request. Defaults to 20.
+            cache (ResponseCache): Optional, a cache for embeddings and LLM responses. Like the API key, it is shared by every deduplicator in the process. Defaults to None.
+            embedding_dtype (str): How item embeddings are stored, "float32" or "float16" to halve their memory. Defaults to "float32".
+            exact_match_fast_path (bool): Add single items whose whitespace and case normalized text matches an earlier input or an item name
+                straight to that item, without any API calls. Submissions 'add_item' split into several items don't count as inputs. Defaults to True.
+            rename_after_merges (int): The number of merges an item collects before it is renamed and re-embedded, once for all of them.
+                Until then the item keeps matching on its last embedding. Use None to only rename on 'flush' and before
+                'get_formatted_deduplicated_list' or 'save'. Defaults to 1 (rename on every merge).
+            embedding_mode (str): What an item's embedding represents. Defaults to "name".
+                "name": The embedding of the item's latest name, re-embedded after every rename.
+                "centroid": A running centroid of the embeddings of every item merged into it, updated in place with no API call.
+                    It is the weighted mean of the members' unit length embeddings, kept exact across merges, and only its
+                    direction matters for matching. Renaming is then only cosmetic.
+            centroid_weighting (str): How merged items are weighted in a centroid. Defaults to "inputs".
+                "inputs": By their number of original inputs.
+                "uniform": Every merged item counts the same.
+            chat_model (ChatModel): Optional, the provider for every LLM request. Defaults to OpenAIChatModel.
+                A ScriptedChatModel runs offline with no API latency.
+            embedder (Embedder): Optional, the provider for every embedding. Defaults to OpenAIEmbedder.
+                A HashedNgramEmbedder runs locally on the CPU.
+            instrumentation (Instrumentation): Optional, records stage timers, counters and token usage, see 'stats'. Defaults to None (off).
+            scheduler (RequestScheduler): Optional, paces every OpenAI request to a requests and tokens per minute quota and retries rate limit errors.
+                Like the cache, it is shared by every deduplicator in the process. Defaults to None (retries only).
+            auto_accept_threshold (float): Optional, cosine candidates at or above this are similar without asking the LLM, scored by their cosine similarity.
+                Together with 'cosine_similarity_threshold', below which items are never candidates, this is the first tier of the similarity cascade.
+                Defaults to None (every candidate goes on).
+            cross_check (callable | str): Optional, the middle tier. Either a local function scoring two names from 0 to 100, e.g. providers.word_overlap,
+                or the name of a cheaper chat model asked the same question as 'similarity_model'. Only the candidates it scores
+                between 'cross_check_reject_threshold' and 'cross_check_accept_threshold' go on to 'similarity_model'.
+                A function is not saved with 'save', set it again after 'load'. Defaults to None (no middle tier).
+            cross_check_reject_threshold (float): Cross check scores below this are not similar. Defaults to 0.2.
+            cross_check_accept_threshold (float): Cross check scores at or above this are similar. Defaults to 0.9.
+            max_changes (int): The number of changes kept for 'get_changes'. Readers further behind get the whole list again. Defaults to 100,000.
         """
         
+        self._next_item_id = 0
+        # The records of the current stream already in the list, see add_items_from_stream
+        self.stream_offset = 0
+        self.exact_match_fast_path = exact_match_fast_path
+        self.fast_path_hits = 0
+        self.fast_path_calls_saved = 0
+        # The normalized text of submissions that 'add_item' split into several items. They point at no single item, so they are never fast path keys
+        self._multi_item_inputs = set()
+        self.rename_after_merges = rename_after_merges
+        self.embedding_mode = embedding_mode
+        self.centroid_weighting = centroid_weighting
+        # Every change to the list bumps the version, see get_changes. The list assignment below starts the feed at 0
+        self.version = -1
+        self._changes = deque(maxlen=max_changes)
         self.deduplicated_items_list = []
+        self.embedding_store = EmbeddingStore(dtype=embedding_dtype)
+        self.index = candidate_index if candidate_index is not None else ExactIndex()
+        # The index reads the rows of the items from the store instead of keeping a copy
+        self.index.bind_store(self.embedding_store)
+        self.max_cosine_candidates = max_cosine_candidates
         self.cosine_similarity_threshold = cosine_similarity_threshold
         self.llm_similarity_threshold = llm_similarity_threshold
         self.background_context = background_context
         self.similarity_model = similarity_model  # Use the provided similarity_model
+        self.extraction_model = extraction_model
+        self.max_concurrency = max_concurrency
+        self.max_verification_workers = max_verification_workers
+        self.early_exit = early_exit
+        self.similarity_scoring = similarity_scoring
+        self.scoring_batch_size = scoring_batch_size
+        self.auto_accept_threshold = auto_accept_threshold
+        self.cross_check = cross_check
+        self.cross_check_reject_threshold = cross_check_reject_threshold
+        self.cross_check_accept_threshold = cross_check_accept_threshold
+        self.cascade_decisions = {decision: 0 for decision in CASCADE_DECISIONS}
+        self.chat_model = chat_model or OpenAIChatModel()
+        self.embedder = embedder or OpenAIEmbedder()
+        self.instrumentation = instrumentation or Instrumentation(enabled=False)
+
+        # Providers that report token usage, retries and cache hits do so to the first deduplicator that instruments them
+        if self.instrumentation.enabled:
+            for provider in (self.chat_model, self.embedder):
+                if provider.instrumentation is None:
+                    provider.instrumentation = self.instrumentation
+
+        # Created on first use by the async methods, see _async_primitives
+        self._async_loop = None
+        self._semaphore = None
+        self._mutation_lock = None
 
         # If the API key is provided during initialization, use it. Else, get it from the environment variable.
+        # Local providers don't need one
         openai.api_key = openai_api_key or os.getenv('OPENAI_API_KEY')
-        if not openai.api_key:
+        if not openai.api_key and (self.chat_model.requires_openai_api_key or self.embedder.requires_openai_api_key):
             raise ValueError("OpenAI API key must be provided or set in the environment variable 'OPENAI_API_KEY'")
         
+        if cache is not None:
+            set_cache(cache)
+
+        if scheduler is not None:
+            set_scheduler(scheduler)
+
+        if similarity_scoring not in ("pairwise", "batched"):
+            raise ValueError(f"Invalid similarity_scoring: {similarity_scoring}. Expected one of: 'pairwise', 'batched'")
+
+        if rename_after_merges is not None and (not isinstance(rename_after_merges, int) or rename_after_merges < 1):
+            raise ValueError(f"Invalid rename_after_merges: {rename_after_merges}. Expected None or a positive integer")
+
+        if embedding_mode not in ("name", "centroid"):
+            raise ValueError(f"Invalid embedding_mode: {embedding_mode}. Expected one of: 'name', 'centroid'")
+
+        if centroid_weighting not in ("inputs", "uniform"):
+            raise ValueError(f"Invalid centroid_weighting: {centroid_weighting}. Expected one of: 'inputs', 'uniform'")
+
+        if not 0 <= cross_check_reject_threshold <= cross_check_accept_threshold <= 1:
+            raise ValueError(f"Invalid cross check thresholds: {cross_check_reject_threshold}, {cross_check_accept_threshold}. Expected 0 <= reject <= accept <= 1")
+
         if background_context == "":
             warnings.warn("The 'background_context' variable is empty. This is used to inform the language model what type of items it's parsing and extracting. It's recommended to provide context on your data for better results. See https://github.com/gkamradt/SemanticDeduplicator for more information")
 
+    @property
+    def deduplicated_items_list(self):
+        """
+        The deduplicated items in the order they were added.
+
+        Deletes leave a tombstone in place of the item instead of shifting the list, so they cost O(1).
+        The tombstones are compacted away when this list is read, or once they make up half of it.
+        """
+
+        if self._tombstones > 0:
+            self._compact()
+
+        return self._slots
+
+    @deduplicated_items_list.setter
+    def deduplicated_items_list(self, items):
+        self._slots = list(items)
+        self._tombstones = 0
+        self._pending_merges = {}
+        self._centroid_weights = {}
+        self._reindex_slots()
+        self._restart_change_feed()
+
+    def _restart_change_feed(self, version=None):
+        # A replaced list can't be described as changes, readers from before it start over with the whole list
+        self.version = self.version + 1 if version is None else version
+        self._changes.clear()
+        self._feed_start = self.version
+
+    def _record_change(self, kind, item, first_new_input=None):
+        # Changes are (version, kind, item_id, position of the first new input for merges)
+        if len(self._changes) == self._changes.maxlen:
+            self._feed_start = self._changes[0][0]
+
+        self.version += 1
+        self._changes.append((self.version, kind, item.item_id, first_new_input))
+
+    def get_changes(self, since_version):
+        """
+        Returns what changed in the list after 'since_version', for readers that poll it without re-reading everything.
+        Only the changed items are looked at, so a poll costs O(changes) rather than O(total inputs).
+
+        Items added since the version are only listed as added, with their current name and inputs. Items that were
+        already there are listed as renamed (their new name), merged (only the inputs added since) or deleted.
+        Merges waiting on a rename are flushed first, like 'get_formatted_deduplicated_list'.
+
+        Args:
+            since_version (int): The 'version' of the last poll, e.g. from a previous call or from 'export'. Use -1 to get everything.
+
+        Returns:
+            changes (dict): {"version": the current version, pass it to the next call,
+                             "reset": True if 'since_version' is older than the changes kept (see 'max_changes') and "added" is the whole list,
+                             "added": [{'Item ID', 'Formatted Name', 'Original Names'}],
+                             "renamed": [{'Item ID', 'Formatted Name'}],
+                             "merged": [{'Item ID', 'New Original Names'}],
+                             "deleted": [item ids]}
+        """
+
+        self.flush()
+
+        if since_version < self._feed_start:
+            return {"version": self.version, "reset": True, "added": [self._change_entry(item) for item in self.deduplicated_items_list],
+                    "renamed": [], "merged": [], "deleted": []}
+
+        added, renamed, deleted, first_new_inputs = set(), set(), set(), {}
+
+        for version, kind, item_id, first_new_input in reversed(self._changes):
+            if version <= since_version:
+                break
+
+            if kind == "added":
+                added.add(item_id)
+            elif kind == "renamed":
+                renamed.add(item_id)
+            elif kind == "deleted":
+                deleted.add(item_id)
+            else:
+                first_new_inputs[item_id] = first_new_input
+
+        # Items added and deleted since the last poll were never seen by the reader, so they are left out altogether
+        live_items = sorted((added | renamed | set(first_new_inputs)) - deleted)
+
+        return {"version": self.version,
+                "reset": False,
+                "added": [self._change_entry(self.get_item(item_id)) for item_id in live_items if item_id in added],
+                "renamed": [{'Item ID': item_id, 'Formatted Name': self.get_item(item_id).name} for item_id in live_items if item_id in renamed and item_id not in added],
+                "merged": [{'Item ID': item_id, 'New Original Names': self.get_item(item_id).original_input_list[first_new_inputs[item_id]:]}
+                           for item_id in live_items if item_id in first_new_inputs and item_id not in added],
+                "deleted": sorted(deleted - added)}
+
+    def _change_entry(self, item):
+        return {'Item ID': item.item_id, 'Formatted Name': item.name, 'Original Names': item.original_input_list}
+
+    def get_item(self, item_id):
+        """
+        Returns the item with the given id in O(1).
+
+        Args:
+            item_id (int): The 'item_id' of a DeduplicatedItem in the list.
+        """
+
+        return self._slots[self._slot_of_id[item_id]]
+
+    def _reindex_slots(self):
+        # Maps every item id to its position in '_slots', giving ids to items that were placed in the list directly.
+        # The fast path keys are dropped and rebuilt on the next lookup, so loading a large list doesn't normalize every input
+        self._slot_of_id = {}
+        self._exact_match_ids = None
+        self._exact_match_keys_of_id = None
+
+        for slot, item in enumerate(self._slots):
+            if item is None:
+                continue
+
+            if item.item_id is None or item.item_id in self._slot_of_id:
+                item.item_id = self._next_item_id
+            self._next_item_id = max(self._next_item_id, item.item_id + 1)
+            self._slot_of_id[item.item_id] = slot
+
+    def _exact_match_map(self):
+        # The normalized names and inputs of every item, pointing at its id, built on the first fast path lookup
+        if self._exact_match_ids is None:
+            self._exact_match_ids = {}
+            self._exact_match_keys_of_id = {}
+
+            for item in self._slots:
+                if item is not None:
+                    self._remember_exact_matches(item, [item.name] + item.original_input_list)
+
+        return self._exact_match_ids
+
+    def _remember_exact_matches(self, item, texts):
+        # Points the normalized form of each text at the item, for the exact-match fast path. Until the map is built there is nothing to update
+        if self._exact_match_ids is None:
+            return
+
+        keys = self._exact_match_keys_of_id.setdefault(item.item_id, set())
+
+        for text in texts:
+            if isinstance(text, str):
+                key = normalize_text(text)
+                if key not in self._multi_item_inputs:
+                    self._exact_match_ids[key] = item.item_id
+                    keys.add(key)
+
+    def _mark_multi_item_inputs(self, submissions):
+        # Submissions that produced more than one item stop being fast path keys, including any they were before
+        for submission in submissions:
+            if isinstance(submission, str):
+                key = normalize_text(submission)
+                self._multi_item_inputs.add(key)
+
+                item_id = self._exact_match_ids.pop(key, None) if self._exact_match_ids is not None else None
+                if item_id is not None:
+                    self._exact_match_keys_of_id.get(item_id, set()).discard(key)
+
+    def _forget_exact_matches(self, item, texts=None):
+        # Removes the item's keys, or only the given texts, unless a newer item has taken them over
+        if self._exact_match_ids is None:
+            return
+
+        keys = self._exact_match_keys_of_id.get(item.item_id, set())
+        forgotten = set(keys) if texts is None else {normalize_text(text) for text in texts if isinstance(text, str)} & keys
+
+        for key in forgotten:
+            keys.discard(key)
+            if self._exact_match_ids.get(key) == item.item_id:
+                del self._exact_match_ids[key]
+
+        if texts is None:
+            self._exact_match_keys_of_id.pop(item.item_id, None)
+
+    def _add_exact_match(self, item):
+        """
+        The fast path for repeats. If the normalized text of a single item matches an earlier input or an item name,
+        it is appended to that item's 'original_input_list' without any API calls.
+
+        Args:
+            item (str): The raw item being added.
+
+        Returns:
+            added (bool): Whether the item was handled by the fast path.
+        """
+
+        if not self.exact_match_fast_path or not isinstance(item, str):
+            return False
+
+        self._sync_items()
+        item_id = self._exact_match_map().get(normalize_text(item))
+
+        if item_id is None or item_id not in self._slot_of_id:
+            return False
+
+        existing_item = self.get_item(item_id)
+        if self.embedding_mode == "centroid" and self.centroid_weighting == "inputs":
+            self._add_repeat_to_centroid(existing_item)
+
+        self._record_change("merged", existing_item, len(existing_item.original_input_list))
+        existing_item.original_input_list.append(item)
+        self.instrumentation.count("fast_path_hits")
+
+        # At least the name transform and the embedding were skipped
+        self.fast_path_hits += 1
+        self.fast_path_calls_saved += 2
+
+        return True
+
+    def _is_known_input(self, item):
+        return self.exact_match_fast_path and isinstance(item, str) and normalize_text(item) in self._exact_match_map()
+
+    def _compact(self):
+        self._slots = [item for item in self._slots if item is not None]
+        self._tombstones = 0
+        self._slot_of_id = {item.item_id: slot for slot, item in enumerate(self._slots)}
+
+    def _sync_items(self):
+        # 'deduplicated_items_list' is public and may be edited directly (e.g. popping an item), re-sync the id map and index if it drifted.
+        # Items that left the list are handled like deletes and items put in directly like adds, so the change feed sees both
+        if len(self._slots) - self._tombstones != len(self._slot_of_id):
+            listed = {id(item) for item in self._slots if item is not None}
+            indexed = set()
+
+            for item in list(self.index):
+                indexed.add(id(item))
+                if id(item) not in listed:
+                    self._discard_item(item)
+
+            self._reindex_slots()
+
+            for item in self._slots:
+                if item is not None and id(item) not in indexed:
+                    self.index.add(item)
+                    self._record_change("added", item)
+
+        if len(self.index) != len(self._slot_of_id):
+            self.index.rebuild([item for item in self._slots if item is not None])
+
     def add_item(self, item):
         """
         This method takes an item as input and adds it to the 'deduplicated_items_list'. If the item is similar to an existing item in the list, it merges the two items.
@@ -120,14 +601,53 @@ class SemanticDeduplicator:
 
         items = self.parse_items_from_raw_item(item)
 
+        if len(items) > 1:
+            self._mark_multi_item_inputs([item])
+
         for extracted_item in items:
             # Create a DeduplicatedItem object for the extracted item
-            potential_item = DeduplicatedItem(item_name=extracted_item,
-                                              original_input=item,
-                                              background_context=self.background_context)
+            potential_item = self._create_item(extracted_item, original_input=item)
 
             self._add_item_to_list(potential_item)
     
+    def add_items(self, submissions: List[str], max_tokens_per_request=2000, max_workers=8, embedding_batch_size=100):
+        """
+        Adds many submissions at once, like calling 'add_item' on each in order, with far fewer extraction requests.
+        Submissions are packed into function calling requests of up to 'max_tokens_per_request' estimated tokens, each
+        returning the items of every submission it holds. Submissions the model skips or garbles are retried on their own.
+        Every extracted item keeps its whole submission as its 'original_input'.
+
+        Args:
+            submissions (List[str]): The raw submissions, each possibly holding several items.
+            max_tokens_per_request (int): The budget of estimated submission tokens per extraction request. A longer submission goes alone. Defaults to 2000.
+            max_workers (int): The maximum number of concurrent API calls. Defaults to 8.
+            embedding_batch_size (int): The number of names sent per embedding request. Defaults to 100.
+
+        Returns:
+            items (list): The items extracted from each submission, one list per submission index.
+        """
+
+        submissions = list(submissions)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            items_per_submission = self.parse_items_from_raw_items(submissions, max_tokens_per_request=max_tokens_per_request, executor=executor)
+            self._mark_multi_item_inputs([submission for submission, items in zip(submissions, items_per_submission) if len(items) > 1])
+
+            extracted = [(item, submission) for submission, items in zip(submissions, items_per_submission) for item in items]
+            item_names = list(executor.map(self._transform, [item for item, _ in extracted]))
+            item_embeddings = self._embed_in_batches(executor, item_names, embedding_batch_size)
+
+        for (item, submission), item_name, item_embedding in zip(extracted, item_names, item_embeddings):
+            potential_item = DeduplicatedItem(item_name=item,
+                                              original_input=submission,
+                                              background_context=self.background_context,
+                                              formatted_name=item_name,
+                                              item_embedding=item_embedding)
+
+            self._add_item_to_list(potential_item)
+
+        return items_per_submission
+
     def add_single_item(self, item):
         """
         This method takes a single item as input and adds it to the 'deduplicated_items_list'. 
@@ -139,13 +659,42 @@ class SemanticDeduplicator:
         
         """
 
+        if self._add_exact_match(item):
+            return
+
         # Create a DeduplicatedItem object for the item
-        potential_item = DeduplicatedItem(item_name=item,
-                                          original_input=item,
-                                          background_context=self.background_context)
+        potential_item = self._create_item(item, original_input=item)
 
         self._add_item_to_list(potential_item)
 
+    def _create_item(self, item_name, original_input=None):
+        formatted_name = self._transform(item_name)
+
+        return DeduplicatedItem(item_name=item_name,
+                                original_input=original_input,
+                                background_context=self.background_context,
+                                formatted_name=formatted_name,
+                                item_embedding=self._embed_one(formatted_name))
+
+    def _transform(self, item_name):
+        with self.instrumentation.stage("transform_item_name"):
+            return transform_item_name(self.background_context, item_name, chat_model=self.chat_model)
+
+    def _embed(self, strings):
+        with self.instrumentation.stage("embedding"):
+            return self.embedder.embed(strings)
+
+    def _embed_one(self, string):
+        with self.instrumentation.stage("embedding"):
+            return self.embedder.embed_one(string)
+
+    def stats(self):
+        """
+        Returns a snapshot of the instrumentation: per stage timers, counters and token usage.
+        Empty unless the deduplicator was created with an enabled Instrumentation.
+        """
+        return self.instrumentation.snapshot()
+
     def _add_item_to_list(self, item):
         """
         This method takes a DeduplicatedItem and adds it to the 'deduplicated_items_list'. 
@@ -154,7 +703,7 @@ class SemanticDeduplicator:
         """
 
         # Check to see if your items list has any data
-        if len(self.deduplicated_items_list) == 0:
+        if len(self._slot_of_id) == 0:
             self.add_item_to_empty_list(item)
         else:
             self.add_item_to_existing_list(item)
@@ -165,6 +714,142 @@ class SemanticDeduplicator:
         This splits them into distinct requests to be processed individually
         """
 
+        with self.instrumentation.stage("parse_items"):
+            return self.chat_model.complete(**self._parse_items_request(item))
+
+    def parse_items_from_raw_items(self, submissions, max_tokens_per_request=2000, executor=None):
+        """
+        The bulk version of 'parse_items_from_raw_item'. Packs the submissions into as few requests as the token budget allows.
+
+        Args:
+            submissions (list): The raw submissions.
+            max_tokens_per_request (int): The budget of estimated submission tokens per request. Defaults to 2000.
+            executor (ThreadPoolExecutor): Optional, sends the requests concurrently. Defaults to None (one at a time).
+
+        Returns:
+            items (list): The items of each submission, one list per submission index.
+        """
+
+        batches = self._pack_submissions(submissions, max_tokens_per_request)
+        def parse_batch(batch):
+            return self._parse_submission_batch([submissions[i] for i in batch])
+
+        batch_items = executor.map(parse_batch, batches) if executor is not None else map(parse_batch, batches)
+
+        items_per_submission = [None] * len(submissions)
+        for batch, items in zip(batches, batch_items):
+            for i, submission_items in zip(batch, items):
+                items_per_submission[i] = submission_items
+
+        return items_per_submission
+
+    def _pack_submissions(self, submissions, max_tokens_per_request):
+        # Consecutive submissions grouped by position, each group within the budget unless a single submission is over it
+        batches, batch, batch_tokens = [], [], 0
+
+        for i, submission in enumerate(submissions):
+            tokens = estimate_tokens([submission])
+
+            if batch and batch_tokens + tokens > max_tokens_per_request:
+                batches.append(batch)
+                batch, batch_tokens = [], 0
+
+            batch.append(i)
+            batch_tokens += tokens
+
+        if batch:
+            batches.append(batch)
+
+        return batches
+
+    def _parse_submission_batch(self, submissions):
+        if len(submissions) == 1:
+            return [self.parse_items_from_raw_item(submissions[0])]
+
+        try:
+            with self.instrumentation.stage("parse_items"):
+                response = self.chat_model.complete(**self._parse_submissions_request(submissions))
+            items_per_submission = self._parse_batched_items(response, len(submissions))
+        except (ValueError, KeyError, TypeError):
+            # The model didn't return a usable list, extract every submission on its own instead
+            items_per_submission = [None] * len(submissions)
+
+        return [items if items is not None else self.parse_items_from_raw_item(submission)
+                for submission, items in zip(submissions, items_per_submission)]
+
+    def _parse_batched_items(self, response, expected_length):
+        # The items of every submission number in the response, None for the ones it left out
+        if not isinstance(response, list):
+            raise ValueError(f"Expected a list of submissions, got: {response}")
+
+        items_per_submission = [None] * expected_length
+
+        for entry in response:
+            number, items = int(entry["submission"]), entry["items"]
+
+            if 1 <= number <= expected_length and isinstance(items, list):
+                items_per_submission[number - 1] = [str(item) for item in items]
+
+        return items_per_submission
+
+    def _parse_submissions_request(self, submissions):
+        system_prompt = f"""
+            You are a bot that is part of a semantic item deduplicator.
+            You will be given a numbered list of submissions from users, each of which may or may not contain multiple items.
+            Your goal is to return the list of item(s) that you find in each submission, under that submission's number.
+
+            Here is background on the items they are submitting
+            % Start of background
+            {self.background_context}
+            % End of background
+
+            Keep your responses to as close to what the user said as possible.
+            If there is only one item present in a submission, only return exactly what the user said.
+            Never move an item from one submission to another, and return every submission.
+            """
+
+        # One line per submission, so line breaks inside a submission can't be mistaken for the next one
+        human_prompt = "\n".join(f"Submission {i + 1}: {' '.join(submission.split())}" for i, submission in enumerate(submissions))
+
+        function_schema = [
+            {
+                "name": "extract_items_from_submissions",
+                "description": "Extract the items from each of the users submissions",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "items": {
+                            "type": "array",
+                            "description": "One entry per submission",
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "submission": {
+                                        "type": "integer",
+                                        "description": "The number of the submission"
+                                    },
+                                    "items": {
+                                        "type": "array",
+                                        "description": "Items listed within the submission",
+                                        "items": {
+                                            "type" : "string"
+                                        }
+                                    }
+                                }
+                            }
+                        }
+                    }
+                }
+            }
+        ]
+
+        return {"system_prompt": system_prompt,
+                "human_prompt": human_prompt,
+                "function_schema": function_schema,
+                "model": self.extraction_model}
+
+    def _parse_items_request(self, item):
+
         system_prompt = f"""
             You are a bot that is part of a semantic item deduplicator.
             You will be given a submission from a user which may or may not contain multiple items.
@@ -198,12 +883,10 @@ class SemanticDeduplicator:
             }
         ]
 
-        list_of_items = call_llm(system_prompt=system_prompt,
-                                 human_prompt=item,
-                                 function_schema=function_schema,
-                                 model="gpt-4-0613")
-
-        return list_of_items
+        return {"system_prompt": system_prompt,
+                "human_prompt": item,
+                "function_schema": function_schema,
+                "model": self.extraction_model}
 
     def add_item_to_empty_list(self, item_to_add):
         self.add_item_to_deduplicated_list(item_to_add)
@@ -224,8 +907,8 @@ class SemanticDeduplicator:
         """
         This method combines a new item with an existing similar item in the 'deduplicated_items_list'. 
         It first selects the most similar item from the list of similar items. 
-        Then it updates the name of the existing item with a combined name of the new item and the existing item. 
-        It also extends the original input list of the existing item with the original input list of the new item.
+        It extends the original input list of the existing item with the original input list of the new item,
+        and once the item has collected 'rename_after_merges' merges, updates its name with a combined name of all of them.
 
         Args:
             item_to_add (DeduplicatedItem): The new item to be added.
@@ -236,28 +919,491 @@ class SemanticDeduplicator:
         # Will edit this later if it becomes an issue
         top_item = similar_items[0][0]
 
-        # Get the index of the item you found similar in the existing list
-        index_of_item_being_edited = next(i for i, item in enumerate(self.deduplicated_items_list) if item.name == top_item.name)
-        
-        new_item_name = self.get_combined_items_name(item_to_add=item_to_add, existing_item=top_item)
+        if self._record_merge(top_item, item_to_add):
+            self._rename_merged_item(top_item)
+
+    def _record_merge(self, top_item, item_to_add):
+        # Adds the inputs and marks the item dirty, returns whether it is due to be renamed
+        self.instrumentation.count("merges")
 
-        top_item.update_item_name(background_context=self.background_context, new_item_name=new_item_name)
+        if self.embedding_mode == "centroid":
+            self._merge_centroid(top_item, item_to_add)
+
+        self._record_change("merged", top_item, len(top_item.original_input_list))
         top_item.original_input_list.extend(item_to_add.original_input_list)
+        self._remember_exact_matches(top_item, item_to_add.original_input_list)
+
+        # Only the names are kept for the rename, and no more of them than the group name prompt uses next to the item's own
+        pending_merges = self._pending_merges.setdefault(top_item.item_id, [0, []])
+        pending_merges[0] += 1
+        if len(pending_merges[1]) < GROUP_NAME_EXAMPLES - 1:
+            pending_merges[1].append(item_to_add.name)
+
+        return self.rename_after_merges is not None and pending_merges[0] >= self.rename_after_merges
+
+    def _merge_centroid(self, item, item_to_add):
+        # Adds the new member to the item's weighted mean in O(d), without an embedding request. The mean is not rescaled,
+        # the index compares directions, and rescaling would lose the magnitude the next merge needs
+        centroid, weight = self._centroid(item)
+        added_centroid, added_weight = self._centroid(item_to_add)
+
+        item.item_embedding = (weight * centroid + added_weight * added_centroid) / (weight + added_weight)
+        self._centroid_weights[item.item_id] = weight + added_weight
+        self._reindex(item)
+
+    def _reindex(self, item):
+        # An index bound to the store already picked up the new embedding when it was written, only other backends need telling
+        if getattr(item, "_store", None) is None or getattr(self.index, "store", None) is not item._store:
+            self.index.update(item)
+
+    def _centroid(self, item):
+        # The weighted mean an item stands for, and its weight. An item that never merged stands for its unit embedding,
+        # unless it has several inputs, like a batch group or a shard result, whose embedding already is the mean of its members
+        if item.item_id is not None and item.item_id in self._centroid_weights:
+            return np.asarray(item.item_embedding, dtype=np.float32), self._centroid_weights[item.item_id]
+
+        if len(item.original_input_list) > 1:
+            return np.asarray(item.item_embedding, dtype=np.float32), self._centroid_weight(item)
+
+        return normalize_embedding(item.item_embedding), self._centroid_weight(item)
+
+    def _add_repeat_to_centroid(self, item):
+        # A fast path repeat has no embedding of its own, it is the text of one of the item's inputs. It counts towards the
+        # weight at the current mean, so the weights keep matching the number of inputs
+        if item.item_id not in self._centroid_weights:
+            item.item_embedding, self._centroid_weights[item.item_id] = self._centroid(item)
+
+        self._centroid_weights[item.item_id] += 1
+
+    def _centroid_weight(self, item):
+        if item.item_id in self._centroid_weights:
+            return self._centroid_weights[item.item_id]
+
+        return max(len(item.original_input_list), 1) if self.centroid_weighting == "inputs" else 1
+
+    def _rename_merged_item(self, item):
+        # One rename and re-embedding for every merge the item collected since it was last named
+        merge_count, merged_names = self._pending_merges.pop(item.item_id, (0, []))
+
+        if merge_count:
+            new_item_name = self._merged_item_name(item, merge_count, merged_names)
+            previous_name = item.name
+
+            item.name = self._transform(new_item_name)
+            if self.embedding_mode == "name":
+                item.item_embedding = self._embed_one(item.name)
+            self._record_rename(item, previous_name)
+
+    def _merged_item_name(self, item, merge_count, merged_names):
+        if merge_count == 1:
+            with self.instrumentation.stage("combine_name"):
+                return self.chat_model.complete(**self._combined_items_name_request(merged_names[0], item.name))
+
+        with self.instrumentation.stage("group_name"):
+            return self.chat_model.complete(**self._group_name_request([item.name] + merged_names))
+
+    def _record_rename(self, item, previous_name):
+        # The rename may have re-embedded the item, keep the index row and the exact-match keys in sync
+        self.instrumentation.count("renames")
+        self._record_change("renamed", item)
+        if self.embedding_mode == "name":
+            self._reindex(item)
+        self._forget_exact_matches(item, [previous_name])
+        self._remember_exact_matches(item, [item.name] + item.original_input_list)
+
+    def flush(self, max_workers=8, embedding_batch_size=100):
+        """
+        Renames and re-embeds every item with merges still waiting on a rename, see 'rename_after_merges'.
+        The names are combined concurrently and the new names embedded in batches.
+
+        Args:
+            max_workers (int): The maximum number of concurrent API calls. Defaults to 8.
+            embedding_batch_size (int): The number of names sent per embedding request. Defaults to 100.
+        """
+
+        self._sync_items()
+        pending_merges, self._pending_merges = self._pending_merges, {}
+
+        # Items removed since their merges were recorded have nothing left to rename
+        dirty_items = [(self.get_item(item_id), merge_count, merged_names) for item_id, (merge_count, merged_names) in pending_merges.items() if item_id in self._slot_of_id]
+
+        if not dirty_items:
+            return
+
+        def new_name(dirty_item):
+            item, merge_count, merged_names = dirty_item
+            return self._transform(self._merged_item_name(item, merge_count, merged_names))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            item_names = list(executor.map(new_name, dirty_items))
+
+            if self.embedding_mode == "name":
+                item_embeddings = self._embed_in_batches(executor, item_names, embedding_batch_size)
+            else:
+                item_embeddings = [None] * len(item_names)
+
+        for (item, _, _), item_name, item_embedding in zip(dirty_items, item_names, item_embeddings):
+            previous_name = item.name
+            item.name = item_name
+            if item_embedding is not None:
+                item.item_embedding = item_embedding
+            self._record_rename(item, previous_name)
         
     def add_item_to_deduplicated_list(self, item_to_add):
-        self.deduplicated_items_list.append(item_to_add)
+        item_to_add.item_id = self._next_item_id
+        self._next_item_id += 1
+        self.instrumentation.count("items_added")
+
+        item_to_add.attach_to_store(self.embedding_store)
+        self._slot_of_id[item_to_add.item_id] = len(self._slots)
+        self._slots.append(item_to_add)
+        self.index.add(item_to_add)
+        self._remember_exact_matches(item_to_add, [item_to_add.name] + item_to_add.original_input_list)
+        self._record_change("added", item_to_add)
     
-    def add_single_items(self, items: List[str]):
+    def add_single_items(self, items: List[str], max_workers=8, embedding_batch_size=100):
         """
         This method takes a list of items as input and adds each item to the 'deduplicated_items_list'. 
         If an item is similar to an existing item in the list, it merges the two items.
 
+        The names are rewritten through a pool of 'max_workers' threads and embedded in batches of 'embedding_batch_size'
+        before deduplication runs, so bulk loads are bound by the API rate rather than round trip latency.
+        Items are deduplicated in the order given, the result is the same as calling 'add_single_item' on each.
+        Repeats, of earlier inputs or of each other, make no API calls when 'exact_match_fast_path' is on.
+
         Args:
             items (List[str]): The list of new items to be added.
+            max_workers (int): The maximum number of concurrent API calls. Defaults to 8.
+            embedding_batch_size (int): The number of names sent per embedding request. Defaults to 100.
         """
-        
+
+        items = list(items)
+        pending_items = self._items_needing_api_calls(items)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            item_names = list(executor.map(self._transform, pending_items))
+
+            item_embeddings = self._embed_in_batches(executor, item_names, embedding_batch_size)
+
+        prepared_items = self._prepared_by_input(pending_items, item_names, item_embeddings)
+
+        for item in items:
+            if self._add_exact_match(item):
+                continue
+
+            if prepared_items.get(item):
+                item_name, item_embedding = prepared_items[item].pop(0)
+            else:
+                # A repeat the fast path was expected to take, until a merge renamed its item or it split into several items
+                self._add_item_to_list(self._create_item(item, original_input=item))
+                continue
+
+            potential_item = DeduplicatedItem(item_name=item,
+                                              original_input=item,
+                                              background_context=self.background_context,
+                                              formatted_name=item_name,
+                                              item_embedding=item_embedding)
+
+            self._add_item_to_list(potential_item)
+
+    def _items_needing_api_calls(self, items):
+        # Items the exact-match fast path won't settle: new to the list, and not a repeat of an earlier item in this batch
+        if not self.exact_match_fast_path:
+            return list(items)
+
+        self._sync_items()
+        seen_keys = set()
+        pending_items = []
+
+        for item in items:
+            key = normalize_text(item) if isinstance(item, str) else item
+
+            if key not in seen_keys and not self._is_known_input(item):
+                pending_items.append(item)
+            seen_keys.add(key)
+
+        return pending_items
+
+    def _prepared_by_input(self, pending_items, item_names, item_embeddings):
+        # The names and embeddings worked out ahead of deduplication, by input, in the order they were given
+        prepared_items = {}
+
+        for item, item_name, item_embedding in zip(pending_items, item_names, item_embeddings):
+            prepared_items.setdefault(item, []).append((item_name, item_embedding))
+
+        return prepared_items
+
+    def add_items_from_stream(self, source, field=None, chunk_size=1000, checkpoint_path=None, checkpoint_every=10, start_offset=None, max_workers=8, embedding_batch_size=100):
+        """
+        Adds every item of a file or iterator, reading 'chunk_size' records at a time so memory stays bounded however long
+        the stream is. Each chunk goes through 'add_single_items'.
+
+        With a 'checkpoint_path', the deduplicator is saved there every 'checkpoint_every' chunks and once the stream ends,
+        along with 'stream_offset', the number of records already added. An interrupted job picks up where it stopped:
+            sd = SemanticDeduplicator.load(checkpoint_path)
+            sd.add_items_from_stream(source, checkpoint_path=checkpoint_path)
+        Items added after the last checkpoint are added again on resume, so checkpoint more often for costly streams.
+        Each checkpoint rewrites the whole list, so checkpoint less often for large ones.
+
+        Args:
+            source (str | iterable): A ".jsonl", ".csv" or plain text file path, or any iterable of strings or dicts, see stream.read_records.
+            field (str): Optional, the key or column holding the item in dict, JSONL and CSV records. Defaults to None.
+            chunk_size (int): The number of records added at a time. Defaults to 1000.
+            checkpoint_path (str): Optional, the directory checkpoints are saved to. Defaults to None (no checkpoints).
+            checkpoint_every (int): The number of chunks between checkpoints. Defaults to 10.
+            start_offset (int): Optional, the number of records to skip. Defaults to 'stream_offset', 0 unless the stream was interrupted.
+            max_workers (int): The maximum number of concurrent API calls. Defaults to 8.
+            embedding_batch_size (int): The number of names sent per embedding request. Defaults to 100.
+
+        Returns:
+            offset (int): The number of records read from the source, counting the skipped ones.
+        """
+
+        self.stream_offset = self.stream_offset if start_offset is None else start_offset
+        records = read_records(source, field=field, skip=self.stream_offset)
+        chunks = 0
+
+        while True:
+            chunk = list(itertools.islice(records, chunk_size))
+            if not chunk:
+                break
+
+            self.add_single_items([item for item in chunk if item is not None], max_workers=max_workers, embedding_batch_size=embedding_batch_size)
+            self.stream_offset += len(chunk)
+            self.instrumentation.count("stream_records", len(chunk))
+            chunks += 1
+
+            if checkpoint_path is not None and chunks % checkpoint_every == 0:
+                self._checkpoint(checkpoint_path)
+
+        if checkpoint_path is not None:
+            self._checkpoint(checkpoint_path)
+
+        # The checkpoint keeps the final offset, so resuming a finished stream adds nothing. This instance is ready for a new one
+        offset, self.stream_offset = self.stream_offset, 0
+        return offset
+
+    def _checkpoint(self, path):
+        with self.instrumentation.stage("checkpoint"):
+            self.save(path)
+
+    def _embed_in_batches(self, executor, strings, embedding_batch_size):
+        batches = [strings[i:i + embedding_batch_size] for i in range(0, len(strings), embedding_batch_size)]
+
+        return [embedding for batch in executor.map(self._embed, batches) for embedding in batch]
+
+    def deduplicate_batch(self, items: List[str], auto_merge_threshold=0.95, max_workers=8, embedding_batch_size=100, block_size=1024):
+        """
+        Deduplicates a static list of items in one pass instead of inserting them one at a time.
+        Every distinct item is embedded once, pairs above 'cosine_similarity_threshold' are found in blocks, and the items are
+        grouped into connected components. Groups joined only by ambiguous pairs, below 'auto_merge_threshold', are checked by
+        the LLM through one representative each, see '_verify_edges'. Each final group is then named with a single LLM call.
+
+        With 'similarity_scoring="batched"' the LLM calls scale with the number of groups rather than the number of items.
+        If the 'deduplicated_items_list' already has items, each group is added like a new item and may merge into them.
+
+        Args:
+            items (List[str]): The list of new items to be added.
+            auto_merge_threshold (float): Pairs with a cosine similarity at or above this are merged without asking the LLM. Defaults to 0.95.
+            max_workers (int): The maximum number of concurrent API calls. Defaults to 8.
+            embedding_batch_size (int): The number of strings sent per embedding request. Defaults to 100.
+            block_size (int): The number of rows per block when computing cosine similarities. Defaults to 1024.
+        """
+
+        # Repeats of inputs already in the list take the exact-match fast path. The remaining repeats are grouped up front,
+        # so only distinct items are embedded and compared
+        inputs_by_key = {}
         for item in items:
-            self.add_single_item(item)
+            if not self._add_exact_match(item):
+                key = normalize_text(item) if self.exact_match_fast_path else item
+                inputs_by_key.setdefault(key, []).append(item)
+
+        inputs_by_item = {inputs[0]: inputs for inputs in inputs_by_key.values()}
+        items = list(inputs_by_item)
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            item_embeddings = self._embed_in_batches(executor, items, embedding_batch_size)
+
+            sources, targets, scores = threshold_edges(item_embeddings, self.cosine_similarity_threshold, block_size=block_size)
+            groups = UnionFind(len(items))
+
+            for i, j in zip(sources[scores >= auto_merge_threshold].tolist(), targets[scores >= auto_merge_threshold].tolist()):
+                groups.union(i, j)
+
+            # Every pair was scored, the cosine tier accepts those merged outright and rejects those below 'cosine_similarity_threshold'
+            self._record_decisions(cosine_accept=int(np.count_nonzero(scores >= auto_merge_threshold)),
+                                   cosine_reject=len(items) * (len(items) - 1) // 2 - len(scores))
+
+            # The raw items as unnamed DeduplicatedItems, only used to build the LLM similarity prompts
+            raw_items = [DeduplicatedItem(item, original_input=item, formatted_name=item, item_embedding=item_embedding) for item, item_embedding in zip(items, item_embeddings)]
+            ambiguous_edges = list(zip(sources[scores < auto_merge_threshold].tolist(), targets[scores < auto_merge_threshold].tolist()))
+            self._verify_edges(executor, raw_items, ambiguous_edges, groups)
+
+            final_groups = groups.groups()
+            members = [[original_input for i in group for original_input in inputs_by_item[items[i]]] for group in final_groups]
+            group_names = list(executor.map(self.get_group_name, members))
+
+            if self.embedding_mode == "centroid":
+                group_embeddings = [self._group_centroid([normalize_embedding(item_embeddings[i]) for i in group], [len(inputs_by_item[items[i]]) for i in group])
+                                    for group in final_groups]
+            else:
+                group_embeddings = self._embed_in_batches(executor, group_names, embedding_batch_size)
+
+        add_directly = len(self._slot_of_id) == 0
+
+        for group, group_members, group_name, group_embedding in zip(final_groups, members, group_names, group_embeddings):
+            group_item = DeduplicatedItem(group_members[0],
+                                          background_context=self.background_context,
+                                          formatted_name=group_name,
+                                          item_embedding=group_embedding)
+            group_item.original_input_list = group_members
+
+            if add_directly:
+                self.add_item_to_deduplicated_list(group_item)
+                if self.embedding_mode == "centroid":
+                    self._centroid_weights[group_item.item_id] = len(group_members) if self.centroid_weighting == "inputs" else len(group)
+            else:
+                self._add_item_to_list(group_item)
+
+    def _verify_edges(self, executor, items, edges, groups):
+        """
+        Asks the LLM about candidate pairs and joins the groups it deems similar.
+
+        Groups are checked through representatives rather than edge by edge. Taking the groups with the most inputs first,
+        each one that is still unclaimed leads: its representative is scored against the representatives of its unclaimed
+        neighbours, and the ones that pass join it. Each leader asks about each neighbour once, and a claimed group is never asked
+        about again. With batched scoring each leader makes one request per 'scoring_batch_size' neighbours, so the LLM calls
+        scale with the number of groups rather than the number of items. A 'cross_check' settles the clear pairs before the
+        judge, and every decision is counted in 'cascade_decisions'.
+
+        Args:
+            executor (ThreadPoolExecutor): Runs up to 'max_verification_workers' leaders at a time.
+            items (list): The DeduplicatedItems the edges refer to by position.
+            edges (list): (i, j) pairs of positions, most similar first.
+            groups (UnionFind): The groups over the positions, updated in place.
+        """
+
+        # The member with the most inputs, or the earliest one, stands for each group
+        representatives = {}
+        for position in range(len(items)):
+            root = groups.find(position)
+            if root not in representatives or len(items[position].original_input_list) > len(items[representatives[root]].original_input_list):
+                representatives[root] = position
+
+        # Neighbouring groups, most similar first
+        neighbours = {}
+        for i, j in edges:
+            root_i, root_j = groups.find(i), groups.find(j)
+            if root_i != root_j:
+                neighbours.setdefault(root_i, {}).setdefault(root_j, None)
+                neighbours.setdefault(root_j, {}).setdefault(root_i, None)
+
+        leaders = sorted(neighbours, key=lambda root: (-len(items[representatives[root]].original_input_list), representatives[root]))
+        chunk_size = self.scoring_batch_size if self.similarity_scoring == "batched" else 1
+        claimed = set()
+        position = 0
+
+        # A wave takes up to 'max_verification_workers' leaders in order and ends before one whose neighbours an earlier leader
+        # of the wave is asking about, so the groups are the same as checking the leaders one at a time
+        while position < len(leaders):
+            wave, wave_roots = [], set()
+
+            while position < len(leaders) and len(wave) < max(self.max_verification_workers, 1):
+                leader = leaders[position]
+                candidates = [root for root in neighbours[leader] if root not in claimed]
+
+                if leader in claimed:
+                    position += 1
+                    continue
+
+                if leader in wave_roots or wave_roots.intersection(candidates):
+                    break
+
+                position += 1
+                claimed.add(leader)
+                if candidates:
+                    wave.append((leader, candidates))
+                    wave_roots.update([leader] + candidates)
+
+            # The pairs go through the same cascade as 'get_similar_items', past the cosine tier that 'auto_merge_threshold' already settled
+            accepted = []
+
+            if self.cross_check is not None:
+                cross_check_scores = executor.map(lambda request: self._cross_check_scores(items[representatives[request[0]]], [items[representatives[root]] for root in request[1]]),
+                                                  wave)
+                uncertain_wave = []
+
+                for (leader, candidates), scores in zip(wave, cross_check_scores):
+                    cross_check_accepted, uncertain = self._cross_check_tier(candidates, scores)
+                    accepted.extend((leader, root) for root, _ in cross_check_accepted)
+                    uncertain_wave.append((leader, uncertain))
+
+                wave = uncertain_wave
+
+            requests = [(leader, candidates[i:i + chunk_size]) for leader, candidates in wave for i in range(0, len(candidates), chunk_size)]
+            llm_similarities = executor.map(lambda request: self.get_llm_similarities(items[representatives[request[0]]], [items[representatives[root]] for root in request[1]]),
+                                            requests)
+
+            for (leader, candidates), candidate_similarities in zip(requests, llm_similarities):
+                accepted.extend((leader, root) for root, _ in self._judge_tier(candidates, candidate_similarities))
+
+            for leader, root in accepted:
+                groups.union(leader, root)
+                claimed.add(root)
+
+    def _group_centroid(self, centroids, input_counts):
+        # The weighted mean of the members' own means, built from embeddings already computed, so naming the group needs no embedding request
+        weights = input_counts if self.centroid_weighting == "inputs" else [1] * len(centroids)
+
+        return sum(weight * np.asarray(centroid, dtype=np.float32) for weight, centroid in zip(weights, centroids)) / sum(weights)
+
+    def get_group_name(self, members):
+        """
+        Names a group of items that were deemed similar with a single LLM call.
+        A group with one item is named the same way 'add_single_item' would name it.
+
+        Args:
+            members (list): The original inputs in the group.
+
+        Returns:
+            group_name (str): The name for the group.
+        """
+
+        if len(members) == 1:
+            return self._transform(members[0])
+
+        with self.instrumentation.stage("group_name"):
+            return self.chat_model.complete(**self._group_name_request(members))
+
+    def _group_name_request(self, members, max_examples=GROUP_NAME_EXAMPLES):
+        system_prompt = f"""
+        Your goal is to combine a group of similar items together into one item. They have been deemed similar and should be combined.
+        Example: "I went to the park" & "I went to outside" > "I went outside"
+        Example: "I want dark mode" & "I want two modes, light and dark" > "I want dark mode"
+
+        Make sure you lose minimal information about the items.
+
+        Here is background information from the user about the items.
+        Make sure to listen to the user and take their context into account.
+
+        % Start of background
+        {self.background_context}
+        % End of background
+
+        Respond with nothing else besides the new item name.
+        No not include any labels, or double-quotes
+        Capitalize the first letter of your response
+        """
+
+        # Large groups are summarized from a sample so the prompt stays small
+        member_lines = "\n".join(f"- {member}" for member in members[:max_examples])
+
+        human_prompt = f"""
+        Items:
+        {member_lines}
+        """
+
+        return {"system_prompt": system_prompt, "human_prompt": human_prompt}
 
     def get_combined_items_name(self, item_to_add, existing_item):
         """
@@ -272,6 +1418,11 @@ class SemanticDeduplicator:
             new_item_name (str): The combined name of the new item and the existing item.
         """        
 
+        with self.instrumentation.stage("combine_name"):
+            return self.chat_model.complete(**self._combined_items_name_request(item_to_add.name, existing_item.name))
+
+    def _combined_items_name_request(self, new_item_name, existing_item_name):
+
         system_prompt = f"""
         Your goal is to combine two different similar items together. They have been deemed similar and should be comebined.
         Example: "I went to the park" & "I went to outside" > "I went outside"
@@ -291,16 +1442,14 @@ class SemanticDeduplicator:
         """
 
         human_prompt = f"""
-        New Item: {item_to_add.name}
-        Existing Item: {existing_item.name}
+        New Item: {new_item_name}
+        Existing Item: {existing_item_name}
         """
 
-        new_item_name = call_llm(system_prompt=system_prompt, human_prompt=human_prompt)
-
-        return new_item_name
+        return {"system_prompt": system_prompt, "human_prompt": human_prompt}
 
     def delete_item_from_string(self, item_string):
-        item = DeduplicatedItem(item_name=item_string, background_context=self.background_context)
+        item = self._create_item(item_string)
 
         similarities = self.get_similar_items(item)
 
@@ -310,9 +1459,36 @@ class SemanticDeduplicator:
         else:
             top_item = similarities[0][0]
 
-            index_of_item_being_deleted = next(i for i, item in enumerate(self.deduplicated_items_list) if item.name == top_item.name)
+            self.remove_item_from_deduplicated_list(top_item)
 
-            self.deduplicated_items_list.pop(index_of_item_being_deleted)
+    def remove_item_from_deduplicated_list(self, item_to_remove):
+        """
+        Removes an item from the 'deduplicated_items_list', the index and the embedding store in O(1).
+
+        Args:
+            item_to_remove (DeduplicatedItem): The item to remove.
+        """
+
+        self._sync_items()
+
+        slot = self._slot_of_id.pop(item_to_remove.item_id)
+        deleted_item = self._slots[slot]
+        self._slots[slot] = None
+        self._tombstones += 1
+        self._discard_item(deleted_item)
+
+        if self._tombstones * 2 > len(self._slots):
+            self._compact()
+
+    def _discard_item(self, item):
+        # Everything a deleted item leaves behind besides its place in the list
+        self.instrumentation.count("deletions")
+        self._record_change("deleted", item)
+        self.index.remove(item)
+        self._forget_exact_matches(item)
+        self._pending_merges.pop(item.item_id, None)
+        self._centroid_weights.pop(item.item_id, None)
+        item.detach_from_store()
     
     def cosine_similarity(self, item, existing_item):
         # Calculate the dot product of the two vectors
@@ -345,7 +1521,16 @@ class SemanticDeduplicator:
         Returns:
             llm_similarity (int): The semantic similarity score between the two items, as determined by the Language Model.
         """
+
+        self.instrumentation.count("llm_verifications")
+        with self.instrumentation.stage("llm_similarity"):
+            llm_similarity = self.chat_model.complete(**self._llm_similarity_request(item_1, item_2))
         
+        llm_similarity = int(llm_similarity)
+
+        return llm_similarity
+
+    def _llm_similarity_request(self, item_1, item_2, model=None):
         system_prompt = f"""
         Your goal is to give a rating as to how semantically similar to items or phrases are together.
         You will be given two phrases.
@@ -374,42 +1559,396 @@ class SemanticDeduplicator:
         Item #2: {item_2.name}
         """
 
-        llm_similarity = call_llm(system_prompt=system_prompt,
-                                      human_prompt=human_prompt,
-                                      model=self.similarity_model)
+        return {"system_prompt": system_prompt,
+                "human_prompt": human_prompt,
+                "model": model or self.similarity_model}
+
+    def get_llm_similarities(self, item, existing_items):
+        """
+        Scores an item against several existing items with the Language Model.
+        With 'similarity_scoring' set to "batched" the candidates are scored in a single request per 'scoring_batch_size',
+        otherwise each pair is scored on its own.
+
+        Args:
+            item (DeduplicatedItem): The new item.
+            existing_items (list): The DeduplicatedItems to compare it to.
+
+        Returns:
+            llm_similarities (list): The 0-100 similarity score for each existing item, in the same order.
+        """
+
+        if self.similarity_scoring != "batched" or len(existing_items) <= 1:
+            return self._map_llm_similarity(item, existing_items)
+
+        llm_similarities = []
+
+        for i in range(0, len(existing_items), self.scoring_batch_size):
+            batch = existing_items[i:i + self.scoring_batch_size]
+
+            try:
+                self.instrumentation.count("llm_verifications", len(batch))
+                with self.instrumentation.stage("llm_similarity"):
+                    scores = self.chat_model.complete(**self._batched_llm_similarity_request(item, batch))
+                llm_similarities.extend(self._parse_batched_scores(scores, len(batch)))
+            except (ValueError, KeyError, TypeError):
+                # The model didn't return a usable score array, score these pairs one at a time instead
+                llm_similarities.extend(self._map_llm_similarity(item, batch))
+
+        return llm_similarities
+
+    def _batched_llm_similarity_request(self, item, existing_items):
+        system_prompt = f"""
+        Your goal is to give a rating as to how semantically similar a new item or phrase is to each of a list of existing items.
+        You will be given one new phrase and a numbered list of existing phrases.
+        Words which are interchangable should be considered similar. Ex: Awesome, cool, great, wonderful are all similar
+
+        Here is background information from the user about the items.
+        Make sure to listen to the user and take their context into account.
         
-        llm_similarity = int(llm_similarity)
+        % Start of background
+        {self.background_context}
+        % End of background
+        
+        Rate each existing item with a number 0-100, in the same order as the list
+        
+        100=Exact same phrase
+        0=Opposite phrase
 
-        return llm_similarity
+        Examples:
+        "I want to go to the park" > "Let's go to the park" = 95
+        "We went to the tall building" > "Skyscrapers are awesome" = 60
+        "I want ice cream" > "the horses name is bob" = 0
+        """
+
+        existing_item_lines = "\n".join(f"{i + 1}. {existing_item.name}" for i, existing_item in enumerate(existing_items))
+
+        human_prompt = f"""
+        New Item: {item.name}
+        Existing Items:
+        {existing_item_lines}
+        """
+
+        function_schema = [
+            {
+                "name": "score_existing_items",
+                "description": "Rate how similar the new item is to each existing item",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "items": {
+                            "type": "array",
+                            "description": "One 0-100 similarity score per existing item, in the same order as the list",
+                            "items": {
+                                "type" : "integer"
+                            }
+                        }
+                    }
+                }
+            }
+        ]
+
+        return {"system_prompt": system_prompt,
+                "human_prompt": human_prompt,
+                "function_schema": function_schema,
+                "model": self.similarity_model}
+
+    def _parse_batched_scores(self, scores, expected_length):
+        if not isinstance(scores, list) or len(scores) != expected_length:
+            raise ValueError(f"Expected {expected_length} similarity scores, got: {scores}")
+
+        return [int(score) for score in scores]
      
     def get_similar_items(self, item: DeduplicatedItem) -> List[DeduplicatedItem]:
         """
         The goal is to return items which are semantically similar to the one that is provided
         We'll first do a rough pass of cosine similarity to get candidates.
-        Then do a more thorough check with the LLM
+        Then do a more thorough check with the LLM, up to 'max_verification_workers' candidates at a time
+
+        Candidates go through a cascade and stop at the first tier that is sure about them:
+        'auto_accept_threshold' on the cosine similarity, then 'cross_check', then the 'similarity_model' judge.
+        The decisions of every tier are counted in 'cascade_decisions'.
         """
         similarities = []
 
-        # iterate through all existing items and check similarity
-
-        # First, get the cosine similarities for all the items in the list
-        cosine_similarities = [self.get_cosine_similarity(item, existing_item) for existing_item in self.deduplicated_items_list]
-
-        # Then find the ones that are above your first pass threshold
-        above_threshold_indexes = [i for i, sim in enumerate(cosine_similarities) if sim >= self.cosine_similarity_threshold]
+        # First, get the items above your first pass threshold with a single pass over the embedding index
+        cosine_candidates = self.get_cosine_candidates(item)
         
         # Then run through each item that was deemed similar via the cosine similarity and ask the LLM what it thinks
-        for index in above_threshold_indexes:
-            similar_item = self.deduplicated_items_list[index]
-            similar_item_name = similar_item.name
-            llm_sim = int(self.get_llm_similarity(item, similar_item)) / 100
-            if llm_sim >= self.llm_similarity_threshold:
-                # Append a tuple with your similar item and it's similarity score
-                similarities.append((similar_item, llm_sim))
+        for wave in self._verification_waves(cosine_candidates):
+            accepted, uncertain = self._cosine_tier(wave)
+            similarities.extend(accepted)
+
+            if len(uncertain) > 0 and self.cross_check is not None and not (self.early_exit and len(similarities) > 0):
+                accepted, uncertain = self._cross_check_tier(uncertain, self._cross_check_scores(item, uncertain))
+                similarities.extend(accepted)
+
+            if len(uncertain) > 0 and not (self.early_exit and len(similarities) > 0):
+                similarities.extend(self._judge_tier(uncertain, self.get_llm_similarities(item, uncertain)))
+
+            # Only the top match is ever merged, so best-first checking can stop at the first hit
+            if self.early_exit and len(similarities) > 0:
+                break
         
         # Return the similar items in descending order of similarity (most similar at the top)
         return sorted(similarities, key=lambda x: x[1], reverse=True)
+
+    def _cosine_tier(self, wave):
+        # Accepts the candidates at or above 'auto_accept_threshold', returns them with their cosine score and the others for the next tier
+        if self.auto_accept_threshold is None:
+            return [], [candidate for candidate, _ in wave]
+
+        accepted = [(candidate, float(cosine_similarity)) for candidate, cosine_similarity in wave if cosine_similarity >= self.auto_accept_threshold]
+        self._record_decisions(cosine_accept=len(accepted))
+
+        return accepted, [candidate for candidate, cosine_similarity in wave if cosine_similarity < self.auto_accept_threshold]
+
+    def _cross_check_tier(self, candidates, scores):
+        # Settles the candidates whose cross check score is outside the uncertain band, the rest are left for the judge
+        accepted, uncertain = [], []
+
+        for candidate, score in zip(candidates, scores):
+            score = int(score) / 100
+            if score >= self.cross_check_accept_threshold:
+                accepted.append((candidate, score))
+            elif score >= self.cross_check_reject_threshold:
+                uncertain.append(candidate)
+
+        self._record_decisions(cross_check_accept=len(accepted), cross_check_reject=len(candidates) - len(accepted) - len(uncertain))
+
+        return accepted, uncertain
+
+    def _judge_tier(self, candidates, llm_similarities):
+        accepted = [(candidate, int(llm_sim) / 100) for candidate, llm_sim in zip(candidates, llm_similarities)
+                    if int(llm_sim) / 100 >= self.llm_similarity_threshold]
+        self._record_decisions(judge_accept=len(accepted), judge_reject=len(candidates) - len(accepted))
+
+        return accepted
+
+    def _cross_check_scores(self, item, existing_items):
+        if callable(self.cross_check):
+            with self.instrumentation.stage("cross_check"):
+                return [self.cross_check(item.name, existing_item.name) for existing_item in existing_items]
+
+        return self._map_llm_similarity(item, existing_items, similarity=self._cross_check_similarity)
+
+    def _cross_check_similarity(self, item_1, item_2):
+        with self.instrumentation.stage("cross_check"):
+            return self.chat_model.complete(**self._llm_similarity_request(item_1, item_2, model=self.cross_check))
+
+    def _record_decisions(self, **decisions):
+        for decision, amount in decisions.items():
+            if amount > 0:
+                self.cascade_decisions[decision] += amount
+                self.instrumentation.count(decision, amount)
+
+    def _verification_waves(self, cosine_candidates):
+        # The candidates come in descending cosine order. With early exit, check them a wave of 'max_verification_workers' at a time
+        wave_size = max(self.max_verification_workers, 1) if self.early_exit else max(len(cosine_candidates), 1)
+
+        for i in range(0, len(cosine_candidates), wave_size):
+            yield cosine_candidates[i:i + wave_size]
+
+    def _map_llm_similarity(self, item, existing_items, similarity=None):
+        similarity = similarity or self.get_llm_similarity
+
+        if len(existing_items) <= 1 or self.max_verification_workers <= 1:
+            return [similarity(item, existing_item) for existing_item in existing_items]
+
+        with ThreadPoolExecutor(max_workers=min(self.max_verification_workers, len(existing_items))) as executor:
+            return list(executor.map(lambda existing_item: similarity(item, existing_item), existing_items))
+
+    def get_cosine_candidates(self, item):
+        """
+        Returns the existing items whose cosine similarity to the item is at or above 'cosine_similarity_threshold'.
+
+        Args:
+            item (DeduplicatedItem): The item to compare against the 'deduplicated_items_list'.
+
+        Returns:
+            candidates (list): (DeduplicatedItem, cosine_similarity) tuples in descending order of cosine similarity.
+        """
+
+        self._sync_items()
+
+        with self.instrumentation.stage("cosine_search"):
+            candidates, rejected = self.index.search_with_rejections(item.item_embedding,
+                                                                     threshold=self.cosine_similarity_threshold,
+                                                                     max_results=self.max_cosine_candidates)
+
+        self.instrumentation.count("cosine_candidates", len(candidates))
+        # The items scored below 'cosine_similarity_threshold', the first rejection of the cascade
+        self._record_decisions(cosine_reject=rejected or 0)
+
+        return candidates
+
     
+    def save(self, path):
+        """
+        Saves the deduplicator to a directory so it can be reopened with SemanticDeduplicator.load without re-embedding.
+        Item names, 'original_input_list's and settings go in a metadata file, and the embeddings in a raw float32 array
+        (stored unit length, which doesn't change any cosine similarity, except centroids, which keep their magnitude).
+
+        Args:
+            path (str): The directory to save to. It is created if it doesn't exist, and existing saves are overwritten.
+        """
+
+        # Merges waiting on a rename aren't saved, name the items first
+        self.flush()
+
+        os.makedirs(path, exist_ok=True)
+        items = self.deduplicated_items_list
+
+        # Write to temporary files and swap them in, so an interrupted save never leaves a half written state behind
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE + ".tmp")
+
+        if len(items) == 0:
+            with open(embeddings_path, "wb") as embeddings_file:
+                np.save(embeddings_file, np.empty((0, 0), dtype=np.float32))
+        else:
+            embeddings = np.lib.format.open_memmap(embeddings_path, mode="w+", dtype=np.float32, shape=(len(items), len(items[0].item_embedding)))
+            for row, item in enumerate(items):
+                # Centroids keep their magnitude, later merges are weighted by it
+                embeddings[row] = item.item_embedding if item.item_id in self._centroid_weights else normalize_embedding(item.item_embedding)
+            embeddings.flush()
+            del embeddings
+
+        metadata_path = os.path.join(path, METADATA_FILE + ".tmp")
+
+        with open(metadata_path, "w") as metadata_file:
+            json.dump({"version": 1,
+                       "settings": self._settings(),
+                       "next_item_id": self._next_item_id,
+                       "stream_offset": self.stream_offset,
+                       "multi_item_inputs": sorted(self._multi_item_inputs),
+                       "feed_version": self.version,
+                       "items": [self._item_metadata(item) for item in items]},
+                      metadata_file, separators=(",", ":"))
+
+        os.replace(embeddings_path, os.path.join(path, EMBEDDINGS_FILE))
+        os.replace(metadata_path, os.path.join(path, METADATA_FILE))
+
+    def _item_metadata(self, item):
+        metadata = {"item_id": item.item_id, "name": item.name, "original_input_list": item.original_input_list}
+
+        if item.item_id in self._centroid_weights:
+            metadata["centroid_weight"] = self._centroid_weights[item.item_id]
+
+        return metadata
+
+    @classmethod
+    def load(cls, path, openai_api_key='', candidate_index=None, cache=None, chat_model=None, embedder=None, instrumentation=None, scheduler=None):
+        """
+        Reopens a deduplicator saved with 'save'. The embeddings are memory-mapped rather than read onto the heap,
+        so large lists open quickly and only the rows that are touched get paged in. Items can be added as usual afterwards.
+
+        Args:
+            path (str): The directory the deduplicator was saved to.
+            openai_api_key (str): The API key for OpenAI. Defaults to the environment variable 'OPENAI_API_KEY'.
+            candidate_index (CandidateIndex): Optional, the backend used to retrieve cosine similarity candidates. Defaults to an ExactIndex.
+            cache (ResponseCache): Optional, a cache for embeddings and LLM responses. Defaults to None.
+            chat_model (ChatModel): Optional, the provider for LLM requests. Defaults to OpenAIChatModel.
+            embedder (Embedder): Optional, the provider for embeddings. Use the same kind the deduplicator was saved with. Defaults to OpenAIEmbedder.
+            instrumentation (Instrumentation): Optional, records stage timers, counters and token usage. Defaults to None (off).
+            scheduler (RequestScheduler): Optional, paces and retries every OpenAI request. Defaults to None.
+
+        Returns:
+            semantic_deduplicator (SemanticDeduplicator): The reopened deduplicator.
+        """
+
+        with open(os.path.join(path, METADATA_FILE)) as metadata_file:
+            metadata = json.load(metadata_file)
+
+        semantic_deduplicator = cls(openai_api_key=openai_api_key, candidate_index=candidate_index, cache=cache,
+                                    chat_model=chat_model, embedder=embedder, instrumentation=instrumentation, scheduler=scheduler,
+                                    **metadata["settings"])
+        semantic_deduplicator.stream_offset = metadata.get("stream_offset", 0)
+        semantic_deduplicator._multi_item_inputs = set(metadata.get("multi_item_inputs", []))
+        semantic_deduplicator._restart_change_feed(metadata.get("feed_version", 0))
+
+        if len(metadata["items"]) == 0:
+            return semantic_deduplicator
+
+        # A copy-on-write mapping, so rows can be edited in place without touching the file. The index reads the same rows
+        embeddings_path = os.path.join(path, EMBEDDINGS_FILE)
+        item_embeddings = np.load(embeddings_path, mmap_mode="c")
+
+        if len(item_embeddings) != len(metadata["items"]):
+            raise ValueError(f"{embeddings_path} has {len(item_embeddings)} embeddings but the metadata lists {len(metadata['items'])} items")
+
+        items = []
+        for slot, saved_item in zip(semantic_deduplicator.embedding_store.adopt(item_embeddings), metadata["items"]):
+            items.append(DeduplicatedItem.from_store(saved_item["name"], saved_item["original_input_list"], semantic_deduplicator.embedding_store, slot,
+                                                     item_id=saved_item.get("item_id")))
+
+        semantic_deduplicator.deduplicated_items_list = items
+        semantic_deduplicator._restart_change_feed(metadata.get("feed_version", 0))
+        semantic_deduplicator._centroid_weights = {item.item_id: saved_item["centroid_weight"] for item, saved_item in zip(items, metadata["items"]) if "centroid_weight" in saved_item}
+        semantic_deduplicator._next_item_id = max(semantic_deduplicator._next_item_id, metadata.get("next_item_id", 0))
+        semantic_deduplicator.index.rebuild_from_matrix(items, item_embeddings)
+
+        return semantic_deduplicator
+
+    def _settings(self):
+        # The constructor arguments that are saved along with the items
+        return {"background_context": self.background_context,
+                "llm_similarity_threshold": self.llm_similarity_threshold,
+                "cosine_similarity_threshold": self.cosine_similarity_threshold,
+                "similarity_model": self.similarity_model,
+                "extraction_model": self.extraction_model,
+                "max_cosine_candidates": self.max_cosine_candidates,
+                "max_concurrency": self.max_concurrency,
+                "max_verification_workers": self.max_verification_workers,
+                "early_exit": self.early_exit,
+                "similarity_scoring": self.similarity_scoring,
+                "scoring_batch_size": self.scoring_batch_size,
+                "embedding_dtype": self.embedding_store.dtype.name,
+                "exact_match_fast_path": self.exact_match_fast_path,
+                "rename_after_merges": self.rename_after_merges,
+                "embedding_mode": self.embedding_mode,
+                "centroid_weighting": self.centroid_weighting,
+                "auto_accept_threshold": self.auto_accept_threshold,
+                "cross_check": self.cross_check if isinstance(self.cross_check, str) else None,
+                "cross_check_reject_threshold": self.cross_check_reject_threshold,
+                "cross_check_accept_threshold": self.cross_check_accept_threshold,
+                "max_changes": self._changes.maxlen}
+
+    def export(self, file, format="jsonl"):
+        """
+        Writes the list to a file one item at a time, so large lists are never held in memory as one string.
+        Items have the same keys as the "dict_list" format of 'get_formatted_deduplicated_list', plus their 'Item ID'.
+
+        Args:
+            file (str | file): A path, or a text file handle to write to (left open).
+            format (str): "jsonl" for one JSON object per line, or "json" for a single JSON array. Defaults to "jsonl".
+
+        Returns:
+            version (int): The version the export reflects, to follow up with 'get_changes'.
+        """
+
+        if format not in ("jsonl", "json"):
+            raise ValueError(f"Invalid format: {format}. Expected one of: 'jsonl', 'json'")
+
+        if isinstance(file, (str, os.PathLike)):
+            with open(file, "w", encoding="utf-8") as file_handle:
+                return self.export(file_handle, format=format)
+
+        self.flush()
+
+        if format == "json":
+            file.write("[")
+
+        for i, item in enumerate(self.deduplicated_items_list):
+            if format == "json":
+                file.write("," if i > 0 else "")
+                json.dump(self._change_entry(item), file)
+            else:
+                file.write(json.dumps(self._change_entry(item)) + "\n")
+
+        if format == "json":
+            file.write("]")
+
+        return self.version
+
     def get_formatted_deduplicated_list(self, get_type="string_list"):
         """
         Pretty print the list contents
@@ -419,6 +1958,8 @@ class SemanticDeduplicator:
                 "dict_list": Prints the list of deduplicated items as a list of dictionaries, with each dictionary representing an item and the original values as a list of strings
                 "json": Prints the list of deduplicated items in JSON format.
         """
+        self.flush()
+
         if get_type == "string_list":
             return ', '.join([item.name for item in self.deduplicated_items_list])
 
@@ -430,3 +1971,235 @@ class SemanticDeduplicator:
 
         else:
             raise ValueError(f"Invalid get_type: {get_type}. Expected one of: 'string_list', 'dict_list', 'json'")
+
+    async def aadd_item(self, item):
+        """
+        The coroutine version of add_item. The extracted items are transformed and embedded concurrently, then added in order.
+        """
+
+        items = await self._alimited(self.chat_model.acomplete(**self._parse_items_request(item)), stage="parse_items")
+
+        if len(items) > 1:
+            self._mark_multi_item_inputs([item])
+
+        potential_items = await asyncio.gather(*[self._acreate_item(extracted_item, original_input=item) for extracted_item in items])
+
+        for potential_item in potential_items:
+            await self._aadd_item_to_list(potential_item)
+
+    async def aadd_single_item(self, item):
+        """
+        The coroutine version of add_single_item.
+
+        Args:
+            item (str): The item to be added to the 'deduplicated_items_list'.
+        """
+
+        if self._add_exact_match(item):
+            return
+
+        potential_item = await self._acreate_item(item, original_input=item)
+
+        # A concurrent add may have brought in the same input while this one was being prepared
+        if self._add_exact_match(item):
+            return
+
+        await self._aadd_item_to_list(potential_item)
+
+    async def aadd_single_items(self, items: List[str], embedding_batch_size=100):
+        """
+        The coroutine version of add_single_items. Names are rewritten and embedded concurrently, bounded by 'max_concurrency',
+        then the items are deduplicated in the order given.
+
+        Args:
+            items (List[str]): The list of new items to be added.
+            embedding_batch_size (int): The number of names sent per embedding request. Defaults to 100.
+        """
+
+        items = list(items)
+        pending_items = self._items_needing_api_calls(items)
+
+        item_names = await asyncio.gather(*[self._alimited(atransform_item_name(self.background_context, item, chat_model=self.chat_model), stage="transform_item_name")
+                                            for item in pending_items])
+
+        batches = [item_names[i:i + embedding_batch_size] for i in range(0, len(item_names), embedding_batch_size)]
+        embedding_batches = await asyncio.gather(*[self._alimited(self.embedder.aembed(batch), stage="embedding") for batch in batches])
+        item_embeddings = [embedding for batch in embedding_batches for embedding in batch]
+        prepared_items = self._prepared_by_input(pending_items, item_names, item_embeddings)
+
+        for item in items:
+            if self._add_exact_match(item):
+                continue
+
+            if prepared_items.get(item):
+                item_name, item_embedding = prepared_items[item].pop(0)
+            else:
+                # A repeat the fast path was expected to take, until a merge renamed its item, it split into several items,
+                # or a concurrent change removed it
+                potential_item = await self._acreate_item(item, original_input=item)
+                await self._aadd_item_to_list(potential_item)
+                continue
+
+            potential_item = DeduplicatedItem(item_name=item,
+                                              original_input=item,
+                                              background_context=self.background_context,
+                                              formatted_name=item_name,
+                                              item_embedding=item_embedding)
+
+            await self._aadd_item_to_list(potential_item)
+
+    async def adelete_item_from_string(self, item_string):
+        """
+        The coroutine version of delete_item_from_string.
+        """
+
+        item = await self._acreate_item(item_string)
+
+        _, mutation_lock = self._async_primitives()
+        async with mutation_lock:
+            similarities = await self.aget_similar_items(item)
+
+            if len(similarities) > 0:
+                self.remove_item_from_deduplicated_list(similarities[0][0])
+
+    async def aget_similar_items(self, item):
+        """
+        The coroutine version of get_similar_items. The cosine candidates are checked by the LLM concurrently.
+        """
+
+        similarities = []
+
+        for wave in self._verification_waves(self.get_cosine_candidates(item)):
+            accepted, uncertain = self._cosine_tier(wave)
+            similarities.extend(accepted)
+
+            if len(uncertain) > 0 and self.cross_check is not None and not (self.early_exit and len(similarities) > 0):
+                accepted, uncertain = self._cross_check_tier(uncertain, await self._across_check_scores(item, uncertain))
+                similarities.extend(accepted)
+
+            if len(uncertain) > 0 and not (self.early_exit and len(similarities) > 0):
+                similarities.extend(self._judge_tier(uncertain, await self.aget_llm_similarities(item, uncertain)))
+
+            if self.early_exit and len(similarities) > 0:
+                break
+
+        return sorted(similarities, key=lambda x: x[1], reverse=True)
+
+    async def aget_llm_similarities(self, item, existing_items):
+        """
+        The coroutine version of get_llm_similarities. Pairwise scores and scoring batches are requested concurrently.
+        """
+
+        if self.similarity_scoring != "batched" or len(existing_items) <= 1:
+            return list(await asyncio.gather(*[self.aget_llm_similarity(item, existing_item) for existing_item in existing_items]))
+
+        batches = [existing_items[i:i + self.scoring_batch_size] for i in range(0, len(existing_items), self.scoring_batch_size)]
+        batch_scores = await asyncio.gather(*[self._ascore_batch(item, batch) for batch in batches])
+
+        return [score for scores in batch_scores for score in scores]
+
+    async def _ascore_batch(self, item, existing_items):
+        try:
+            self.instrumentation.count("llm_verifications", len(existing_items))
+            scores = await self._alimited(self.chat_model.acomplete(**self._batched_llm_similarity_request(item, existing_items)), stage="llm_similarity")
+            return self._parse_batched_scores(scores, len(existing_items))
+        except (ValueError, KeyError, TypeError):
+            return list(await asyncio.gather(*[self.aget_llm_similarity(item, existing_item) for existing_item in existing_items]))
+
+    async def _across_check_scores(self, item, existing_items):
+        if callable(self.cross_check):
+            return self._cross_check_scores(item, existing_items)
+
+        return list(await asyncio.gather(*[self._alimited(self.chat_model.acomplete(**self._llm_similarity_request(item, existing_item, model=self.cross_check)), stage="cross_check")
+                                           for existing_item in existing_items]))
+
+    async def aget_llm_similarity(self, item_1, item_2):
+        self.instrumentation.count("llm_verifications")
+        llm_similarity = await self._alimited(self.chat_model.acomplete(**self._llm_similarity_request(item_1, item_2)), stage="llm_similarity")
+
+        return int(llm_similarity)
+
+    async def acombine_item_with_existing_item(self, item_to_add, similar_items):
+        """
+        The coroutine version of combine_item_with_existing_item.
+        """
+
+        top_item = similar_items[0][0]
+
+        if self._record_merge(top_item, item_to_add):
+            await self._arename_merged_item(top_item)
+
+    async def _arename_merged_item(self, item):
+        merge_count, merged_names = self._pending_merges.pop(item.item_id, (0, []))
+
+        if merge_count:
+            if merge_count == 1:
+                request, stage = self._combined_items_name_request(merged_names[0], item.name), "combine_name"
+            else:
+                request, stage = self._group_name_request([item.name] + merged_names), "group_name"
+
+            new_item_name = await self._alimited(self.chat_model.acomplete(**request), stage=stage)
+            previous_name = item.name
+
+            item.name = await self._alimited(atransform_item_name(self.background_context, new_item_name, chat_model=self.chat_model), stage="transform_item_name")
+            if self.embedding_mode == "name":
+                item.item_embedding = await self._alimited(self.embedder.aembed_one(item.name), stage="embedding")
+            self._record_rename(item, previous_name)
+
+    async def aflush(self):
+        """
+        The coroutine version of flush.
+        """
+
+        _, mutation_lock = self._async_primitives()
+        async with mutation_lock:
+            self._sync_items()
+            item_ids = [item_id for item_id in self._pending_merges if item_id in self._slot_of_id]
+            await asyncio.gather(*[self._arename_merged_item(self.get_item(item_id)) for item_id in item_ids])
+            self._pending_merges.clear()
+
+    async def _aadd_item_to_list(self, item):
+        # Finding candidates and merging must happen as one step, otherwise two concurrent adds can both miss each other
+        _, mutation_lock = self._async_primitives()
+        async with mutation_lock:
+            if len(self._slot_of_id) == 0:
+                self.add_item_to_empty_list(item)
+                return
+
+            similar_items = await self.aget_similar_items(item)
+
+            if len(similar_items) == 0:
+                self.add_new_item_to_list(item)
+            else:
+                await self.acombine_item_with_existing_item(item, similar_items)
+
+    async def _acreate_item(self, item_name, original_input=None):
+        formatted_name = await self._alimited(atransform_item_name(self.background_context, item_name, chat_model=self.chat_model), stage="transform_item_name")
+        item_embedding = await self._alimited(self.embedder.aembed_one(formatted_name), stage="embedding")
+
+        return DeduplicatedItem(item_name=item_name,
+                                original_input=original_input,
+                                background_context=self.background_context,
+                                formatted_name=formatted_name,
+                                item_embedding=item_embedding)
+
+    async def _alimited(self, awaitable, stage=None):
+        # Stages are timed once the semaphore is acquired, so they don't include time spent queueing
+        semaphore, _ = self._async_primitives()
+        async with semaphore:
+            if stage is None:
+                return await awaitable
+
+            with self.instrumentation.stage(stage):
+                return await awaitable
+
+    def _async_primitives(self):
+        # asyncio primitives belong to the event loop they are first used in, so create them once per loop
+        loop = asyncio.get_running_loop()
+
+        if self._async_loop is not loop:
+            self._async_loop = loop
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            self._mutation_lock = asyncio.Lock()
+
+        return self._semaphore, self._mutation_lock
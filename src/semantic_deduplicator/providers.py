@@ -0,0 +1,253 @@
+import hashlib
+import re
+import threading
+
+import numpy as np
+
+from .utils import call_llm, acall_llm, get_embedding, get_embeddings, aget_embedding, aget_embeddings, EMBEDDING_MODEL
+
+
+class ChatModel:
+    """
+    The interface SemanticDeduplicator uses to talk to a chat model.
+
+    Every request is a system prompt, a human prompt, an optional function schema and the name of the model the prompt
+    was written for. Plain requests return the response text, function calling requests return the parsed 'items' list.
+    """
+
+    # Whether SemanticDeduplicator needs an OpenAI API key to use this provider
+    requires_openai_api_key = False
+
+    # Set by SemanticDeduplicator when instrumentation is on, for providers that report token usage, retries and cache hits
+    instrumentation = None
+
+    def complete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        raise NotImplementedError
+
+    async def acomplete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        # Providers without a native async client answer in place
+        return self.complete(system_prompt, human_prompt, function_schema, model)
+
+
+class Embedder:
+    """
+    The interface SemanticDeduplicator uses to embed strings. 'embed' takes a batch and returns one vector per string, in order.
+    """
+
+    requires_openai_api_key = False
+    instrumentation = None
+
+    def embed(self, strings):
+        raise NotImplementedError
+
+    def embed_one(self, string):
+        return self.embed([string])[0]
+
+    async def aembed(self, strings):
+        return self.embed(strings)
+
+    async def aembed_one(self, string):
+        return (await self.aembed([string]))[0]
+
+
+class OpenAIChatModel(ChatModel):
+    requires_openai_api_key = True
+
+    def __init__(self, model=None):
+        """
+        Chat completions from the OpenAI API, with the retries and the ResponseCache in utils. This is the default.
+
+        Args:
+            model (str): Optional, the model used for requests that don't ask for one, e.g. naming. Requests that name a model,
+                like the 'similarity_model' and 'extraction_model' ones, still go to that model. Defaults to None (call_llm's default).
+        """
+        self.model = model
+
+    def complete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        return call_llm(system_prompt, human_prompt, function_schema, instrumentation=self.instrumentation, **self._model_kwargs(model))
+
+    async def acomplete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        return await acall_llm(system_prompt, human_prompt, function_schema, instrumentation=self.instrumentation, **self._model_kwargs(model))
+
+    def _model_kwargs(self, model):
+        # Leave the model out entirely when none is set, so call_llm's own default applies
+        model = model or self.model
+        return {} if model is None else {"model": model}
+
+
+class OpenAIEmbedder(Embedder):
+    requires_openai_api_key = True
+
+    def __init__(self, model=EMBEDDING_MODEL):
+        """
+        Embeddings from the OpenAI API. Batches go out as one multi-input request. This is the default.
+
+        Args:
+            model (str): The embedding model. Defaults to "text-embedding-ada-002".
+        """
+        self.model = model
+
+    def embed(self, strings):
+        return get_embeddings(strings, model=self.model, instrumentation=self.instrumentation)
+
+    def embed_one(self, string):
+        return get_embedding(string, model=self.model, instrumentation=self.instrumentation)
+
+    async def aembed(self, strings):
+        return await aget_embeddings(strings, model=self.model, instrumentation=self.instrumentation)
+
+    async def aembed_one(self, string):
+        return await aget_embedding(string, model=self.model, instrumentation=self.instrumentation)
+
+
+def _words(text):
+    return re.findall(r"\w+", text.lower())
+
+
+class HashedNgramEmbedder(Embedder):
+    def __init__(self, dimension=512, ngram_sizes=(3, 4), seed=0):
+        """
+        A CPU-local embedder with no model to download. Each string is a bag of its words and of the character n-grams
+        of those words, hashed into a fixed number of signed buckets and scaled to unit length.
+
+        Strings sharing words or spellings land close together, which is enough to find cosine candidates offline, in tests
+        and in benchmarks. It does not know synonyms. The output only depends on the text, the settings and the seed.
+
+        Args:
+            dimension (int): The length of each embedding. Defaults to 512.
+            ngram_sizes (tuple): The character n-gram lengths used alongside whole words. Defaults to (3, 4).
+            seed (int): Changes the hash, and with it every embedding. Defaults to 0.
+        """
+
+        self.dimension = dimension
+        self.ngram_sizes = tuple(ngram_sizes)
+        self.seed = seed
+        self._features_of_word = {}
+
+    def embed(self, strings):
+        """
+        Embeds a batch of strings at once.
+
+        Args:
+            strings (list): The strings to embed.
+
+        Returns:
+            embeddings (np.array): A (len(strings), dimension) float32 array with one unit length row per string.
+        """
+
+        rows, columns, signs = [], [], []
+
+        for row, string in enumerate(strings):
+            for word in _words(string):
+                word_columns, word_signs = self._features(word)
+                rows.append(np.full(len(word_columns), row))
+                columns.append(word_columns)
+                signs.append(word_signs)
+
+        embeddings = np.zeros((len(strings), self.dimension), dtype=np.float32)
+
+        if rows:
+            np.add.at(embeddings, (np.concatenate(rows), np.concatenate(columns)), np.concatenate(signs))
+
+        norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+        return embeddings / np.where(norms == 0, 1, norms)
+
+    def _features(self, word):
+        # Words repeat a lot across a dataset, so their hashed features are worked out once
+        features = self._features_of_word.get(word)
+
+        if features is None:
+            padded = f"<{word}>"
+            grams = [word] + [padded[i:i + size] for size in self.ngram_sizes for i in range(len(padded) - size + 1)]
+            hashes = [int.from_bytes(hashlib.blake2b(gram.encode("utf-8"), digest_size=8, salt=self.seed.to_bytes(16, "little")).digest(), "little")
+                      for gram in grams]
+
+            columns = np.array([value % self.dimension for value in hashes], dtype=np.int64)
+            signs = np.array([1.0 if (value >> 63) & 1 else -1.0 for value in hashes], dtype=np.float32)
+
+            # Whole words weigh as much as all of their n-grams together
+            signs[0] *= max(len(grams) - 1, 1)
+            features = self._features_of_word[word] = (columns, signs)
+
+        return features
+
+
+def word_overlap(text_1, text_2):
+    """
+    The share of words two strings have in common (Jaccard similarity) as a 0-100 score.
+    """
+    words_1, words_2 = set(_words(text_1)), set(_words(text_2))
+    return int(100 * len(words_1 & words_2) / max(len(words_1 | words_2), 1))
+
+
+class ScriptedChatModel(ChatModel):
+    def __init__(self, rules=None, similarity=word_overlap):
+        """
+        A deterministic stand-in for the chat model, for tests, CI and benchmarks with no API latency.
+
+        Requests are first matched against 'rules', a list of (pattern, response) pairs. The first pattern found in the
+        human prompt wins and its response is returned as is, or called with the regex match if it is callable.
+        Anything else is answered from the prompts SemanticDeduplicator sends:
+            - Names are kept as given, with the first letter capitalized.
+            - Submissions are split into items on commas, semicolons and " and ", one by one or in numbered batches.
+            - Similarity is scored with 'similarity', word overlap by default.
+            - Combined and group names keep the existing, or first, item's name.
+
+        Args:
+            rules (list): Optional, (regex, response) pairs checked before the defaults. Defaults to None.
+            similarity (callable): Scores two strings from 0 to 100. Defaults to word_overlap.
+        """
+
+        self.rules = [(re.compile(pattern), response) for pattern, response in (rules or [])]
+        self.similarity = similarity
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # Locks can't be pickled, so each copy sent to a shard process gets its own
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def complete(self, system_prompt, human_prompt, function_schema=[], model=None):
+        with self._lock:
+            self.calls += 1
+
+        for pattern, response in self.rules:
+            match = pattern.search(human_prompt)
+            if match:
+                return response(match) if callable(response) else response
+
+        schema_name = function_schema[0]["name"] if function_schema else None
+
+        if schema_name == "score_existing_items":
+            new_item = human_prompt.split("New Item:")[1].split("Existing Items:")[0]
+            existing_items = re.findall(r"^\s*\d+\. (.*)$", human_prompt, flags=re.MULTILINE)
+            return [self.similarity(new_item, existing_item) for existing_item in existing_items]
+
+        if schema_name == "extract_items_from_submissions":
+            return [{"submission": int(number), "items": self._split_items(submission)}
+                    for number, submission in re.findall(r"^Submission (\d+): (.*)$", human_prompt, flags=re.MULTILINE)]
+
+        if schema_name is not None:
+            return self._split_items(human_prompt)
+
+        if "Item #1:" in human_prompt:
+            item_1, item_2 = human_prompt.split("Item #1:")[1].split("Item #2:")
+            return str(self.similarity(item_1, item_2))
+
+        if "Items:" in human_prompt:
+            return re.findall(r"^\s*- (.*)$", human_prompt, flags=re.MULTILINE)[0].strip()
+
+        if "Existing Item:" in human_prompt:
+            return human_prompt.split("Existing Item:")[1].strip()
+
+        name = human_prompt.split("Here is my item:")[-1].strip()
+        return name[:1].upper() + name[1:]
+
+    def _split_items(self, submission):
+        return [part.strip() for part in re.split(r",|;| and ", submission) if part.strip()]
@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+import itertools
+import random
+import threading
+import time
+
+import openai
+
+# Errors worth retrying: the request was never served, or the quota was exceeded
+RETRYABLE_ERRORS = (openai.error.RateLimitError,
+                    openai.error.ServiceUnavailableError,
+                    openai.error.Timeout,
+                    openai.error.TryAgain,
+                    openai.error.APIConnectionError)
+
+
+class TokenBucket:
+    def __init__(self, per_minute):
+        """
+        Allows up to 'per_minute' units a minute, refilled continuously, with bursts of up to a minute's worth.
+        """
+        self.capacity = float(per_minute)
+        self.rate = per_minute / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        # The seconds until 'amount' is available, 0 if it already is
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount, now):
+        self._refill(now)
+        self.level -= min(amount, self.capacity)
+
+    def give_back(self, amount):
+        self.level = min(self.capacity, self.level + amount)
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RequestScheduler:
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_attempts=6, initial_backoff=1.0, max_backoff=60.0, priorities=None):
+        """
+        A client side scheduler shared by every chat and embedding request, see utils.set_scheduler.
+
+        Requests wait for room in a requests per minute and a tokens per minute bucket before they are sent, so concurrent
+        workers use the quota without tripping it. Waiting requests go in priority order, then first come first served.
+        Rate limit, timeout and other transient errors are retried with jittered exponential backoff, honouring Retry-After.
+
+        Args:
+            requests_per_minute (int): Optional, the request quota. Defaults to None (no limit).
+            tokens_per_minute (int): Optional, the token quota. Tokens are estimated up front and corrected from the reported usage. Defaults to None (no limit).
+            max_attempts (int): The attempts per request, including the first. Defaults to 6.
+            initial_backoff (float): The longest sleep in seconds after the first failure, doubled after each one. Defaults to 1.0.
+            max_backoff (float): The cap on a single backoff in seconds. Defaults to 60.
+            priorities (dict): Optional, lower goes first, looked up by model name and then by kind ("chat" or "embedding").
+                Defaults to embeddings ahead of chat requests.
+        """
+
+        self.max_attempts = max_attempts
+        self.initial_backoff = initial_backoff
+        self.max_backoff = max_backoff
+        self.priorities = priorities if priorities is not None else {"embedding": 0, "chat": 1}
+
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self._condition = threading.Condition()
+        self._waiting = []
+        self._sequence = itertools.count()
+
+    def run(self, kind, model, estimated_tokens, request, instrumentation=None):
+        """
+        Sends a request once there is room for it, retrying transient errors.
+
+        Args:
+            kind (str): "chat" or "embedding".
+            model (str): The model the request goes to, used for priorities.
+            estimated_tokens (int): The tokens the request is expected to use.
+            request (callable): Makes the request and returns the response.
+            instrumentation (Instrumentation): Optional, counts retries and times waits for the quota. Defaults to None.
+
+        Returns:
+            response: Whatever 'request' returned.
+        """
+
+        for attempt in range(self.max_attempts):
+            self._acquire(self._priority(kind, model), estimated_tokens, instrumentation)
+
+            try:
+                return request()
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                self._record_retry(instrumentation)
+                time.sleep(self._backoff(attempt, error))
+
+    async def arun(self, kind, model, estimated_tokens, request, instrumentation=None):
+        """
+        The coroutine version of run. 'request' returns an awaitable, and waiting never blocks the event loop.
+        """
+
+        for attempt in range(self.max_attempts):
+            await self._aacquire(self._priority(kind, model), estimated_tokens, instrumentation)
+
+            try:
+                return await request()
+            except RETRYABLE_ERRORS as error:
+                if attempt == self.max_attempts - 1:
+                    raise
+
+                self._record_retry(instrumentation)
+                await asyncio.sleep(self._backoff(attempt, error))
+
+    def settle(self, estimated_tokens, used_tokens):
+        """
+        Corrects the token bucket once a response reports how many tokens the request really used.
+        """
+        if self._token_bucket is None or used_tokens is None:
+            return
+
+        with self._condition:
+            if used_tokens < estimated_tokens:
+                self._token_bucket.give_back(estimated_tokens - used_tokens)
+            else:
+                self._token_bucket.take(used_tokens - estimated_tokens, time.monotonic())
+            self._condition.notify_all()
+
+    def _priority(self, kind, model):
+        return self.priorities.get(model, self.priorities.get(kind, 0))
+
+    def _backoff(self, attempt, error):
+        # Full jitter spreads out workers that failed together, a Retry-After from the server is a lower bound
+        backoff = random.uniform(0, min(self.max_backoff, self.initial_backoff * (2 ** attempt)))
+        headers = getattr(error, "headers", None) or {}
+        retry_after = headers.get("retry-after", headers.get("Retry-After"))
+
+        try:
+            return max(backoff, min(float(retry_after), self.max_backoff)) if retry_after is not None else backoff
+        except ValueError:
+            return backoff
+
+    def _record_retry(self, instrumentation):
+        if instrumentation is not None:
+            instrumentation.count("retries")
+
+    def _try_reserve(self, ticket, tokens):
+        # Called with the lock held. Returns 0 once the ticket is at the front and its request is reserved, else the seconds to wait
+        if self._waiting[0] != ticket:
+            return None
+
+        now = time.monotonic()
+        wait = max(self._request_bucket.wait_time(1, now) if self._request_bucket else 0.0,
+                   self._token_bucket.wait_time(tokens, now) if self._token_bucket else 0.0)
+
+        if wait > 0:
+            return wait
+
+        if self._request_bucket:
+            self._request_bucket.take(1, now)
+        if self._token_bucket:
+            self._token_bucket.take(tokens, now)
+
+        heapq.heappop(self._waiting)
+        self._condition.notify_all()
+        return 0.0
+
+    def _acquire(self, priority, tokens, instrumentation):
+        if self._request_bucket is None and self._token_bucket is None:
+            return
+
+        start = time.perf_counter()
+
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+
+            while True:
+                wait = self._try_reserve(ticket, tokens)
+                if wait == 0:
+                    break
+                self._condition.wait(timeout=wait)
+
+        self._record_wait(instrumentation, start)
+
+    async def _aacquire(self, priority, tokens, instrumentation):
+        if self._request_bucket is None and self._token_bucket is None:
+            return
+
+        start = time.perf_counter()
+
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+
+        try:
+            while True:
+                with self._condition:
+                    wait = self._try_reserve(ticket, tokens)
+                if wait == 0:
+                    break
+                # Not at the front yet, or waiting on the buckets. Check again shortly without holding up the event loop
+                await asyncio.sleep(min(wait or 0.01, 0.05))
+        except asyncio.CancelledError:
+            with self._condition:
+                if ticket in self._waiting:
+                    self._waiting.remove(ticket)
+                    heapq.heapify(self._waiting)
+                    self._condition.notify_all()
+            raise
+
+        self._record_wait(instrumentation, start)
+
+    def _record_wait(self, instrumentation, start):
+        if instrumentation is not None:
+            instrumentation.record_time("scheduler_wait", time.perf_counter() - start)
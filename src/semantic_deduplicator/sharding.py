@@ -0,0 +1,262 @@
+import copy
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from .clustering import cross_threshold_edges, UnionFind
+from .main import SemanticDeduplicator, DeduplicatedItem, normalize_text
+
+
+def _deduplicate_shard(settings, items, max_workers, embedding_batch_size):
+    # Runs in a worker process. Returns the shard's items as plain (name, original inputs, embedding) tuples
+    semantic_deduplicator = SemanticDeduplicator(**settings)
+    semantic_deduplicator.add_single_items(items, max_workers=max_workers, embedding_batch_size=embedding_batch_size)
+    semantic_deduplicator.flush()
+
+    return [(item.name, list(item.original_input_list), np.array(item.item_embedding, dtype=np.float32))
+            for item in semantic_deduplicator.deduplicated_items_list]
+
+
+def _shard_item(name, original_inputs, embedding):
+    # An item of a shard result, named and embedded already
+    item = DeduplicatedItem(name, formatted_name=name, item_embedding=embedding)
+    item.original_input_list = list(original_inputs)
+    return item
+
+
+class ShardedDeduplicator:
+    def __init__(self, num_shards=4, max_processes=None, num_bits=8, seed=0, auto_merge_threshold=0.95, block_size=1024, mp_context="spawn",
+                 cache=None, scheduler=None, instrumentation=None, **settings):
+        """
+        Deduplicates large corpora across a pool of processes, each running its own SemanticDeduplicator.
+
+        Items are embedded once and partitioned by random hyperplane (LSH) bucket, so similar items tend to land in the
+        same shard. Whole buckets are dealt out to keep the shards even. Each shard is deduplicated in a worker process
+        with 'add_single_items'. A reconciliation pass then compares every shard result with the others, and with the
+        items of earlier calls, one pair of shards per task in the same pool. Items of the same shard are never compared
+        again. Pairs above 'cosine_similarity_threshold' are merged like in 'deduplicate_batch': outright at or above
+        'auto_merge_threshold', otherwise if the LLM agrees. Merged groups get one new name each.
+
+        The result is a regular SemanticDeduplicator, 'deduplicator', whose list can be read, saved or added to as usual.
+        Items from earlier calls keep their place and 'item_id', and new items are merged into them.
+
+        Args:
+            num_shards (int): The number of partitions. Defaults to 4.
+            max_processes (int): Optional, the number of worker processes. Defaults to one per shard.
+            num_bits (int): The number of hyperplanes, for 2 ** num_bits buckets. Defaults to 8.
+            seed (int): The seed for the hyperplanes. Defaults to 0.
+            auto_merge_threshold (float): Cross shard pairs at or above this cosine similarity are merged without asking the LLM. Defaults to 0.95.
+            block_size (int): The number of rows per block when comparing two shards. Defaults to 1024.
+            mp_context (str): The multiprocessing start method of the pool. Defaults to "spawn".
+            cache (ResponseCache): Optional, used by the coordinating process only. Defaults to None.
+            scheduler (RequestScheduler): Optional, used by the coordinating process only. Each worker paces its own requests,
+                so split your quota between the processes in the workers' settings. Defaults to None.
+            instrumentation (Instrumentation): Optional, times the "partition", "shards" and "reconciliation" stages. Defaults to None (off).
+            **settings: SemanticDeduplicator arguments used by every worker and the coordinator, e.g. background_context,
+                thresholds, chat_model and embedder. They are pickled for the workers, so providers must be picklable.
+        """
+
+        self.num_shards = num_shards
+        self.max_processes = max_processes or num_shards
+        self.num_bits = num_bits
+        self.seed = seed
+        self.auto_merge_threshold = auto_merge_threshold
+        self.block_size = block_size
+        self.mp_context = mp_context
+        self.settings = settings
+        self._coordinator_settings = {"cache": cache, "scheduler": scheduler, "instrumentation": instrumentation}
+        self._hyperplanes = None
+
+        self.deduplicator = SemanticDeduplicator(**self._coordinator_settings, **self.settings)
+
+    @property
+    def deduplicated_items_list(self):
+        return self.deduplicator.deduplicated_items_list
+
+    def get_formatted_deduplicated_list(self, get_type="string_list"):
+        """
+        The merged list, formatted like SemanticDeduplicator.get_formatted_deduplicated_list.
+        """
+        return self.deduplicator.get_formatted_deduplicated_list(get_type=get_type)
+
+    def deduplicate(self, items, max_workers=8, embedding_batch_size=100):
+        """
+        Deduplicates the items across the process pool and merges the shards into 'deduplicator'.
+        Items from an earlier call are kept, and reconciled with the new shards like another shard.
+
+        Args:
+            items (list): The new items.
+            max_workers (int): The maximum number of concurrent API calls per process. Defaults to 8.
+            embedding_batch_size (int): The number of strings sent per embedding request. Defaults to 100.
+        """
+
+        items = list(items)
+        instrumentation = self.deduplicator.instrumentation
+
+        with instrumentation.stage("partition"):
+            shards = [shard for shard in self.partition(items, max_workers=max_workers, embedding_batch_size=embedding_batch_size) if shard]
+
+        if not shards:
+            return
+
+        with ProcessPoolExecutor(max_workers=min(self.max_processes, len(shards)), mp_context=multiprocessing.get_context(self.mp_context)) as pool:
+            with instrumentation.stage("shards"):
+                results = list(pool.map(_deduplicate_shard, [self._worker_settings()] * len(shards), shards,
+                                        [max_workers] * len(shards), [embedding_batch_size] * len(shards)))
+
+            with instrumentation.stage("reconciliation"):
+                self._reconcile(results, items, max_workers, embedding_batch_size, pool=pool)
+
+    def partition(self, items, max_workers=8, embedding_batch_size=100):
+        """
+        Splits items into 'num_shards' lists by the LSH bucket of their embedding.
+        Repeats that only differ in whitespace and case are embedded once and always share a shard.
+
+        Args:
+            items (list): The items to split.
+            max_workers (int): The maximum number of concurrent embedding requests. Defaults to 8.
+            embedding_batch_size (int): The number of strings sent per embedding request. Defaults to 100.
+
+        Returns:
+            shards (list): One list of items per shard, in their original order.
+        """
+
+        representatives = {}
+        for item in items:
+            representatives.setdefault(normalize_text(item), item)
+
+        if not representatives:
+            return [[] for _ in range(self.num_shards)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            embeddings = np.asarray(self.deduplicator._embed_in_batches(executor, list(representatives.values()), embedding_batch_size), dtype=np.float32)
+
+        buckets = ((embeddings @ self._get_hyperplanes(embeddings.shape[1]).T > 0) @ (1 << np.arange(self.num_bits, dtype=np.int64))).tolist()
+        bucket_of_key = dict(zip(representatives, buckets))
+
+        bucket_sizes = {}
+        for item in items:
+            bucket = bucket_of_key[normalize_text(item)]
+            bucket_sizes[bucket] = bucket_sizes.get(bucket, 0) + 1
+
+        # Biggest buckets first, each to the least loaded shard
+        shard_of_bucket, loads = {}, [0] * self.num_shards
+        for bucket, size in sorted(bucket_sizes.items(), key=lambda bucket_size: (-bucket_size[1], bucket_size[0])):
+            shard = loads.index(min(loads))
+            shard_of_bucket[bucket] = shard
+            loads[shard] += size
+
+        shards = [[] for _ in range(self.num_shards)]
+        for item in items:
+            shards[shard_of_bucket[bucket_of_key[normalize_text(item)]]].append(item)
+
+        return shards
+
+    def _reconcile(self, results, items, max_workers=8, embedding_batch_size=100, pool=None):
+        sd = self.deduplicator
+        existing_items = list(sd.deduplicated_items_list)
+
+        # The items of the current list come first, then those of each shard as (name, original inputs, embedding)
+        entries = [(item.name, list(item.original_input_list), item.item_embedding) for item in existing_items]
+        entries += [entry for result in results for entry in result]
+
+        # The current list and the shards are compared pairwise, never with themselves
+        parts = [np.array([np.asarray(embedding, dtype=np.float32) for _, _, embedding in entries[:len(existing_items)]])]
+        parts += [np.array([embedding for _, _, embedding in result], dtype=np.float32) for result in results]
+        offsets = np.cumsum([0] + [len(part) for part in parts])
+        pairs = [(a, b) for a in range(len(parts)) for b in range(a + 1, len(parts)) if len(parts[a]) > 0 and len(parts[b]) > 0]
+
+        pair_edges = (pool.map if pool is not None else map)(cross_threshold_edges, [parts[a] for a, _ in pairs], [parts[b] for _, b in pairs],
+                                                             [sd.cosine_similarity_threshold] * len(pairs), [self.block_size] * len(pairs))
+
+        sources, targets, scores = [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.int64)], [np.empty(0, dtype=np.float32)]
+        for (a, b), (pair_sources, pair_targets, pair_scores) in zip(pairs, pair_edges):
+            sources.append(pair_sources + offsets[a])
+            targets.append(pair_targets + offsets[b])
+            scores.append(pair_scores)
+
+        sources, targets, scores = np.concatenate(sources), np.concatenate(targets), np.concatenate(scores)
+        order = np.argsort(-scores, kind="stable")
+        sources, targets, scores = sources[order], targets[order], scores[order]
+
+        # Items of the current list keep their order, new items follow in the order their inputs were first seen
+        first_seen = {}
+        for position, item in enumerate(items):
+            first_seen.setdefault(item, position)
+        rank = [i - len(entries) if i < len(existing_items) else min(first_seen.get(original_input, len(items)) for original_input in inputs)
+                for i, (_, inputs, _) in enumerate(entries)]
+
+        groups = UnionFind(len(entries))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for i, j in zip(sources[scores >= self.auto_merge_threshold].tolist(), targets[scores >= self.auto_merge_threshold].tolist()):
+                groups.union(i, j)
+
+            # Every cross pair was scored, the cosine tier accepts those merged outright and rejects those below the threshold
+            sd._record_decisions(cosine_accept=int(np.count_nonzero(scores >= self.auto_merge_threshold)),
+                                 cosine_reject=sum(len(parts[a]) * len(parts[b]) for a, b in pairs) - len(scores))
+
+            raw_items = existing_items + [_shard_item(*entry) for entry in entries[len(existing_items):]]
+            ambiguous_edges = list(zip(sources[scores < self.auto_merge_threshold].tolist(), targets[scores < self.auto_merge_threshold].tolist()))
+            sd._verify_edges(executor, raw_items, ambiguous_edges, groups)
+
+            final_groups = sorted((sorted(group, key=lambda i: rank[i]) for group in groups.groups()), key=lambda group: rank[group[0]])
+            merged_groups = [group for group in final_groups if len(group) > 1]
+
+            # Merged groups are named from the names their items already have
+            merged_names = list(executor.map(lambda group: sd.get_group_name([entries[i][0] for i in group]), merged_groups))
+
+            if sd.embedding_mode == "centroid":
+                # Merges into a current item move its centroid as they are recorded
+                merged_embeddings = [None if group[0] < len(existing_items) else sd._group_centroid([sd._centroid(raw_items[i])[0] for i in group], [len(entries[i][1]) for i in group])
+                                     for group in merged_groups]
+            else:
+                merged_embeddings = sd._embed_in_batches(executor, merged_names, embedding_batch_size)
+
+        merged = {group[0]: (name, embedding) for group, name, embedding in zip(merged_groups, merged_names, merged_embeddings)}
+
+        for group in final_groups:
+            if group[0] < len(existing_items):
+                if group[0] in merged:
+                    self._merge_into(existing_items[group[0]], [raw_items[i] for i in group[1:]], *merged[group[0]])
+                continue
+
+            name, _, embedding = entries[group[0]]
+            name, embedding = merged.get(group[0], (name, embedding))
+            sd.add_item_to_deduplicated_list(_shard_item(name, [original_input for i in group for original_input in entries[i][1]], embedding))
+
+    def _merge_into(self, item, members, name, embedding):
+        # Merges shard items, and other items of the current list, into an item of the current list, which keeps its id
+        sd = self.deduplicator
+
+        for member in members:
+            sd._record_merge(item, member)
+
+            if member.item_id is not None:
+                sd.remove_item_from_deduplicated_list(member)
+
+        sd._pending_merges.pop(item.item_id, None)
+        previous_name = item.name
+        item.name = name
+        if embedding is not None:
+            item.item_embedding = embedding
+        sd._record_rename(item, previous_name)
+
+    def _worker_settings(self):
+        # Providers bound to the coordinator's instrumentation are sent without it, it can't be shared across processes
+        settings = dict(self.settings)
+
+        for key in ("chat_model", "embedder"):
+            if settings.get(key) is not None and settings[key].instrumentation is not None:
+                settings[key] = copy.copy(settings[key])
+                settings[key].instrumentation = None
+
+        return settings
+
+    def _get_hyperplanes(self, dimension):
+        if self._hyperplanes is None or self._hyperplanes.shape[1] != dimension:
+            rng = np.random.default_rng(self.seed)
+            self._hyperplanes = rng.standard_normal((self.num_bits, dimension)).astype(np.float32)
+
+        return self._hyperplanes
@@ -0,0 +1,170 @@
+import numpy as np
+
+
+class EmbeddingStore:
+    def __init__(self, dtype="float32", block_size=4096):
+        """
+        Shared storage for the embeddings of every item in a SemanticDeduplicator.
+        Each item owns a slot, a row in one of several fixed size blocks, and reads its embedding as a view of that row.
+        Growing the store adds a block instead of copying, and released slots are reused by later items.
+
+        Args:
+            dtype (str): "float32", or "float16" to halve the memory again at a small cost in precision. Defaults to "float32".
+            block_size (int): The number of rows allocated at a time. Defaults to 4096.
+        """
+
+        if np.dtype(dtype) not in (np.dtype(np.float32), np.dtype(np.float16)):
+            raise ValueError(f"Invalid dtype: {dtype}. Expected one of: 'float32', 'float16'")
+
+        self.dtype = np.dtype(dtype)
+        self.block_size = block_size
+
+        self._base = None
+        self._base_rows = 0
+        self._blocks = []
+        self._next_slot = 0
+        self._free_slots = []
+        self._dimension = None
+        self._listeners = []
+
+    def __len__(self):
+        return self._next_slot - len(self._free_slots)
+
+    @property
+    def nbytes(self):
+        """
+        The number of bytes held by the blocks, not counting an adopted memory-mapped matrix.
+        """
+        return sum(block.nbytes for block in self._blocks)
+
+    @property
+    def num_slots(self):
+        """
+        The number of slots handed out so far, including released ones.
+        """
+        return self._next_slot
+
+    def subscribe(self, listener):
+        """
+        Calls 'listener(slot)' after every write to a slot, e.g. so a candidate index reading the rows can follow them.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def allocate(self, embedding):
+        """
+        Copies an embedding into a free slot.
+
+        Args:
+            embedding (list | np.array): The embedding to store.
+
+        Returns:
+            slot (int): The slot the embedding was stored in.
+        """
+
+        embedding = np.asarray(embedding)
+
+        if self._dimension is None:
+            self._dimension = embedding.shape[0]
+
+        if self._free_slots:
+            slot = self._free_slots.pop()
+        else:
+            slot = self._next_slot
+            self._next_slot += 1
+
+            if slot - self._base_rows >= len(self._blocks) * self.block_size:
+                self._blocks.append(np.empty((self.block_size, self._dimension), dtype=self.dtype))
+
+        self.set(slot, embedding)
+
+        return slot
+
+    def adopt(self, matrix):
+        """
+        Uses an existing matrix, e.g. a memory-mapped file, as the first rows of an empty store without copying it.
+
+        Args:
+            matrix (np.array): A (rows, dimension) array. Writes go to it, so open memory maps copy-on-write.
+
+        Returns:
+            slots (range): The slot of each row of the matrix.
+        """
+
+        if self._next_slot > 0:
+            raise ValueError("A matrix can only be adopted by an empty EmbeddingStore")
+
+        self._base = matrix
+        self._base_rows = self._next_slot = len(matrix)
+        self._dimension = matrix.shape[1]
+
+        return range(self._base_rows)
+
+    def get(self, slot):
+        """
+        Returns a view of the embedding in a slot.
+        """
+        if slot < self._base_rows:
+            return self._base[slot]
+
+        block, row = divmod(slot - self._base_rows, self.block_size)
+        return self._blocks[block][row]
+
+    def get_rows(self, slots):
+        """
+        Returns a float32 copy of the embeddings in the given slots, one row per slot.
+        """
+        slots = np.asarray(slots, dtype=np.int64)
+        rows = np.empty((len(slots), self._dimension or 0), dtype=np.float32)
+
+        in_base = slots < self._base_rows
+        if in_base.any():
+            rows[in_base] = self._base[slots[in_base]]
+
+        positions = np.nonzero(~in_base)[0]
+        blocks, block_rows = np.divmod(slots[positions] - self._base_rows, self.block_size)
+        for block in np.unique(blocks):
+            in_block = blocks == block
+            rows[positions[in_block]] = self._blocks[block][block_rows[in_block]]
+
+        return rows
+
+    def chunks(self):
+        """
+        Yields (first slot, rows) for the adopted matrix and then each block, covering every slot handed out so far.
+        The rows are views, released slots included.
+        """
+        if self._base_rows > 0:
+            yield 0, self._base
+
+        for i, block in enumerate(self._blocks):
+            start = self._base_rows + i * self.block_size
+            if start < self._next_slot:
+                yield start, block[:self._next_slot - start]
+
+    def set(self, slot, embedding):
+        """
+        Overwrites the embedding in a slot.
+        """
+        embedding = np.asarray(embedding)
+
+        if embedding.shape != (self._dimension,):
+            raise ValueError(f"Embedding shape {embedding.shape} does not match the store dimension {self._dimension}")
+
+        if slot < self._base_rows:
+            self._base[slot] = embedding
+        else:
+            block, row = divmod(slot - self._base_rows, self.block_size)
+            self._blocks[block][row] = embedding
+
+        for listener in self._listeners:
+            listener(slot)
+
+    def release(self, slot):
+        """
+        Frees a slot so a later item can reuse it.
+        """
+        self._free_slots.append(slot)
@@ -0,0 +1,69 @@
+import csv
+import itertools
+import json
+import os
+
+JSONL_EXTENSIONS = (".jsonl", ".ndjson")
+CSV_EXTENSIONS = (".csv",)
+
+
+def read_records(source, field=None, skip=0):
+    """
+    Yields the items of a stream one at a time, so a source never has to fit in memory.
+
+    Files are read by their extension:
+        ".jsonl" / ".ndjson": One JSON value a line, a string or an object holding the item under 'field'.
+        ".csv": A header row, then one record a row. The item is the 'field' column, or the first column without one.
+        Anything else: One item a line.
+    Any other source is iterated as is. Its records are strings, or dicts holding the item under 'field'.
+
+    Every record counts towards the offset, including blank ones, which are yielded as None and should be skipped.
+
+    Args:
+        source (str | iterable): A file path, or any iterable of records.
+        field (str): Optional, the key or column holding the item. Defaults to None.
+        skip (int): The number of records to pass over first, e.g. the offset of a checkpoint. Defaults to 0.
+
+    Returns:
+        records (iterator): The item of every record after the first 'skip'.
+    """
+
+    if isinstance(source, (str, os.PathLike)):
+        return _read_file(os.fspath(source), field, skip)
+
+    return (_record_item(record, field) for record in itertools.islice(source, skip, None))
+
+
+def _read_file(path, field, skip):
+    extension = os.path.splitext(path)[1].lower()
+
+    with open(path, newline="" if extension in CSV_EXTENSIONS else None, encoding="utf-8") as file:
+        if extension in CSV_EXTENSIONS:
+            reader = csv.DictReader(file)
+            column = field or (reader.fieldnames[0] if reader.fieldnames else None)
+            for row in itertools.islice(reader, skip, None):
+                yield _clean(row.get(column))
+        else:
+            # Skipped lines are not parsed, so resuming far into a file costs one read of what came before
+            for line in itertools.islice(file, skip, None):
+                if extension in JSONL_EXTENSIONS:
+                    yield _record_item(json.loads(line), field) if line.strip() else None
+                else:
+                    yield _clean(line)
+
+
+def _record_item(record, field):
+    if isinstance(record, dict):
+        if field is None:
+            raise ValueError(f"Invalid record: {record}. Records that are objects need a 'field' naming the item")
+        record = record.get(field)
+
+    return _clean(record)
+
+
+def _clean(item):
+    if item is None:
+        return None
+
+    item = str(item).strip()
+    return item or None
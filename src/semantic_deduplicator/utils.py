@@ -1,9 +1,69 @@
 # utils.py
 import openai
 import json
-import time
 
-def call_llm(system_prompt="You are a helpful assistant.", human_prompt="Hello!", function_schema=[], model="gpt-4-0613"):
+from .scheduler import RequestScheduler
+
+MAX_ATTEMPTS = 3
+BACKOFF_FACTOR = 1.5
+EMBEDDING_MODEL = "text-embedding-ada-002"
+
+# Tokens set aside for the answer of a chat request until its real usage is known
+COMPLETION_TOKEN_ESTIMATE = 256
+
+# An optional ResponseCache shared by every call below, see set_cache
+_cache = None
+
+def set_cache(cache):
+    """
+    Sets the ResponseCache used by call_llm and the embedding functions. Pass None to turn caching off.
+    """
+    global _cache
+    _cache = cache
+
+def get_cache():
+    return _cache
+
+# An optional RequestScheduler shared by every request below, see set_scheduler
+_scheduler = None
+
+def set_scheduler(scheduler):
+    """
+    Sets the RequestScheduler every chat and embedding request goes through. Pass None to go back to plain retries.
+    """
+    global _scheduler
+    _scheduler = scheduler
+
+def get_scheduler():
+    # Without a shared scheduler requests are not paced, but transient errors are still retried
+    if _scheduler is not None:
+        return _scheduler
+
+    return RequestScheduler(max_attempts=MAX_ATTEMPTS, initial_backoff=BACKOFF_FACTOR)
+
+def estimate_tokens(texts):
+    """
+    A rough token count for some strings, at about four characters a token. Close enough for pacing and budgets, not billing.
+    """
+    return sum(len(text) for text in texts) // 4 + 1
+
+def _estimate_chat_tokens(params):
+    texts = [message['content'] for message in params['messages']] + [json.dumps(params.get('functions', []))]
+    return estimate_tokens(texts) + COMPLETION_TOKEN_ESTIMATE
+
+def _send(kind, model, estimated_tokens, request, instrumentation=None):
+    scheduler = get_scheduler()
+    response = scheduler.run(kind, model, estimated_tokens, request, instrumentation)
+    scheduler.settle(estimated_tokens, (_usage(response) or {}).get('total_tokens'))
+    return response
+
+async def _asend(kind, model, estimated_tokens, request, instrumentation=None):
+    scheduler = get_scheduler()
+    response = await scheduler.arun(kind, model, estimated_tokens, request, instrumentation)
+    scheduler.settle(estimated_tokens, (_usage(response) or {}).get('total_tokens'))
+    return response
+
+def _chat_params(system_prompt, human_prompt, function_schema, model):
     params = {
         "model": model,
         "messages": [
@@ -12,30 +72,160 @@ def call_llm(system_prompt="You are a helpful assistant.", human_prompt="Hello!"
         ]
     }
 
-    max_attempts = 3
-    backoff_factor = 1.5
-
-    for attempt in range(max_attempts):
-        try:
-            if function_schema:
-                params["functions"] = function_schema
-                params["function_call"] = {"name": function_schema[0]['name']}
-                completion = openai.ChatCompletion.create(**params)
-
-                return json.loads(completion.choices[0]['message']['function_call']['arguments'])['items']
-            else:
-                completion = openai.ChatCompletion.create(**params)
-                return completion.choices[0].message['content']
-        except openai.error.ServiceUnavailableError:
-            if attempt < max_attempts - 1:  # no need to sleep on the last attempt
-                sleep_time = backoff_factor * (2 ** attempt)
-                time.sleep(sleep_time)
-            else:
-                raise
-    
-def get_embedding(string):
-    embedding = openai.Embedding.create(
-        model="text-embedding-ada-002",
-        input=string
-    )
-    return embedding['data'][0]['embedding']
\ No newline at end of file
+    if function_schema:
+        params["functions"] = function_schema
+        params["function_call"] = {"name": function_schema[0]['name']}
+
+    return params
+
+def _parse_completion(completion, function_schema):
+    if function_schema:
+        return json.loads(completion.choices[0]['message']['function_call']['arguments'])['items']
+    else:
+        return completion.choices[0].message['content']
+
+def _usage(response):
+    # The token counts of a response, if it has any
+    return response.get('usage') if hasattr(response, 'get') else None
+
+def _record_cache_hit(instrumentation):
+    if instrumentation is not None:
+        instrumentation.count("cache_hits")
+
+def _completion_payload(params):
+    return {key: value for key, value in params.items() if key != "model"}
+
+def call_llm(system_prompt="You are a helpful assistant.", human_prompt="Hello!", function_schema=[], model="gpt-4-0613", instrumentation=None):
+    params = _chat_params(system_prompt, human_prompt, function_schema, model)
+
+    if _cache is not None:
+        cached = _cache.get_completion(model, _completion_payload(params))
+        if cached is not None:
+            _record_cache_hit(instrumentation)
+            return cached
+
+    result = _call_llm(params, function_schema, instrumentation)
+
+    if _cache is not None:
+        _cache.set_completion(model, _completion_payload(params), result)
+
+    return result
+
+def _call_llm(params, function_schema, instrumentation=None):
+    completion = _send("chat", params['model'], _estimate_chat_tokens(params),
+                       lambda: openai.ChatCompletion.create(**params), instrumentation)
+    if instrumentation is not None:
+        instrumentation.record_usage(_usage(completion))
+    return _parse_completion(completion, function_schema)
+
+async def acall_llm(system_prompt="You are a helpful assistant.", human_prompt="Hello!", function_schema=[], model="gpt-4-0613", instrumentation=None):
+    """
+    The coroutine version of call_llm. It does not block the event loop while waiting on the API, the quota or backing off.
+    """
+    params = _chat_params(system_prompt, human_prompt, function_schema, model)
+
+    if _cache is not None:
+        cached = _cache.get_completion(model, _completion_payload(params))
+        if cached is not None:
+            _record_cache_hit(instrumentation)
+            return cached
+
+    result = await _acall_llm(params, function_schema, instrumentation)
+
+    if _cache is not None:
+        _cache.set_completion(model, _completion_payload(params), result)
+
+    return result
+
+async def _acall_llm(params, function_schema, instrumentation=None):
+    completion = await _asend("chat", params['model'], _estimate_chat_tokens(params),
+                              lambda: openai.ChatCompletion.acreate(**params), instrumentation)
+    if instrumentation is not None:
+        instrumentation.record_usage(_usage(completion))
+    return _parse_completion(completion, function_schema)
+
+def get_embedding(string, model=EMBEDDING_MODEL, instrumentation=None):
+    if _cache is not None:
+        cached = _cache.get_embedding(model, string)
+        if cached is not None:
+            _record_cache_hit(instrumentation)
+            return cached
+
+    embedding = _send("embedding", model, estimate_tokens([string]),
+                      lambda: openai.Embedding.create(model=model, input=string), instrumentation)
+    if instrumentation is not None:
+        instrumentation.record_usage(_usage(embedding), prefix="embedding_")
+    embedding = embedding['data'][0]['embedding']
+
+    if _cache is not None:
+        _cache.set_embedding(model, string, embedding)
+
+    return embedding
+
+def get_embeddings(strings, model=EMBEDDING_MODEL, instrumentation=None):
+    """
+    Embeds several strings with a single request using the multi-input form of the embeddings endpoint.
+    The embeddings are returned in the same order as the strings. Only the strings missing from the cache are sent.
+    """
+    embeddings, missing = _cached_embeddings(strings, model, instrumentation)
+
+    if len(missing) > 0:
+        inputs = [strings[i] for i in missing]
+        response = _send("embedding", model, estimate_tokens(inputs),
+                         lambda: openai.Embedding.create(model=model, input=inputs), instrumentation)
+        _fill_embeddings(strings, embeddings, missing, response, model, instrumentation)
+
+    return embeddings
+
+async def aget_embedding(string, model=EMBEDDING_MODEL, instrumentation=None):
+    if _cache is not None:
+        cached = _cache.get_embedding(model, string)
+        if cached is not None:
+            _record_cache_hit(instrumentation)
+            return cached
+
+    embedding = await _asend("embedding", model, estimate_tokens([string]),
+                             lambda: openai.Embedding.acreate(model=model, input=string), instrumentation)
+    if instrumentation is not None:
+        instrumentation.record_usage(_usage(embedding), prefix="embedding_")
+    embedding = embedding['data'][0]['embedding']
+
+    if _cache is not None:
+        _cache.set_embedding(model, string, embedding)
+
+    return embedding
+
+async def aget_embeddings(strings, model=EMBEDDING_MODEL, instrumentation=None):
+    """
+    The coroutine version of get_embeddings.
+    """
+    embeddings, missing = _cached_embeddings(strings, model, instrumentation)
+
+    if len(missing) > 0:
+        inputs = [strings[i] for i in missing]
+        response = await _asend("embedding", model, estimate_tokens(inputs),
+                                lambda: openai.Embedding.acreate(model=model, input=inputs), instrumentation)
+        _fill_embeddings(strings, embeddings, missing, response, model, instrumentation)
+
+    return embeddings
+
+def _cached_embeddings(strings, model, instrumentation=None):
+    # Returns the cached embedding (or None) for every string, plus the positions that still need a request
+    embeddings = [_cache.get_embedding(model, string) if _cache is not None else None for string in strings]
+    missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+
+    if instrumentation is not None and len(missing) < len(strings):
+        instrumentation.count("cache_hits", len(strings) - len(missing))
+
+    return embeddings, missing
+
+def _fill_embeddings(strings, embeddings, missing, response, model, instrumentation=None):
+    if instrumentation is not None:
+        instrumentation.record_usage(_usage(response), prefix="embedding_")
+
+    for data in response['data']:
+        i = missing[data['index']]
+        embeddings[i] = data['embedding']
+
+        if _cache is not None:
+            _cache.set_embedding(model, strings[i], data['embedding'])
@@ -0,0 +1,104 @@
+import asyncio
+import threading
+
+import pytest
+
+import semantic_deduplicator.providers as providers
+from semantic_deduplicator import SemanticDeduplicator, ScriptedChatModel, HashedNgramEmbedder
+
+GROCERIES = ["Milk for cereal", "Berries", "Milk for drinking", "Fresh berries", "Ground meat", "Bread",
+             "Whole grain bread", "Fresh meat", "Berries for pie", "Bread rolls", "Milk"]
+
+
+class FakeClient:
+    """
+    Stands in for the OpenAI chat and embedding endpoints, so tests run offline. Answers come from a ScriptedChatModel and
+    embeddings from a bag-of-words HashedNgramEmbedder, this only counts calls and can fail or slow down on request.
+    """
+
+    def __init__(self, dimension=64):
+        self.chat_model = ScriptedChatModel()
+        self.embedder = HashedNgramEmbedder(dimension=dimension, ngram_sizes=())
+        self.chat_calls = 0
+        self.embedding_calls = 0
+        self._lock = threading.Lock()
+        self.malformed_scores = False
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def embed(self, string):
+        return self.embedder.embed_one(string).tolist()
+
+    def get_embedding(self, string, model=None, instrumentation=None):
+        with self._lock:
+            self.embedding_calls += 1
+
+        return self.embed(string)
+
+    def get_embeddings(self, strings, model=None, instrumentation=None):
+        with self._lock:
+            self.embedding_calls += 1
+
+        return self.embedder.embed(strings).tolist()
+
+    def call_llm(self, system_prompt="", human_prompt="", function_schema=[], model="", instrumentation=None):
+        with self._lock:
+            self.chat_calls += 1
+
+        if self.malformed_scores and function_schema and function_schema[0]["name"] == "score_existing_items":
+            raise ValueError("Expecting value: line 1 column 1 (char 0)")
+
+        return self.chat_model.complete(system_prompt, human_prompt, function_schema, model)
+
+    async def _in_flight(self, function, *args, **kwargs):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001)
+            return function(*args, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+    async def acall_llm(self, *args, **kwargs):
+        return await self._in_flight(self.call_llm, *args, **kwargs)
+
+    async def aget_embedding(self, string, model=None, instrumentation=None):
+        return await self._in_flight(self.get_embedding, string)
+
+    async def aget_embeddings(self, strings, model=None, instrumentation=None):
+        return await self._in_flight(self.get_embeddings, strings)
+
+
+@pytest.fixture
+def fake_client(monkeypatch):
+    client = FakeClient()
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    # The default OpenAI providers look these up at call time
+    monkeypatch.setattr(providers, "call_llm", client.call_llm)
+    monkeypatch.setattr(providers, "get_embedding", client.get_embedding)
+    monkeypatch.setattr(providers, "get_embeddings", client.get_embeddings)
+    monkeypatch.setattr(providers, "acall_llm", client.acall_llm)
+    monkeypatch.setattr(providers, "aget_embedding", client.aget_embedding)
+    monkeypatch.setattr(providers, "aget_embeddings", client.aget_embeddings)
+    return client
+
+
+@pytest.fixture
+def make_deduplicator(fake_client):
+    """
+    Builds grocery list deduplicators on the fake client. Keyword arguments override the defaults, e.g.
+    make_deduplicator(cosine_similarity_threshold=.3, early_exit=True). A test module can override this fixture to change
+    its defaults for every test.
+    """
+
+    def make(**kwargs):
+        settings = {"background_context": "Grocery list", "llm_similarity_threshold": .5, "cosine_similarity_threshold": .5, **kwargs}
+        return SemanticDeduplicator(**settings)
+
+    return make
+
+
+@pytest.fixture
+def groceries():
+    # A fresh copy of the shared grocery inputs, with near duplicates in four groups
+    return list(GROCERIES)
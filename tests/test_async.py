@@ -0,0 +1,53 @@
+import asyncio
+
+
+def test_aadd_single_items_matches_sync_path(fake_client, make_deduplicator, groceries):
+    sequential = make_deduplicator()
+    sequential.add_single_items(groceries)
+
+    concurrent = make_deduplicator(max_concurrency=3)
+    asyncio.run(concurrent.aadd_single_items(groceries, embedding_batch_size=4))
+
+    assert concurrent.get_formatted_deduplicated_list(get_type="dict_list") == sequential.get_formatted_deduplicated_list(get_type="dict_list")
+    assert fake_client.max_in_flight <= 3
+
+
+def test_concurrent_sessions_share_one_event_loop(fake_client, make_deduplicator, groceries):
+    sessions = [make_deduplicator(max_concurrency=2) for _ in range(3)]
+
+    async def ingest(sd):
+        await asyncio.gather(*[sd.aadd_single_item(item) for item in groceries])
+        await sd.adelete_item_from_string("Bread")
+
+    async def main():
+        await asyncio.gather(*[ingest(sd) for sd in sessions])
+
+    asyncio.run(main())
+
+    for sd in sessions:
+        names = [item.name for item in sd.deduplicated_items_list]
+        original_inputs = [original for item in sd.deduplicated_items_list for original in item.original_input_list]
+
+        # Concurrent adds are serialized, so every input lands in exactly one item and no duplicates are created
+        assert len(names) == len(set(names))
+        assert len(original_inputs) == len(set(original_inputs))
+        assert len(sd.index) == len(sd.deduplicated_items_list)
+        assert "Bread" not in names
+
+
+def test_aadd_item_splits_submission(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    asyncio.run(sd.aadd_item("Berries, milk and meat"))
+
+    assert len(sd.deduplicated_items_list) == 3
+    assert all(item.original_input_list == ["Berries, milk and meat"] for item in sd.deduplicated_items_list)
+
+
+def test_async_batched_scoring_matches_sync_path(fake_client, make_deduplicator, groceries):
+    sequential = make_deduplicator(similarity_scoring="batched")
+    sequential.add_single_items(groceries)
+
+    concurrent = make_deduplicator(similarity_scoring="batched")
+    asyncio.run(concurrent.aadd_single_items(groceries))
+
+    assert concurrent.get_formatted_deduplicated_list(get_type="dict_list") == sequential.get_formatted_deduplicated_list(get_type="dict_list")
@@ -0,0 +1,109 @@
+import random
+
+import pytest
+
+from semantic_deduplicator.clustering import threshold_edges, UnionFind
+from semantic_deduplicator.providers import word_overlap
+
+
+@pytest.fixture
+def items(groceries):
+    # Repeats within a batch are grouped before anything is embedded
+    return groceries + ["Milk", "Berries"]
+
+
+def groups_of(sd):
+    return sorted(sorted(item.original_input_list) for item in sd.deduplicated_items_list)
+
+
+def test_threshold_edges_match_all_pairs():
+    rng = random.Random(0)
+    embeddings = [[rng.uniform(-1, 1) for _ in range(8)] for _ in range(50)]
+
+    sources, targets, scores = threshold_edges(embeddings, 0.3, block_size=7)
+    all_pairs = {(i, j) for i, j, _ in zip(*threshold_edges(embeddings, 0.3, block_size=1000))}
+
+    assert set(zip(sources.tolist(), targets.tolist())) == all_pairs
+    assert all(i < j for i, j in all_pairs)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_union_find_groups():
+    groups = UnionFind(5)
+    groups.union(3, 1)
+    groups.union(4, 3)
+
+    assert groups.groups() == [[0], [1, 3, 4], [2]]
+
+
+def test_batch_deduplication_is_order_independent(fake_client, make_deduplicator, items):
+    sd = make_deduplicator()
+    sd.deduplicate_batch(items)
+
+    shuffled = list(items)
+    random.Random(1).shuffle(shuffled)
+    shuffled_sd = make_deduplicator()
+    shuffled_sd.deduplicate_batch(shuffled)
+
+    assert groups_of(sd) == groups_of(shuffled_sd)
+    assert sorted(sum(groups_of(sd), [])) == sorted(items)
+    assert ["Milk for cereal", "Milk for drinking"] in groups_of(sd)
+    assert ["Bread", "Bread rolls"] in groups_of(sd)
+
+
+def test_batch_llm_calls_scale_with_groups(fake_client, make_deduplicator, items):
+    make_deduplicator().deduplicate_batch(items)
+    chat_calls = fake_client.chat_calls
+    fake_client.chat_calls = 0
+
+    sd = make_deduplicator()
+    sd.deduplicate_batch(items * 20)
+
+    # Repeats are free, so this costs the same as deduplicating the items once
+    assert fake_client.chat_calls == chat_calls
+    assert len(sd.deduplicated_items_list) < len(items)
+
+
+def test_batch_merges_into_existing_items(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_item("Milk for cereal")
+    sd.deduplicate_batch(["Milk for drinking", "Bread"])
+
+    assert groups_of(sd) == [["Bread"], ["Milk for cereal", "Milk for drinking"]]
+
+
+def test_batch_verification_is_bound_by_the_groups(fake_client, make_deduplicator):
+    rng = random.Random(0)
+    word = lambda: "".join(rng.choice("bcdfghklmnprstvz") + rng.choice("aeiou") for _ in range(3))
+    topics, modifiers = [[word() for _ in range(3)] for _ in range(10)], [word() for _ in range(20)]
+    items = [" ".join([rng.choice(modifiers)] + rng.sample(rng.choice(topics), 2)) for _ in range(300)]
+
+    prompts = []
+    complete = fake_client.chat_model.complete
+    fake_client.chat_model.complete = lambda system_prompt, human_prompt, *args: prompts.append(human_prompt) or complete(system_prompt, human_prompt, *args)
+
+    for similarity_scoring in ("pairwise", "batched"):
+        prompts.clear()
+        sd = make_deduplicator(similarity_scoring=similarity_scoring, scoring_batch_size=1000)
+        sd.deduplicate_batch(items)
+
+        # No pair is asked about twice, and batched scoring makes at most one request per group
+        similarity_prompts = [" ".join(prompt.split()) for prompt in prompts if "Item #1:" in prompt or "Existing Items:" in prompt]
+        assert len(similarity_prompts) == len(set(similarity_prompts))
+        if similarity_scoring == "batched":
+            assert len(similarity_prompts) <= len(sd.deduplicated_items_list) < len(set(items))
+
+
+def test_batch_decisions_are_counted_by_the_cascade(fake_client, items, make_deduplicator):
+    sd = make_deduplicator(cross_check=word_overlap, cross_check_reject_threshold=.1, cross_check_accept_threshold=.9)
+    chat_calls = fake_client.chat_calls
+    sd.deduplicate_batch(items)
+
+    distinct = len(set(items))
+    decisions = sd.cascade_decisions
+    assert decisions["cosine_accept"] + decisions["cosine_reject"] <= distinct * (distinct - 1) // 2
+    assert decisions["cosine_reject"] > 0
+    assert decisions["judge_accept"] + decisions["judge_reject"] > 0
+
+    # Only the pairs the cross check was unsure about reached the judge, and every group was named with one call
+    assert fake_client.chat_calls - chat_calls == decisions["judge_accept"] + decisions["judge_reject"] + len(sd.deduplicated_items_list)
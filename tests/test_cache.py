@@ -0,0 +1,114 @@
+import sqlite3
+
+import numpy as np
+import openai
+import pytest
+
+from semantic_deduplicator import ResponseCache
+from semantic_deduplicator import utils
+
+
+class FakeOpenAI:
+    def __init__(self):
+        self.embedding_requests = []
+        self.chat_requests = 0
+
+    def embedding_create(self, model, input):
+        self.embedding_requests.append(input)
+        inputs = input if isinstance(input, list) else [input]
+        return {"data": [{"index": i, "embedding": [float(len(string)), 1.5, -0.25]} for i, string in enumerate(inputs)]}
+
+    def chat_create(self, **params):
+        self.chat_requests += 1
+        return openai.openai_object.OpenAIObject.construct_from({"choices": [{"message": {"content": "Milk"}}]})
+
+
+@pytest.fixture
+def fake_openai(monkeypatch):
+    fake = FakeOpenAI()
+    monkeypatch.setattr(openai.Embedding, "create", fake.embedding_create)
+    monkeypatch.setattr(openai.ChatCompletion, "create", fake.chat_create)
+    yield fake
+    utils.set_cache(None)
+
+
+def test_memory_tier_is_lru():
+    cache = ResponseCache(max_memory_entries=2)
+    cache.set_completion("gpt-4", "a", "A")
+    cache.set_completion("gpt-4", "b", "B")
+    cache.get_completion("gpt-4", "a")
+    cache.set_completion("gpt-4", "c", "C")
+
+    assert cache.get_completion("gpt-4", "a") == "A"
+    assert cache.get_completion("gpt-4", "b") is None
+    assert cache.stats()["memory_hits"] == 2
+    assert cache.stats()["misses"] == 1
+
+
+def test_disk_tier_persists_float32_embeddings(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path)
+    cache.set_embedding("ada", "Milk", [0.5, -0.25, 1.0])
+    cache.close()
+
+    cache = ResponseCache(path)
+    assert cache.get_embedding("ada", "Milk") == [0.5, -0.25, 1.0]
+    assert cache.get_embedding("other-model", "Milk") is None
+    assert cache.stats()["disk_hits"] == 1
+    assert cache.stats()["disk_bytes"] == 3 * np.dtype(np.float32).itemsize
+
+
+def test_disk_tier_evicts_least_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path / "cache.sqlite"), max_memory_entries=0, max_disk_bytes=3 * 4 * 2)
+    cache.set_embedding("ada", "a", [1.0, 2.0, 3.0])
+    cache.set_embedding("ada", "b", [1.0, 2.0, 3.0])
+    cache.get_embedding("ada", "a")
+    cache.set_embedding("ada", "c", [1.0, 2.0, 3.0])
+
+    assert cache.get_embedding("ada", "b") is None
+    assert cache.get_embedding("ada", "a") is not None
+    assert cache.stats()["disk_bytes"] <= 3 * 4 * 2
+
+
+def test_disk_hit_access_times_are_written_in_batches(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    cache = ResponseCache(path, max_memory_entries=0, access_flush_size=2)
+    cache.set_embedding("ada", "a", [1.0])
+    cache.set_embedding("ada", "b", [1.0])
+
+    def last_access():
+        connection = sqlite3.connect(path)
+        times = [row[0] for row in connection.execute("SELECT last_access FROM entries ORDER BY rowid")]
+        connection.close()
+        return times
+
+    written = last_access()
+    cache.get_embedding("ada", "a")
+    assert last_access() == written
+
+    cache.get_embedding("ada", "b")
+    assert all(new > old for new, old in zip(last_access(), written))
+
+    cache.get_embedding("ada", "a")
+    cache.close()
+    assert last_access()[0] > last_access()[1]
+
+
+def test_utils_calls_go_through_the_cache(fake_openai, tmp_path):
+    utils.set_cache(ResponseCache(str(tmp_path / "cache.sqlite")))
+
+    assert utils.get_embedding("Milk") == utils.get_embedding("Milk")
+    assert utils.get_embeddings(["Milk", "Berries", "Bread"]) == [[4.0, 1.5, -0.25], [7.0, 1.5, -0.25], [5.0, 1.5, -0.25]]
+    assert fake_openai.embedding_requests == ["Milk", ["Berries", "Bread"]]
+
+    assert utils.call_llm(human_prompt="Milk please") == utils.call_llm(human_prompt="Milk please") == "Milk"
+    assert utils.call_llm(human_prompt="Milk please", model="gpt-3.5-turbo") == "Milk"
+    assert fake_openai.chat_requests == 2
+
+    # A fresh process only has the disk tier to go on
+    utils.set_cache(ResponseCache(str(tmp_path / "cache.sqlite")))
+    utils.get_embeddings(["Milk", "Bread"])
+    utils.call_llm(human_prompt="Milk please")
+    assert len(fake_openai.embedding_requests) == 2
+    assert fake_openai.chat_requests == 2
+    assert utils.get_cache().stats()["disk_hits"] == 3
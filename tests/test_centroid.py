@@ -0,0 +1,94 @@
+import functools
+
+import numpy as np
+import pytest
+
+from semantic_deduplicator import SemanticDeduplicator, DeduplicatedItem
+from semantic_deduplicator.index import normalize_embedding
+
+DUPLICATES = ["Milk for cereal", "Milk for drinking", "Milk for coffee"]
+
+
+@pytest.fixture
+def make_deduplicator(make_deduplicator):
+    # Lower thresholds, so every milk item is a duplicate
+    return functools.partial(make_deduplicator, llm_similarity_threshold=.3, cosine_similarity_threshold=.3)
+
+
+def test_merges_update_the_centroid_without_embedding_calls(fake_client, make_deduplicator):
+    sd = make_deduplicator(embedding_mode="centroid")
+    sd.add_single_item(DUPLICATES[0])
+    sd.add_single_item(DUPLICATES[1])
+    embedding_calls = fake_client.embedding_calls
+
+    sd.add_single_item(DUPLICATES[2])
+
+    # Only the new item itself is embedded, the merge and rename are free
+    assert fake_client.embedding_calls - embedding_calls == 1
+
+    # The centroid is the mean of the members' unit embeddings, however many merges it took to get there
+    expected = np.mean([normalize_embedding(fake_client.embed(item)) for item in DUPLICATES], axis=0)
+    item = sd.deduplicated_items_list[0]
+    assert np.allclose(item.item_embedding, expected, atol=1e-6)
+    assert sd._centroid_weights[item.item_id] == 3
+    assert sd.index.search(expected, threshold=.99)[0][0] is item
+
+
+def test_sequential_merges_match_the_mean(fake_client, make_deduplicator):
+    sd = make_deduplicator(embedding_mode="centroid", centroid_weighting="uniform")
+    basis = np.eye(4, dtype=np.float32)
+    sd.add_item_to_deduplicated_list(DeduplicatedItem("e0", original_input="e0", formatted_name="e0", item_embedding=basis[0]))
+    item = sd.deduplicated_items_list[0]
+
+    for i in range(1, 4):
+        sd._merge_centroid(item, DeduplicatedItem(f"e{i}", original_input=f"e{i}", formatted_name=f"e{i}", item_embedding=basis[i]))
+
+    np.testing.assert_allclose(item.item_embedding, [.25, .25, .25, .25], atol=1e-6)
+
+
+def test_fast_path_repeats_count_towards_the_weight(fake_client, make_deduplicator):
+    sd = make_deduplicator(embedding_mode="centroid")
+    sd.add_single_items(DUPLICATES[:2])
+    centroid = np.array(sd.deduplicated_items_list[0].item_embedding)
+
+    sd.add_single_item(DUPLICATES[0])
+
+    item = sd.deduplicated_items_list[0]
+    assert sd._centroid_weights[item.item_id] == len(item.original_input_list) == 3
+    np.testing.assert_allclose(item.item_embedding, centroid)
+
+
+def test_weighting_by_inputs(fake_client, make_deduplicator):
+    weighted = make_deduplicator(embedding_mode="centroid")
+    uniform = make_deduplicator(embedding_mode="centroid", centroid_weighting="uniform")
+
+    for sd in (weighted, uniform):
+        sd.add_single_item("Milk for cereal")
+        sd.add_single_item("Milk for cereal bowls")
+        sd.deduplicate_batch(["Milk for oats", "Milk for oats", "Milk for oats"])
+
+    assert len(weighted.deduplicated_items_list) == len(uniform.deduplicated_items_list) == 1
+
+    milk_for_oats = normalize_embedding(fake_client.embed("Milk for oats"))
+    weighted_similarity = np.dot(normalize_embedding(weighted.deduplicated_items_list[0].item_embedding), milk_for_oats)
+    uniform_similarity = np.dot(normalize_embedding(uniform.deduplicated_items_list[0].item_embedding), milk_for_oats)
+    assert weighted_similarity > uniform_similarity
+
+
+def test_centroid_weights_survive_save_and_load(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator(embedding_mode="centroid")
+    sd.add_single_items(DUPLICATES[:2])
+    sd.save(tmp_path)
+
+    loaded = SemanticDeduplicator.load(tmp_path)
+
+    assert loaded.embedding_mode == "centroid"
+    assert loaded._centroid_weights == {0: 2}
+
+
+def test_invalid_embedding_mode(fake_client, make_deduplicator):
+    with pytest.raises(ValueError):
+        make_deduplicator(embedding_mode="mean")
+
+    with pytest.raises(ValueError):
+        make_deduplicator(centroid_weighting="size")
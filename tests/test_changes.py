@@ -0,0 +1,95 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from semantic_deduplicator import SemanticDeduplicator
+
+
+def test_changes_since_a_version(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk for cereal", "Bread", "Eggs"])
+    version = sd.version
+
+    sd.add_single_item("Milk for drinking")
+    sd.add_single_item("bread")
+    sd.add_single_item("Rice")
+    sd.delete_item_from_string("Eggs")
+    sd.add_single_item("Cheese")
+    sd.delete_item_from_string("Cheese")
+
+    changes = sd.get_changes(version)
+
+    assert changes["version"] == sd.version == version + 7
+    assert not changes["reset"]
+    assert changes["added"] == [{"Item ID": 3, "Formatted Name": "Rice", "Original Names": ["Rice"]}]
+    assert changes["renamed"] == [{"Item ID": 0, "Formatted Name": sd.get_item(0).name}]
+    assert changes["merged"] == [{"Item ID": 0, "New Original Names": ["Milk for drinking"]}, {"Item ID": 1, "New Original Names": ["bread"]}]
+    assert changes["deleted"] == [2]
+
+    assert sd.get_changes(changes["version"]) == {"version": changes["version"], "reset": False, "added": [], "renamed": [], "merged": [], "deleted": []}
+
+
+def test_readers_too_far_behind_get_the_whole_list(fake_client, make_deduplicator):
+    sd = make_deduplicator(max_changes=2)
+    sd.add_single_items(["Milk", "Bread", "Eggs"])
+
+    changes = sd.get_changes(0)
+
+    assert changes["reset"]
+    assert [entry["Formatted Name"] for entry in changes["added"]] == ["Milk", "Bread", "Eggs"]
+    assert not sd.get_changes(1)["reset"]
+
+
+def test_version_survives_save_and_load(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk", "Bread"])
+    sd.save(str(tmp_path / "groceries"))
+
+    loaded = SemanticDeduplicator.load(str(tmp_path / "groceries"))
+    loaded.add_single_item("Eggs")
+
+    assert loaded.version == sd.version + 1
+    assert [entry["Formatted Name"] for entry in loaded.get_changes(sd.version)["added"]] == ["Eggs"]
+    assert loaded.get_changes(sd.version - 1)["reset"]
+
+
+def test_streaming_export(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk for cereal", "Bread", "Milk for drinking"])
+    expected = [dict(entry, **{"Item ID": item.item_id}) for entry, item in zip(sd.get_formatted_deduplicated_list(get_type="dict_list"), sd.deduplicated_items_list)]
+
+    jsonl = io.StringIO()
+    assert sd.export(jsonl) == sd.version
+    assert [json.loads(line) for line in jsonl.getvalue().splitlines()] == expected
+
+    sd.export(str(tmp_path / "groceries.json"), format="json")
+    assert json.loads((tmp_path / "groceries.json").read_text()) == expected
+
+    with pytest.raises(ValueError):
+        sd.export(io.StringIO(), format="csv")
+
+
+def test_save_keeps_the_file_format_version(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk", "Bread"])
+    sd.save(str(tmp_path / "groceries"))
+
+    metadata = json.loads((tmp_path / "groceries" / "metadata.json").read_text())
+
+    assert metadata["version"] == 1
+    assert metadata["feed_version"] == sd.version
+
+
+def test_popped_items_are_deleted(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk", "Bread", "Eggs"])
+    version = sd.version
+
+    bread = sd.deduplicated_items_list.pop(1)
+    changes = sd.get_changes(version)
+
+    assert changes["deleted"] == [bread.item_id]
+    assert len(sd.embedding_store) == len(sd.index) == 2
+    np.testing.assert_array_equal(bread.item_embedding, fake_client.embed("Bread"))
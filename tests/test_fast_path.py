@@ -0,0 +1,121 @@
+import asyncio
+import re
+
+from semantic_deduplicator import SemanticDeduplicator
+
+ITEMS = ["Milk for cereal", "Bread", "milk  for CEREAL", "Bread rolls", "Bread", "Eggs", " eggs "]
+
+
+def test_repeat_makes_no_api_calls(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_item("Milk for cereal")
+    chat_calls, embedding_calls = fake_client.chat_calls, fake_client.embedding_calls
+
+    sd.add_single_item("  milk FOR cereal")
+
+    assert (fake_client.chat_calls, fake_client.embedding_calls) == (chat_calls, embedding_calls)
+    assert sd.deduplicated_items_list[0].original_input_list == ["Milk for cereal", "  milk FOR cereal"]
+    assert sd.fast_path_hits == 1
+    assert sd.fast_path_calls_saved == 2
+
+
+def test_formatted_name_is_a_fast_path_key(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Bread", "Bread rolls"])
+    merged_name = sd.deduplicated_items_list[0].name
+
+    sd.add_single_item(merged_name.upper())
+
+    assert sd.fast_path_hits == 1
+    assert sd.deduplicated_items_list[0].original_input_list[-1] == merged_name.upper()
+
+
+def test_fast_path_can_be_turned_off(fake_client, make_deduplicator):
+    sd = make_deduplicator(exact_match_fast_path=False)
+    sd.add_single_item("Eggs")
+    chat_calls = fake_client.chat_calls
+
+    sd.add_single_item("eggs")
+
+    assert fake_client.chat_calls > chat_calls
+    assert sd.fast_path_hits == 0
+
+
+def test_bulk_and_async_ingest_match_sequential_path(fake_client, make_deduplicator):
+    sequential = make_deduplicator()
+    for item in ITEMS:
+        sequential.add_single_item(item)
+
+    bulk = make_deduplicator()
+    bulk.add_single_items(ITEMS)
+
+    concurrent = make_deduplicator()
+    asyncio.run(concurrent.aadd_single_items(ITEMS))
+
+    expected = sequential.get_formatted_deduplicated_list(get_type="dict_list")
+    assert bulk.get_formatted_deduplicated_list(get_type="dict_list") == expected
+    assert concurrent.get_formatted_deduplicated_list(get_type="dict_list") == expected
+    assert bulk.fast_path_hits == concurrent.fast_path_hits == sequential.fast_path_hits == 3
+
+
+def test_deleted_items_stop_matching(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_item("Eggs")
+    sd.remove_item_from_deduplicated_list(sd.deduplicated_items_list[0])
+
+    sd.add_single_item("Eggs")
+
+    assert sd.fast_path_hits == 0
+    assert len(sd.deduplicated_items_list) == 1
+
+
+def test_multi_item_submissions_are_not_fast_path_keys(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_item("Berries, milk and meat")
+    chat_calls = fake_client.chat_calls
+
+    sd.add_single_item("berries, milk and meat")
+
+    assert fake_client.chat_calls > chat_calls
+    assert sd.fast_path_hits == 0
+    assert [item.original_input_list for item in sd.deduplicated_items_list][-1] == ["berries, milk and meat"]
+
+    sd.save(str(tmp_path / "groceries"))
+    loaded = SemanticDeduplicator.load(str(tmp_path / "groceries"))
+    assert not loaded._is_known_input("Berries, milk and meat")
+    assert loaded._is_known_input("Meat")
+
+
+def test_keys_are_built_on_the_first_lookup_after_load(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(["Milk for cereal", "Bread"])
+    sd.save(str(tmp_path / "groceries"))
+
+    loaded = SemanticDeduplicator.load(str(tmp_path / "groceries"))
+    assert loaded._exact_match_ids is None
+
+    loaded.add_single_item("bread")
+    assert loaded.fast_path_hits == 1
+    assert loaded._exact_match_ids is not None
+
+
+def test_repeats_of_multi_item_submissions_in_a_batch(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_item("apples and pears")
+
+    sd.add_single_items(["apples and pears", "apples and pears"])
+
+    # Each repeat is deduplicated on its own, next to the two items the submission made
+    assert [original_input for item in sd.deduplicated_items_list for original_input in item.original_input_list].count("apples and pears") == 4
+
+
+def test_repeat_of_a_name_renamed_earlier_in_the_batch(fake_client, make_deduplicator):
+    fake_client.chat_model.rules += [(re.compile(r"Here is my item:\s*fresh apples"), "Apples"),
+                                     (re.compile(r"Existing Item:\s*Apples"), "Green apples")]
+    sd = make_deduplicator()
+    sd.add_single_item("fresh apples")
+
+    sd.add_single_items(["Green apples", "apples"])
+
+    assert [item.name for item in sd.deduplicated_items_list] == ["Green apples"]
+    assert sd.deduplicated_items_list[0].original_input_list == ["fresh apples", "Green apples", "apples"]
@@ -0,0 +1,165 @@
+import numpy as np
+import pytest
+
+from semantic_deduplicator import DeduplicatedItem
+from semantic_deduplicator.index import ExactIndex, RandomProjectionIndex
+
+
+class VectorItem:
+    def __init__(self, item_embedding):
+        self.item_embedding = item_embedding
+
+
+def clustered_items(num_clusters=50, per_cluster=20, dimension=64, noise=0.3, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(num_clusters, dimension))
+    centers /= np.linalg.norm(centers, axis=1, keepdims=True)
+    noise_vectors = rng.normal(size=(num_clusters * per_cluster, dimension)) * noise / np.sqrt(dimension)
+    return [VectorItem(vector) for vector in np.repeat(centers, per_cluster, axis=0) + noise_vectors]
+
+
+def candidate_ids(index, queries, threshold=0.75):
+    return [{id(item) for item, _ in index.search(query.item_embedding, threshold)} for query in queries]
+
+
+def test_index_search_matches_pairwise_cosine():
+    rng = np.random.default_rng(0)
+    items = [VectorItem(rng.normal(size=32).tolist()) for _ in range(200)]
+    query = VectorItem(rng.normal(size=32).tolist())
+
+    index = ExactIndex(initial_capacity=4)
+    index.rebuild(items)
+
+    expected = {id(item) for item in items
+                if np.dot(query.item_embedding, item.item_embedding) / (np.linalg.norm(query.item_embedding) * np.linalg.norm(item.item_embedding)) >= 0.2}
+    results = index.search(query.item_embedding, threshold=0.2)
+
+    assert {id(item) for item, _ in results} == expected
+    assert [score for _, score in results] == sorted([score for _, score in results], reverse=True)
+
+    top_results = index.search(query.item_embedding, threshold=0.2, max_results=3)
+    assert top_results == results[:3]
+
+
+def test_index_counts_only_the_items_scored_below_the_threshold():
+    items = [VectorItem([1.0, 0.0]), VectorItem([1.0, 0.1]), VectorItem([0.0, 1.0]), VectorItem([-1.0, 0.0])]
+    index = ExactIndex()
+    index.rebuild(items)
+    index.remove(items[3])
+
+    # Removed slots aren't scored, and candidates cut by 'max_results' passed the threshold
+    results, rejected = index.search_with_rejections([1.0, 0.0], threshold=0.5, max_results=1)
+    assert results == index.search([1.0, 0.0], threshold=0.5, max_results=1)
+    assert rejected == 1
+
+    approximate = RandomProjectionIndex(num_tables=1, num_bits=12, num_probes=0)
+    approximate.rebuild(items)
+
+    # Only the items sharing a probed bucket are scored
+    results, rejected = approximate.search_with_rejections([1.0, 0.0], threshold=2.0)
+    assert results == [] and rejected < len(items)
+
+
+def test_index_update_and_remove():
+    items = [VectorItem([1.0, 0.0]), VectorItem([0.0, 1.0]), VectorItem([1.0, 1.0])]
+    index = ExactIndex()
+    index.rebuild(items)
+
+    index.remove(items[0])
+    assert len(index) == 2
+    assert [item for item, _ in index.search([1.0, 0.0], threshold=0.5)] == [items[2]]
+
+    items[1].item_embedding = [1.0, 0.0]
+    index.update(items[1])
+    assert [item for item, _ in index.search([1.0, 0.0], threshold=0.5)] == [items[1], items[2]]
+
+
+def test_index_stays_in_sync_with_deduplicated_list(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+
+    sd.add_single_items(["Milk for cereal", "Berries", "Milk for drinking", "Fresh berries"])
+    assert len(sd.deduplicated_items_list) == 2
+    assert len(sd.index) == 2
+
+    sd.deduplicated_items_list.pop(0)
+    candidates = sd.get_cosine_candidates(DeduplicatedItem("Berries", background_context="Grocery list"))
+    assert [item for item, _ in candidates] == sd.deduplicated_items_list
+
+
+def test_random_projection_candidates_match_exact_scan():
+    items = clustered_items()
+    queries = clustered_items(per_cluster=2, seed=0)[1::2]
+
+    exact = ExactIndex()
+    exact.rebuild(items)
+    approximate = RandomProjectionIndex(num_tables=8, num_bits=8, num_probes=2)
+    approximate.rebuild(items)
+
+    expected = candidate_ids(exact, queries)
+    found = candidate_ids(approximate, queries)
+
+    assert all(found_ids <= expected_ids for found_ids, expected_ids in zip(found, expected))
+    recall = sum(len(found_ids) for found_ids in found) / sum(len(expected_ids) for expected_ids in expected)
+    assert recall >= 0.9
+
+
+def test_random_projection_probes_trade_latency_for_recall():
+    items = clustered_items(noise=0.6)
+    queries = clustered_items(per_cluster=2, noise=0.6, seed=0)[1::2]
+
+    results = []
+    for num_probes in (0, 4):
+        index = RandomProjectionIndex(num_tables=2, num_bits=12, num_probes=num_probes)
+        index.rebuild(items)
+        results.append(candidate_ids(index, queries, threshold=0.5))
+
+    assert all(fewer <= more for fewer, more in zip(*results))
+    assert sum(map(len, results[0])) < sum(map(len, results[1]))
+
+
+def test_random_projection_incremental_update_and_remove():
+    items = clustered_items()
+    exact = ExactIndex()
+    approximate = RandomProjectionIndex()
+    for item in items:
+        exact.add(item)
+        approximate.add(item)
+
+    for item in items[::2]:
+        exact.remove(item)
+        approximate.remove(item)
+
+    for item in items[1::4]:
+        item.item_embedding = -np.asarray(item.item_embedding)
+        exact.update(item)
+        approximate.update(item)
+
+    expected = candidate_ids(exact, items[1::2])
+    found = candidate_ids(approximate, items[1::2])
+
+    assert len(approximate) == len(exact) == len(items) // 2
+    assert all(id(query) in found_ids for query, found_ids in zip(items[1::2], found))
+    assert all(found_ids <= expected_ids for found_ids, expected_ids in zip(found, expected))
+
+
+def test_deduplicator_uses_pluggable_index(fake_client, make_deduplicator):
+    sd = make_deduplicator(candidate_index=RandomProjectionIndex(num_bits=4))
+
+    sd.add_single_items(["Milk for cereal", "Berries", "Milk for drinking", "Fresh berries"])
+    sd.delete_item_from_string("Berries")
+
+    assert len(sd.deduplicated_items_list) == 1
+    assert len(sd.index) == 1
+
+
+def test_direct_re_embedding_reaches_the_index(fake_client, make_deduplicator):
+    for candidate_index in (None, RandomProjectionIndex(num_bits=4)):
+        sd = make_deduplicator(candidate_index=candidate_index)
+        sd.add_single_items(["Milk for cereal", "Berries"])
+        berries = sd.deduplicated_items_list[1]
+
+        berries.name = "Garden hose and sprinkler"
+        berries.update_item_embedding()
+
+        query = DeduplicatedItem("Garden hose and sprinkler", background_context="Grocery list")
+        assert sd.get_cosine_candidates(query) == [(berries, pytest.approx(1.0))]
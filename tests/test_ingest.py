@@ -0,0 +1,144 @@
+import csv
+import json
+
+import pytest
+
+from semantic_deduplicator import SemanticDeduplicator
+
+
+def test_bulk_ingest_matches_sequential_path(fake_client, make_deduplicator, groceries):
+    sequential = make_deduplicator()
+    for item in groceries:
+        sequential.add_single_item(item)
+
+    bulk = make_deduplicator()
+    bulk.add_single_items(groceries, max_workers=4, embedding_batch_size=3)
+
+    assert len(bulk.deduplicated_items_list) < len(groceries)
+    assert bulk.get_formatted_deduplicated_list(get_type="dict_list") == sequential.get_formatted_deduplicated_list(get_type="dict_list")
+
+
+def test_bulk_ingest_batches_embedding_calls(fake_client, make_deduplicator, groceries):
+    sd = make_deduplicator()
+    sd.add_single_items(groceries[:1])
+    embedding_calls = fake_client.embedding_calls
+
+    sd = make_deduplicator()
+    sd.add_single_items(["Bread", "Eggs", "Cheese", "Apples", "Rice"], embedding_batch_size=2)
+
+    # 3 batches of new items, no merges so no re-embedding
+    assert fake_client.embedding_calls - embedding_calls == 3
+
+
+def bulk_result(make_deduplicator, items):
+    sd = make_deduplicator()
+    sd.add_single_items(items)
+    return sd.get_formatted_deduplicated_list(get_type="dict_list")
+
+
+def test_stream_from_jsonl_and_csv(fake_client, tmp_path, make_deduplicator, groceries):
+    jsonl_path = tmp_path / "items.jsonl"
+    jsonl_path.write_text("\n".join(json.dumps({"id": i, "text": item}) for i, item in enumerate(groceries)) + "\n\n")
+
+    sd = make_deduplicator()
+    assert sd.add_items_from_stream(str(jsonl_path), field="text", chunk_size=3) == len(groceries) + 1
+    assert sd.get_formatted_deduplicated_list(get_type="dict_list") == bulk_result(make_deduplicator, groceries)
+
+    csv_path = tmp_path / "items.csv"
+    with open(csv_path, "w", newline="") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerows([["answer", "score"]] + [[item, 5] for item in groceries[:4]] + [["", 1], ["Ground, minced meat", 3]])
+
+    sd = make_deduplicator()
+    sd.add_items_from_stream(str(csv_path), chunk_size=2)
+    assert sd.get_formatted_deduplicated_list(get_type="dict_list") == bulk_result(make_deduplicator, groceries[:4] + ["Ground, minced meat"])
+
+
+def test_stream_records_that_are_objects_need_a_field(fake_client, make_deduplicator):
+    with pytest.raises(ValueError):
+        make_deduplicator().add_items_from_stream([{"text": "Milk"}])
+
+
+def test_interrupted_stream_resumes_from_checkpoint(fake_client, tmp_path, make_deduplicator, groceries):
+    checkpoint_path = str(tmp_path / "checkpoint")
+
+    def crashing_source():
+        yield from groceries[:5]
+        raise RuntimeError("Connection reset")
+
+    sd = make_deduplicator()
+    with pytest.raises(RuntimeError):
+        sd.add_items_from_stream(crashing_source(), chunk_size=2, checkpoint_path=checkpoint_path, checkpoint_every=1)
+
+    resumed = SemanticDeduplicator.load(checkpoint_path)
+    assert resumed.stream_offset == 4
+
+    assert resumed.add_items_from_stream(iter(groceries), chunk_size=2, checkpoint_path=checkpoint_path) == len(groceries)
+    assert resumed.get_formatted_deduplicated_list(get_type="dict_list") == bulk_result(make_deduplicator, groceries)
+    assert resumed.stream_offset == 0
+
+    # A finished stream is not added again
+    finished = SemanticDeduplicator.load(checkpoint_path)
+    calls = fake_client.chat_calls + fake_client.embedding_calls
+    finished.add_items_from_stream(iter(groceries), chunk_size=2)
+    assert fake_client.chat_calls + fake_client.embedding_calls == calls
+    assert finished.get_formatted_deduplicated_list(get_type="dict_list") == bulk_result(make_deduplicator, groceries)
+
+
+SUBMISSIONS = ["Milk for cereal and berries", "Bread", "Fresh berries, whole grain bread and ground meat", "Eggs and milk"]
+
+
+def count_extractions(fake_client, monkeypatch, drop_submission=None):
+    # Counts the extraction requests by schema, optionally leaving a submission out of every batched answer
+    extractions = []
+    call_llm = fake_client.call_llm
+
+    def counting_call_llm(*args, **kwargs):
+        schema = kwargs.get("function_schema") or (args[2] if len(args) > 2 else [])
+        response = call_llm(*args, **kwargs)
+
+        if schema and schema[0]["name"].startswith("extract_items"):
+            extractions.append(schema[0]["name"])
+            if schema[0]["name"] == "extract_items_from_submissions" and drop_submission is not None:
+                response = [entry for entry in response if entry["submission"] != drop_submission]
+
+        return response
+
+    monkeypatch.setattr("semantic_deduplicator.providers.call_llm", counting_call_llm)
+    return extractions
+
+
+def test_add_items_matches_add_item_in_one_extraction(fake_client, monkeypatch, make_deduplicator):
+    sequential = make_deduplicator()
+    for submission in SUBMISSIONS:
+        sequential.add_item(submission)
+
+    extractions = count_extractions(fake_client, monkeypatch)
+    bulk = make_deduplicator()
+    items = bulk.add_items(SUBMISSIONS)
+
+    assert extractions == ["extract_items_from_submissions"]
+    assert items == [["Milk for cereal", "berries"], ["Bread"], ["Fresh berries", "whole grain bread", "ground meat"], ["Eggs", "milk"]]
+    assert bulk.get_formatted_deduplicated_list(get_type="dict_list") == sequential.get_formatted_deduplicated_list(get_type="dict_list")
+    assert all(original_input in SUBMISSIONS for item in bulk.deduplicated_items_list for original_input in item.original_input_list)
+
+
+def test_add_items_respects_the_token_budget(fake_client, monkeypatch, make_deduplicator):
+    extractions = count_extractions(fake_client, monkeypatch)
+    sd = make_deduplicator()
+
+    assert sd._pack_submissions(SUBMISSIONS, max_tokens_per_request=10) == [[0, 1], [2], [3]]
+
+    sd.add_items(SUBMISSIONS, max_tokens_per_request=10)
+    assert extractions.count("extract_items_from_submissions") == 1
+    assert extractions.count("extract_items_from_submission") == 2
+
+
+def test_add_items_retries_skipped_submissions_alone(fake_client, monkeypatch, make_deduplicator):
+    extractions = count_extractions(fake_client, monkeypatch, drop_submission=3)
+    sd = make_deduplicator()
+
+    items = sd.add_items(SUBMISSIONS)
+
+    assert extractions == ["extract_items_from_submissions", "extract_items_from_submission"]
+    assert items[2] == ["Fresh berries", "whole grain bread", "ground meat"]
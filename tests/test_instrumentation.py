@@ -0,0 +1,86 @@
+import asyncio
+
+import openai
+import pytest
+
+from semantic_deduplicator import Instrumentation, OpenAIChatModel, OpenAIEmbedder, ResponseCache
+from semantic_deduplicator import utils
+
+ITEMS = ["Milk for cereal", "Bread", "Milk for drinking", "Bread rolls", "Eggs"]
+
+
+def test_disabled_by_default(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(ITEMS)
+
+    assert sd.stats() == {"timers": {}, "counters": {}, "tokens": {}}
+    assert sd.instrumentation.stage("embedding") is sd.instrumentation.stage("cosine_search")
+
+
+def test_stage_timers_and_counters(fake_client, make_deduplicator):
+    sd = make_deduplicator(instrumentation=Instrumentation())
+    for item in ITEMS:
+        sd.add_single_item(item)
+    sd.add_single_item("milk for cereal")
+
+    stats = sd.stats()
+
+    assert stats["counters"]["items_added"] == 3
+    assert stats["counters"]["merges"] == 2
+    assert stats["counters"]["fast_path_hits"] == 1
+    assert stats["counters"]["llm_verifications"] >= 2
+    assert stats["counters"]["cosine_candidates"] >= 2
+    assert stats["timers"]["transform_item_name"]["calls"] == 5 + 2
+    assert stats["timers"]["embedding"]["calls"] == 5 + 2
+    assert stats["timers"]["cosine_search"]["calls"] == 4
+    assert set(stats["timers"]["llm_similarity"]) == {"calls", "total_seconds", "max_seconds"}
+
+
+def test_hooks_see_every_measurement(fake_client, make_deduplicator):
+    events = []
+    sd = make_deduplicator(instrumentation=Instrumentation(hooks=[lambda kind, name, value: events.append((kind, name))]))
+
+    asyncio.run(sd.aadd_single_items(ITEMS))
+
+    assert ("timer", "embedding") in events
+    assert ("timer", "llm_similarity") in events
+    assert events.count(("counter", "merges")) == 2
+
+
+@pytest.fixture
+def openai_with_usage(monkeypatch):
+    attempts = []
+
+    def chat_create(**params):
+        attempts.append(params)
+        if len(attempts) == 1:
+            raise openai.error.ServiceUnavailableError("Try again")
+        return openai.openai_object.OpenAIObject.construct_from({"choices": [{"message": {"content": "Milk"}}],
+                                                                 "usage": {"prompt_tokens": 12, "completion_tokens": 1, "total_tokens": 13}})
+
+    def embedding_create(model, input):
+        inputs = input if isinstance(input, list) else [input]
+        return {"data": [{"index": i, "embedding": [1.0, 0.0]} for i in range(len(inputs))], "usage": {"prompt_tokens": 4, "total_tokens": 4}}
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", chat_create)
+    monkeypatch.setattr(openai.Embedding, "create", embedding_create)
+    monkeypatch.setattr(utils, "BACKOFF_FACTOR", 0)
+    yield
+    utils.set_cache(None)
+
+
+def test_openai_providers_report_tokens_retries_and_cache_hits(openai_with_usage):
+    instrumentation = Instrumentation()
+    chat_model, embedder = OpenAIChatModel(), OpenAIEmbedder()
+    chat_model.instrumentation = embedder.instrumentation = instrumentation
+    utils.set_cache(ResponseCache())
+
+    assert chat_model.complete("", "Milk") == "Milk"
+    assert chat_model.complete("", "Milk") == "Milk"
+    embedder.embed(["Milk", "Bread"])
+    embedder.embed(["Milk"])
+
+    stats = instrumentation.snapshot()
+    assert stats["counters"] == {"retries": 1, "cache_hits": 2}
+    assert stats["tokens"] == {"prompt_tokens": 12, "completion_tokens": 1, "total_tokens": 13,
+                               "embedding_prompt_tokens": 4, "embedding_total_tokens": 4}
@@ -0,0 +1,56 @@
+from semantic_deduplicator import DeduplicatedItem
+
+
+def add(sd, name):
+    item = DeduplicatedItem(name, original_input=name, background_context=sd.background_context)
+    sd.add_item_to_deduplicated_list(item)
+    return item
+
+
+def test_items_get_stable_ids(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    items = [add(sd, name) for name in ["Milk", "Berries", "Bread", "Eggs"]]
+
+    sd.remove_item_from_deduplicated_list(items[1])
+    eggs_id = items[3].item_id
+    rice = add(sd, "Rice")
+
+    assert [item.item_id for item in items] == [0, 1, 2, 3]
+    assert rice.item_id == 4
+    assert sd.get_item(eggs_id) is items[3]
+    assert sd.deduplicated_items_list == [items[0], items[2], items[3], rice]
+
+
+def test_delete_removes_the_matched_item_when_names_collide(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    first, second = add(sd, "Milk"), add(sd, "Milk")
+
+    sd.remove_item_from_deduplicated_list(second)
+
+    assert sd.deduplicated_items_list == [first]
+    assert [item for item, _ in sd.get_cosine_candidates(second)] == [first]
+
+
+def test_tombstones_are_compacted(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    items = [add(sd, f"Item {i}") for i in range(10)]
+
+    for item in items[:5]:
+        sd.remove_item_from_deduplicated_list(item)
+    assert sd._tombstones == 5
+
+    sd.remove_item_from_deduplicated_list(items[5])
+    assert sd._tombstones == 0
+    assert sd.get_item(items[9].item_id) is items[9]
+    assert len(sd.index) == len(sd.embedding_store) == 4
+
+
+def test_direct_list_edits_stay_in_sync(fake_client, make_deduplicator):
+    sd = make_deduplicator()
+    items = [add(sd, name) for name in ["Milk", "Berries", "Bread"]]
+
+    sd.deduplicated_items_list.pop(0)
+    sd.remove_item_from_deduplicated_list(items[2])
+
+    assert sd.deduplicated_items_list == [items[1]]
+    assert len(sd.index) == 1
@@ -0,0 +1,54 @@
+import functools
+
+import numpy as np
+import pytest
+
+from semantic_deduplicator import SemanticDeduplicator, RandomProjectionIndex
+
+ITEMS = ["Milk for cereal", "Berries", "Milk for drinking", "Fresh berries", "Ground meat", "Bread", "Whole grain bread"]
+
+
+@pytest.fixture
+def make_deduplicator(make_deduplicator):
+    # Early exit is saved and loaded with the other settings
+    return functools.partial(make_deduplicator, early_exit=True)
+
+
+def test_save_and_load_round_trip(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(ITEMS)
+    sd.save(str(tmp_path / "groceries"))
+
+    loaded = SemanticDeduplicator.load(str(tmp_path / "groceries"))
+
+    assert loaded.get_formatted_deduplicated_list(get_type="dict_list") == sd.get_formatted_deduplicated_list(get_type="dict_list")
+    assert loaded.early_exit and loaded.cosine_similarity_threshold == .5
+    assert isinstance(loaded.deduplicated_items_list[0].item_embedding, np.memmap)
+    for item, loaded_item in zip(sd.deduplicated_items_list, loaded.deduplicated_items_list):
+        np.testing.assert_allclose(loaded_item.item_embedding, np.asarray(item.item_embedding) / np.linalg.norm(item.item_embedding), rtol=1e-6)
+
+
+def test_loaded_deduplicator_keeps_deduplicating(fake_client, tmp_path, make_deduplicator):
+    sd = make_deduplicator()
+    sd.add_single_items(ITEMS)
+    sd.save(str(tmp_path / "groceries"))
+
+    expected = make_deduplicator()
+    expected.add_single_items(ITEMS + ["Berries for pie", "Ground beef", "Eggs"])
+    expected.delete_item_from_string("Ground meat")
+
+    for candidate_index in (None, RandomProjectionIndex(num_bits=4)):
+        loaded = SemanticDeduplicator.load(str(tmp_path / "groceries"), candidate_index=candidate_index)
+        loaded.add_single_items(["Berries for pie", "Ground beef", "Eggs"])
+        loaded.delete_item_from_string("Ground meat")
+
+        assert loaded.get_formatted_deduplicated_list(get_type="dict_list") == expected.get_formatted_deduplicated_list(get_type="dict_list")
+        assert len(loaded.index) == len(loaded.deduplicated_items_list)
+
+
+def test_save_empty_deduplicator(fake_client, tmp_path, make_deduplicator):
+    make_deduplicator().save(str(tmp_path / "empty"))
+    loaded = SemanticDeduplicator.load(str(tmp_path / "empty"))
+    loaded.add_single_item("Milk")
+
+    assert loaded.get_formatted_deduplicated_list() == "Milk"
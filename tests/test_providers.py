@@ -0,0 +1,98 @@
+import asyncio
+import pickle
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+import semantic_deduplicator.providers as providers
+from semantic_deduplicator import SemanticDeduplicator, HashedNgramEmbedder, ScriptedChatModel, OpenAIChatModel
+
+
+def make_offline_deduplicator(**kwargs):
+    return SemanticDeduplicator(background_context="Grocery list", llm_similarity_threshold=.5, cosine_similarity_threshold=.35,
+                                chat_model=ScriptedChatModel(), embedder=HashedNgramEmbedder(), **kwargs)
+
+
+def test_hashed_ngram_embedder_is_deterministic_and_batched():
+    embedder = HashedNgramEmbedder(dimension=256)
+    strings = ["Milk for cereal", "Milk for drinking", "Garden hose"]
+
+    embeddings = embedder.embed(strings)
+
+    assert embeddings.shape == (3, 256)
+    assert np.allclose(np.linalg.norm(embeddings, axis=1), 1)
+    assert np.allclose(embeddings[1], HashedNgramEmbedder(dimension=256).embed_one(strings[1]))
+    assert np.dot(embeddings[0], embeddings[1]) > np.dot(embeddings[0], embeddings[2])
+    assert not np.allclose(embeddings[0], HashedNgramEmbedder(dimension=256, seed=1).embed_one(strings[0]))
+
+
+def test_empty_strings_embed_to_zero():
+    assert not HashedNgramEmbedder().embed_one("").any()
+
+
+def test_scripted_rules_run_before_the_defaults():
+    chat_model = ScriptedChatModel(rules=[(r"Here is my item: (\w+) milk", lambda match: match.group(1).title())])
+
+    assert chat_model.complete("", "Here is my item: oat milk") == "Oat"
+    assert chat_model.complete("", "Here is my item: bread") == "Bread"
+    assert chat_model.calls == 2
+
+
+def test_scripted_calls_are_counted_across_threads():
+    chat_model = ScriptedChatModel()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda i: chat_model.complete("", f"Here is my item: item {i}"), range(400)))
+
+    assert chat_model.calls == 400
+    assert pickle.loads(pickle.dumps(chat_model)).complete("", "Here is my item: bread") == "Bread"
+
+
+def test_offline_deduplication_needs_no_api_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr("openai.api_key", None)
+
+    sd = make_offline_deduplicator()
+    sd.add_single_items(["Milk for cereal", "Bread", "Milk for drinking", "Eggs"])
+    sd.add_item("Bread rolls and cheese")
+
+    assert sd.get_formatted_deduplicated_list(get_type="dict_list") == [
+        {"Formatted Name": "Milk for cereal", "Original Names": ["Milk for cereal", "Milk for drinking"]},
+        {"Formatted Name": "Bread", "Original Names": ["Bread", "Bread rolls and cheese"]},
+        {"Formatted Name": "Eggs", "Original Names": ["Eggs"]},
+        {"Formatted Name": "Cheese", "Original Names": ["Bread rolls and cheese"]}]
+
+    concurrent = make_offline_deduplicator()
+    asyncio.run(concurrent.aadd_single_items(["Milk for cereal", "Bread", "Milk for drinking", "Eggs"]))
+    assert len(concurrent.deduplicated_items_list) == 3
+
+
+def test_openai_providers_still_need_a_key(monkeypatch):
+    monkeypatch.delenv("OPENAI_API_KEY", raising=False)
+    monkeypatch.setattr("openai.api_key", None)
+
+    with pytest.raises(ValueError):
+        SemanticDeduplicator(background_context="Grocery list", embedder=HashedNgramEmbedder())
+
+
+def test_openai_chat_model_is_a_default_for_the_prompt_model(monkeypatch):
+    requests = []
+    monkeypatch.setattr(providers, "call_llm", lambda *args, **kwargs: requests.append(kwargs.get("model")))
+
+    OpenAIChatModel().complete("", "Hello", model="gpt-4")
+    OpenAIChatModel(model="gpt-4o-mini").complete("", "Hello", model="gpt-4")
+    OpenAIChatModel(model="gpt-4o-mini").complete("", "Hello")
+    OpenAIChatModel().complete("", "Hello")
+
+    assert requests == ["gpt-4", "gpt-4", "gpt-4o-mini", None]
+
+
+def test_extraction_model_is_sent_with_submissions(fake_client, monkeypatch):
+    models = []
+    monkeypatch.setattr(providers, "call_llm", lambda *args, **kwargs: models.append(kwargs.get("model")) or fake_client.call_llm(*args, **kwargs))
+
+    sd = SemanticDeduplicator(background_context="Grocery list", extraction_model="gpt-4o")
+    sd.add_item("Milk and bread")
+
+    assert "gpt-4o" in models and "gpt-4-0613" not in models
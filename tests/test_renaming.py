@@ -0,0 +1,114 @@
+import asyncio
+import functools
+
+import pytest
+
+DUPLICATES = ["Milk for cereal", "Milk for drinking", "Milk for coffee", "Milk for tea", "Milk for baking"]
+
+
+@pytest.fixture
+def make_deduplicator(make_deduplicator):
+    # Lower thresholds, so every milk item is a duplicate
+    return functools.partial(make_deduplicator, llm_similarity_threshold=.3, cosine_similarity_threshold=.3)
+
+
+def count_calls(fake_client, function):
+    chat_calls, embedding_calls = fake_client.chat_calls, fake_client.embedding_calls
+    function()
+    return fake_client.chat_calls - chat_calls, fake_client.embedding_calls - embedding_calls
+
+
+def test_lazy_merges_are_renamed_once_on_flush(fake_client, make_deduplicator):
+    eager = make_deduplicator()
+    eager_calls = count_calls(fake_client, lambda: [eager.add_single_item(item) for item in DUPLICATES])
+
+    lazy = make_deduplicator(rename_after_merges=None)
+    lazy_calls = count_calls(fake_client, lambda: [lazy.add_single_item(item) for item in DUPLICATES])
+
+    assert len(lazy.deduplicated_items_list) == 1
+    assert lazy.deduplicated_items_list[0].name == "Milk for cereal"
+    assert lazy.deduplicated_items_list[0].original_input_list == DUPLICATES
+
+    # One group name, one transform and one embedding for all four merges
+    assert count_calls(fake_client, lazy.flush) == (2, 1)
+    assert count_calls(fake_client, lazy.flush) == (0, 0)
+    assert lazy_calls[0] + 2 < eager_calls[0]
+    assert lazy_calls[1] + 1 < eager_calls[1]
+
+
+def test_a_rename_updates_the_index_once(fake_client, make_deduplicator):
+    for embedding_mode in ("name", "centroid"):
+        sd = make_deduplicator(embedding_mode=embedding_mode)
+        sd.add_single_item(DUPLICATES[0])
+
+        updates = []
+        update = sd.index.update
+        sd.index.update = lambda item: updates.append(item) or update(item)
+        sd.add_single_item(DUPLICATES[1])
+
+        # The store reports the new embedding to the index, so nothing updates it a second time
+        assert len(sd.deduplicated_items_list) == 1
+        assert updates == sd.deduplicated_items_list
+
+
+def test_rename_after_merge_count(fake_client, make_deduplicator):
+    sd = make_deduplicator(rename_after_merges=2)
+    for item in DUPLICATES[:3]:
+        sd.add_single_item(item)
+
+    # The second merge triggered the rename, the first two inputs lead the group name prompt
+    assert sd.deduplicated_items_list[0].name == "Milk for cereal"
+    assert sd._pending_merges == {}
+
+    sd.add_single_item(DUPLICATES[3])
+    assert sd._pending_merges[sd.deduplicated_items_list[0].item_id] == [1, [DUPLICATES[3]]]
+
+
+def test_pending_merges_keep_only_the_names_the_prompt_uses(fake_client, make_deduplicator):
+    sd = make_deduplicator(rename_after_merges=None)
+    sd.add_single_items([f"Milk for recipe {i}" for i in range(30)])
+
+    item = sd.deduplicated_items_list[0]
+    merge_count, merged_names = sd._pending_merges[item.item_id]
+    assert len(sd.deduplicated_items_list) == 1
+    assert merge_count == 29
+    assert merged_names == [f"Milk for recipe {i}" for i in range(1, 20)]
+
+    sd.flush()
+    assert sd._pending_merges == {}
+
+
+def test_formatted_list_flushes_pending_renames(fake_client, make_deduplicator):
+    sd = make_deduplicator(rename_after_merges=None)
+    sd.add_single_items(["Bread", "Bread rolls", "Eggs"])
+    chat_calls = fake_client.chat_calls
+
+    formatted = sd.get_formatted_deduplicated_list(get_type="dict_list")
+
+    assert fake_client.chat_calls > chat_calls
+    assert formatted == [{"Formatted Name": "Bread", "Original Names": ["Bread", "Bread rolls"]},
+                         {"Formatted Name": "Eggs", "Original Names": ["Eggs"]}]
+
+
+def test_deleted_items_are_not_renamed(fake_client, make_deduplicator):
+    sd = make_deduplicator(rename_after_merges=None)
+    sd.add_single_items(["Bread", "Bread rolls"])
+    sd.remove_item_from_deduplicated_list(sd.deduplicated_items_list[0])
+
+    assert count_calls(fake_client, sd.flush) == (0, 0)
+
+
+def test_async_lazy_renaming(fake_client, make_deduplicator):
+    sd = make_deduplicator(rename_after_merges=None)
+    asyncio.run(sd.aadd_single_items(DUPLICATES))
+    chat_calls = fake_client.chat_calls
+
+    asyncio.run(sd.aflush())
+
+    assert fake_client.chat_calls - chat_calls == 2
+    assert sd._pending_merges == {}
+
+
+def test_invalid_rename_after_merges(fake_client, make_deduplicator):
+    with pytest.raises(ValueError):
+        make_deduplicator(rename_after_merges=0)
@@ -0,0 +1,122 @@
+import asyncio
+import threading
+import time
+
+import openai
+import pytest
+
+from semantic_deduplicator import Instrumentation, RequestScheduler
+from semantic_deduplicator import utils
+from semantic_deduplicator.scheduler import TokenBucket
+
+
+@pytest.fixture
+def scheduler():
+    scheduler = RequestScheduler(initial_backoff=0)
+    utils.set_scheduler(scheduler)
+    yield scheduler
+    utils.set_scheduler(None)
+
+
+def test_token_bucket_refills_over_time():
+    bucket = TokenBucket(600)
+    now = bucket.updated
+
+    assert bucket.wait_time(600, now) == 0
+    bucket.take(600, now)
+    assert bucket.wait_time(1, now) == pytest.approx(0.1)
+    assert bucket.wait_time(1, now + 0.2) == 0
+
+    bucket.give_back(1000)
+    assert bucket.level == bucket.capacity
+
+
+def test_embeddings_are_retried_on_rate_limits(monkeypatch, scheduler):
+    attempts = []
+
+    def embedding_create(model, input):
+        attempts.append(input)
+        if len(attempts) < 3:
+            raise openai.error.RateLimitError("Rate limit reached")
+        return {"data": [{"index": 0, "embedding": [1.0, 0.0]}], "usage": {"prompt_tokens": 2, "total_tokens": 2}}
+
+    monkeypatch.setattr(openai.Embedding, "create", embedding_create)
+    instrumentation = Instrumentation()
+
+    assert utils.get_embedding("Milk", instrumentation=instrumentation) == [1.0, 0.0]
+    assert len(attempts) == 3
+    assert instrumentation.snapshot()["counters"]["retries"] == 2
+
+
+def test_gives_up_after_max_attempts(monkeypatch, scheduler):
+    scheduler.max_attempts = 2
+
+    def chat_create(**params):
+        raise openai.error.Timeout("Request timed out")
+
+    monkeypatch.setattr(openai.ChatCompletion, "create", chat_create)
+
+    with pytest.raises(openai.error.Timeout):
+        utils.call_llm("System", "Hello")
+
+
+def test_retry_after_is_a_lower_bound():
+    scheduler = RequestScheduler(initial_backoff=0.01, max_backoff=5)
+
+    assert scheduler._backoff(0, openai.error.RateLimitError("Slow down", headers={"retry-after": "2"})) >= 2
+    assert scheduler._backoff(0, openai.error.RateLimitError("Slow down", headers={"retry-after": "60"})) <= 5
+    assert scheduler._backoff(3, openai.error.Timeout("Request timed out")) <= 0.08
+
+
+def test_token_quota_is_corrected_from_usage():
+    scheduler = RequestScheduler(tokens_per_minute=1000)
+    scheduler.run("chat", "gpt-4", 300, lambda: None)
+    scheduler.settle(300, 100)
+
+    assert scheduler._token_bucket.level == pytest.approx(900, abs=1)
+
+
+def test_embeddings_go_before_chat_requests():
+    scheduler = RequestScheduler(requests_per_minute=600)
+    scheduler._request_bucket.level = 0
+    order = []
+
+    def send(kind, model):
+        scheduler.run(kind, model, 1, lambda: order.append(kind))
+
+    chat = threading.Thread(target=send, args=("chat", "gpt-4"))
+    chat.start()
+    while len(scheduler._waiting) < 1:
+        time.sleep(0.001)
+
+    embedding = threading.Thread(target=send, args=("embedding", utils.EMBEDDING_MODEL))
+    embedding.start()
+    while len(scheduler._waiting) < 2 and not order:
+        time.sleep(0.001)
+
+    chat.join()
+    embedding.join()
+
+    # The chat request queued first, but the refill it was waiting on goes to the embedding
+    assert order == ["embedding", "chat"]
+
+
+def test_async_requests_wait_for_the_quota():
+    scheduler = RequestScheduler(requests_per_minute=1200, initial_backoff=0)
+    scheduler._request_bucket.level = 0
+    instrumentation = Instrumentation()
+    attempts = []
+
+    async def request():
+        attempts.append(time.perf_counter())
+        if len(attempts) == 1:
+            raise openai.error.ServiceUnavailableError("Overloaded")
+        return "ok"
+
+    start = time.perf_counter()
+    assert asyncio.run(scheduler.arun("chat", "gpt-4", 1, request, instrumentation)) == "ok"
+
+    assert attempts[0] - start >= 0.04
+    snapshot = instrumentation.snapshot()
+    assert snapshot["counters"]["retries"] == 1
+    assert snapshot["timers"]["scheduler_wait"]["calls"] == 2
@@ -0,0 +1,76 @@
+import numpy as np
+
+from semantic_deduplicator import ShardedDeduplicator, ScriptedChatModel, HashedNgramEmbedder, Instrumentation
+from semantic_deduplicator.clustering import cross_threshold_edges, threshold_edges
+
+ITEMS = ["Milk for cereal", "Berries", "milk for cereal", "Fresh berries", "Ground meat", "Bread",
+         "Whole grain bread", "Fresh meat", "Berries for pie", "Bread rolls", "Milk", "Eggs"]
+
+SETTINGS = {"background_context": "Grocery list", "llm_similarity_threshold": .3, "cosine_similarity_threshold": .3}
+
+
+def make_sharded(**kwargs):
+    return ShardedDeduplicator(chat_model=ScriptedChatModel(), embedder=HashedNgramEmbedder(), **{**SETTINGS, **kwargs})
+
+
+def all_inputs(formatted):
+    return sorted(original_input for item in formatted for original_input in item["Original Names"])
+
+
+def test_partition_keeps_repeats_together_and_shards_even():
+    sharded = make_sharded(num_shards=3, num_bits=4)
+    shards = sharded.partition(ITEMS * 3)
+
+    assert sorted(item for shard in shards for item in shard) == sorted(ITEMS * 3)
+    assert sum(1 for shard in shards if "Milk for cereal" in shard or "milk for cereal" in shard) == 1
+    assert [len(shard) for shard in shards] == [12, 12, 12]
+
+
+def test_cross_edges_only_pair_the_two_lists():
+    embeddings = HashedNgramEmbedder().embed(ITEMS)
+    sources, targets, scores = cross_threshold_edges(embeddings[:5], embeddings[5:], 0.3, block_size=2)
+
+    expected = {(i, j - 5) for i, j in zip(*threshold_edges(embeddings, 0.3)[:2]) if i < 5 <= j}
+    assert set(zip(sources.tolist(), targets.tolist())) == expected
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_sharded_run_keeps_every_input_once():
+    sharded = make_sharded(num_shards=2, max_processes=2, instrumentation=Instrumentation())
+    sharded.deduplicate(ITEMS, max_workers=2)
+
+    formatted = sharded.get_formatted_deduplicated_list(get_type="dict_list")
+
+    assert all_inputs(formatted) == sorted(ITEMS)
+    assert len(formatted) < len(ITEMS)
+    assert {"partition", "shards", "reconciliation"} <= set(sharded.deduplicator.stats()["timers"])
+    assert isinstance(sharded.get_formatted_deduplicated_list(), str)
+
+
+def test_reconciliation_merges_across_shards_only():
+    sharded = make_sharded(num_shards=2, auto_merge_threshold=1.1, llm_similarity_threshold=.5)
+    embedder = HashedNgramEmbedder()
+
+    def shard_item(name, inputs):
+        return (name, inputs, embedder.embed([name])[0])
+
+    results = [[shard_item("Grain bread", ["grain bread"]), shard_item("Fresh berries", ["fresh berries"])],
+               [shard_item("Bread", ["bread", "Bread"]), shard_item("Berries", ["berries"]), shard_item("Fresh milk", ["fresh milk"])]]
+    items = ["grain bread", "bread", "fresh berries", "berries", "Bread", "fresh milk"]
+
+    sharded._reconcile(results, items)
+    formatted = sharded.get_formatted_deduplicated_list(get_type="dict_list")
+
+    assert [item["Original Names"] for item in formatted] == [["grain bread", "bread", "Bread"], ["fresh berries", "berries"], ["fresh milk"]]
+    assert formatted[0]["Formatted Name"] == "Grain bread"
+    np.testing.assert_allclose(np.linalg.norm(sharded.deduplicated_items_list[0].item_embedding), 1, rtol=1e-5)
+
+    # Items from an earlier run are reconciled with the next one, and keep their ids
+    item_ids, version = [item.item_id for item in sharded.deduplicated_items_list], sharded.deduplicator.version
+    sharded._reconcile([[shard_item("Fresh milk", ["Fresh milk"]), shard_item("Grain bread rolls", ["grain bread rolls"])]], ["Fresh milk", "grain bread rolls"])
+
+    assert [item["Original Names"] for item in sharded.get_formatted_deduplicated_list(get_type="dict_list")] == [
+        ["grain bread", "bread", "Bread", "grain bread rolls"], ["fresh berries", "berries"], ["fresh milk", "Fresh milk"]]
+    assert [item.item_id for item in sharded.deduplicated_items_list] == item_ids
+    assert sharded.deduplicator.get_changes(version)["merged"] == [{"Item ID": item_ids[0], "New Original Names": ["grain bread rolls"]},
+                                                                   {"Item ID": item_ids[2], "New Original Names": ["Fresh milk"]}]
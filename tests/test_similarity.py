@@ -0,0 +1,146 @@
+import asyncio
+import time
+
+import pytest
+
+from semantic_deduplicator import DeduplicatedItem
+from semantic_deduplicator.providers import word_overlap
+
+BREAD = ["Bread", "Bread rolls", "Whole grain bread", "Bread for toast", "Sliced bread"]
+
+
+@pytest.fixture
+def make_deduplicator(make_deduplicator):
+    # Deduplicators that already hold every bread item
+    def make(**kwargs):
+        sd = make_deduplicator(**{"llm_similarity_threshold": .2, "cosine_similarity_threshold": .3, **kwargs})
+        for name in BREAD:
+            sd.add_item_to_deduplicated_list(DeduplicatedItem(name, original_input=name, background_context=sd.background_context))
+        return sd
+
+    return make
+
+
+def test_parallel_verification_matches_sequential(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+
+    sequential = make_deduplicator(max_verification_workers=1).get_similar_items(query)
+    parallel = make_deduplicator(max_verification_workers=4).get_similar_items(query)
+
+    assert len(sequential) == len(BREAD)
+    assert [(item.name, score) for item, score in parallel] == [(item.name, score) for item, score in sequential]
+
+
+def test_parallel_verification_overlaps_llm_calls(fake_client, monkeypatch, make_deduplicator):
+    call_llm = fake_client.call_llm
+
+    def slow_call_llm(*args, **kwargs):
+        time.sleep(0.05)
+        return call_llm(*args, **kwargs)
+
+    sd = make_deduplicator(max_verification_workers=len(BREAD))
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    monkeypatch.setattr("semantic_deduplicator.providers.call_llm", slow_call_llm)
+
+    start = time.perf_counter()
+    sd.get_similar_items(query)
+
+    assert time.perf_counter() - start < 0.05 * len(BREAD) / 2
+
+
+def test_early_exit_stops_at_first_match(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    sd = make_deduplicator(max_verification_workers=1, early_exit=True)
+
+    chat_calls = fake_client.chat_calls
+    similar_items = sd.get_similar_items(query)
+
+    assert fake_client.chat_calls - chat_calls == 1
+    assert similar_items[0][0] is sd.get_cosine_candidates(query)[0][0]
+
+
+def test_batched_scoring_matches_pairwise_in_one_call(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    pairwise = make_deduplicator().get_similar_items(query)
+
+    sd = make_deduplicator(similarity_scoring="batched")
+    chat_calls = fake_client.chat_calls
+    batched = sd.get_similar_items(query)
+
+    assert fake_client.chat_calls - chat_calls == 1
+    assert [(item.name, score) for item, score in batched] == [(item.name, score) for item, score in pairwise]
+
+
+def test_batched_scoring_falls_back_to_pairwise(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    pairwise = make_deduplicator().get_similar_items(query)
+
+    fake_client.malformed_scores = True
+    sd = make_deduplicator(similarity_scoring="batched")
+    chat_calls = fake_client.chat_calls
+    batched = sd.get_similar_items(query)
+
+    assert fake_client.chat_calls - chat_calls == 1 + len(BREAD)
+    assert [(item.name, score) for item, score in batched] == [(item.name, score) for item, score in pairwise]
+
+
+def test_cascade_auto_accepts_close_cosine_candidates(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    sd = make_deduplicator(auto_accept_threshold=.3)
+
+    chat_calls = fake_client.chat_calls
+    similar_items = sd.get_similar_items(query)
+
+    assert fake_client.chat_calls == chat_calls
+    assert [score for _, score in similar_items] == [score for _, score in sd.get_cosine_candidates(query)]
+    assert sd.cascade_decisions["cosine_accept"] == len(BREAD)
+
+
+def test_cascade_cross_check_settles_the_clear_cases(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    sd = make_deduplicator(cross_check=word_overlap, cross_check_reject_threshold=.3, cross_check_accept_threshold=.5)
+
+    chat_calls = fake_client.chat_calls
+    similar_items = sd.get_similar_items(query)
+
+    # "Bread" overlaps by half, "Whole grain bread" and "Bread for toast" by a quarter, the other two go to the judge
+    assert fake_client.chat_calls - chat_calls == 2
+    assert [item.name for item, _ in similar_items] == ["Bread", "Bread rolls", "Sliced bread"]
+    assert sd.cascade_decisions == {"cosine_accept": 0, "cosine_reject": 0, "cross_check_accept": 1, "cross_check_reject": 2,
+                                    "judge_accept": 2, "judge_reject": 0}
+
+    async_sd = make_deduplicator(cross_check=word_overlap, cross_check_reject_threshold=.3, cross_check_accept_threshold=.5)
+    async_similar_items = asyncio.run(async_sd.aget_similar_items(query))
+
+    assert [(item.name, score) for item, score in async_similar_items] == [(item.name, score) for item, score in similar_items]
+
+
+def test_cascade_cross_check_with_a_cheaper_model(fake_client, monkeypatch, make_deduplicator):
+    models = []
+
+    def call_llm(*args, **kwargs):
+        models.append(kwargs.get("model"))
+        return fake_client.call_llm(*args, **kwargs)
+
+    monkeypatch.setattr("semantic_deduplicator.providers.call_llm", call_llm)
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    sd = make_deduplicator(cross_check="gpt-3.5-turbo", cross_check_reject_threshold=.3, cross_check_accept_threshold=.5)
+    models.clear()
+
+    sd.get_similar_items(query)
+
+    assert models.count("gpt-3.5-turbo") == len(BREAD)
+    assert models.count("gpt-4") == 2
+
+
+def test_cascade_does_not_reject_candidates_cut_by_max_cosine_candidates(fake_client, make_deduplicator):
+    query = DeduplicatedItem("Fresh bread", background_context="Grocery list")
+    sd = make_deduplicator(max_cosine_candidates=2)
+
+    assert len(sd.get_cosine_candidates(query)) == 2
+    assert sd.cascade_decisions["cosine_reject"] == 0
+
+
+def test_cascade_thresholds_are_validated(fake_client, make_deduplicator):
+    with pytest.raises(ValueError):
+        make_deduplicator(cross_check=word_overlap, cross_check_reject_threshold=.8, cross_check_accept_threshold=.5)
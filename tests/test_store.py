@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from semantic_deduplicator import DeduplicatedItem
+from semantic_deduplicator.store import EmbeddingStore
+
+
+def test_store_reuses_released_slots_across_blocks():
+    store = EmbeddingStore(block_size=2)
+    slots = [store.allocate([float(i), 1.0]) for i in range(5)]
+
+    assert slots == [0, 1, 2, 3, 4]
+    assert store.nbytes == 3 * 2 * 2 * 4
+
+    store.release(1)
+    assert store.allocate([9.0, 9.0]) == 1
+    assert store.get(1).tolist() == [9.0, 9.0]
+    assert store.get(4).tolist() == [4.0, 1.0]
+    assert len(store) == 5
+
+    with pytest.raises(ValueError):
+        store.allocate([1.0, 2.0, 3.0])
+
+
+def test_items_read_embeddings_from_the_shared_store(fake_client, make_deduplicator):
+    sd = make_deduplicator(embedding_dtype="float16")
+    sd.add_single_items(["Milk for cereal", "Berries", "Milk for drinking"])
+
+    milk, berries = sd.deduplicated_items_list
+    assert not hasattr(milk, "__dict__")
+    assert milk.item_embedding.dtype == np.float16
+    assert np.shares_memory(milk.item_embedding, sd.embedding_store.get(milk._slot))
+    np.testing.assert_array_equal(berries.item_embedding, np.asarray(fake_client.embed("Berries"), dtype=np.float16))
+
+    sd.delete_item_from_string("Berries")
+    assert len(sd.embedding_store) == 1
+    np.testing.assert_array_equal(berries.item_embedding, np.asarray(fake_client.embed("Berries"), dtype=np.float32))
+
+
+def test_standalone_item_embedding_is_compact(fake_client):
+    item = DeduplicatedItem("Milk", background_context="Grocery list")
+
+    assert isinstance(item.item_embedding, np.ndarray)
+    assert item.item_embedding.dtype == np.float32
+
+
+def test_index_reads_rows_from_the_store(fake_client, make_deduplicator):
+    sd = make_deduplicator(embedding_dtype="float16")
+    sd.add_single_items(["Milk for cereal", "Berries", "Milk for drinking"])
+    milk, berries = sd.deduplicated_items_list
+
+    assert sd.index.store is sd.embedding_store
+    assert sd.embedding_store.nbytes == sd.embedding_store.block_size * len(milk.item_embedding) * 2
+    assert [item for item, _ in sd.get_cosine_candidates(berries)] == [berries]